@@ -1,121 +1,269 @@
-import shutil
 import os
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
-from fastapi.responses import StreamingResponse
+import zipfile
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Query
+from fastapi.responses import StreamingResponse, JSONResponse
+from fastapi.concurrency import run_in_threadpool
 # ✅ Import your modules
-from src.ingest import load_file 
-from src.vector_store import add_to_vector_db
+from src.ingest import iter_file_cached
+from src.extraction_cache import new_cache_stats
+from src.sources import iter_zip_sources, SourceSpooler, ArchiveLimitError, COPY_BLOCK_SIZE
+from src.vector_store import (add_documents_stream, clear_vector_db, get_vector_db_status, maintain_vector_db,
+                              list_documents, find_document, delete_document, list_collections)
+from src.collection_manager import validate_name, InvalidCollectionName
+from src.config import DEFAULT_COLLECTION, MODEL_WARMUP
+from src.models import models
+from src.jobs import get_job_manager
 from src.rag import ask_question
 from src.logger import logger
 
 app = FastAPI(title="Multimodal RAG API", version="2.5")
 
+@app.on_event("startup")
+def start_index_maintenance():
+    # Segments left over from earlier runs may still need merging / an ANN index
+    maintain_vector_db()
+
+@app.on_event("startup")
+def start_model_warmup():
+    # ✅ Load models in the background: the server is up right away, /health/ready says when they're in
+    if MODEL_WARMUP:
+        models.warm_up_in_background()
+
 @app.get("/")
 def home():
     return {"message": "Multimodal RAG System is Online 🟢"}
 
-import zipfile
+@app.get("/health")
+def health():
+    """Liveness: the process is up and serving (models may still be loading)."""
+    return {"status": "ok"}
+
+@app.get("/health/ready")
+def health_ready():
+    """Readiness: 200 once every required model is loaded, 503 (with per-model status) until then."""
+    status = models.status()
+    if not status["ready"]:
+        return JSONResponse(status_code=503, content=status)
+    return status
 
-# ... (other imports are assumed to be present at top of file, we just add zipfile if needed, but here replacing the block so will include relevant logic)
+def _track(docs, label, file_summary, progress):
+    """Passes documents through, reporting per-file progress to the job."""
+    progress.start_file(label)
+    seen = False
+    docs = iter(docs)
+    while True:
+        # Time spent pulling the next page = parsing / OCR time
+        with progress.timed("extract"):
+            doc = next(docs, None)
+        if doc is None:
+            break
+        if not seen:
+            file_summary.append(label)
+            seen = True
+        progress.page_done()
+        yield doc
+    progress.finish_file("done" if seen else "empty")
 
-@app.post("/ingest/")
-async def ingest_documents(files: list[UploadFile] = File(...)):
+def iter_uploaded_docs(sources, file_summary, cache_stats, skipped, progress):
     """
-    Ingests multiple files, including ZIP archives (expanding them efficiently).
+    GENERATOR: yields page Documents for every upload (and every ZIP member),
+    one file at a time, reading straight from the spooled upload. Nothing is
+    copied to a scratch directory; only members above SPILL_THRESHOLD_MB are
+    spilled to a temp file.
     """
-    try:
-        temp_dir = "temp_data"
-        os.makedirs(temp_dir, exist_ok=True)
-        
-        all_docs = []
-        file_summary = []
-        
-        for file in files:
-            file_path = os.path.join(temp_dir, file.filename)
-            
-            # 1. Save uploaded file locally
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            
-            # 2. Check if ZIP
-            if file.filename.lower().endswith(".zip"):
-                logger.info(f"📦 Detected ZIP archive: {file.filename}")
-                extract_path = os.path.join(temp_dir, "extracted_" + file.filename)
-                os.makedirs(extract_path, exist_ok=True)
-                
-                try:
-                    with zipfile.ZipFile(file_path, 'r') as zip_ref:
-                        zip_ref.extractall(extract_path)
-                    
-                    # Walk through extracted files
-                    for root, _, extracted_files in os.walk(extract_path):
-                        for extracted_file in extracted_files:
-                            # Skip hidden files
-                            if extracted_file.startswith("."):
-                                continue
-                                
-                            full_path = os.path.join(root, extracted_file)
-                            logger.info(f"⏳ Processing extracted file: {extracted_file}")
-                            
-                            zip_docs = load_file(full_path)
-                            if zip_docs:
-                                all_docs.extend(zip_docs)
-                                file_summary.append(f"{extracted_file} (from zip)")
-                            
-                except zipfile.BadZipFile:
-                    logger.error(f"❌ Invalid ZIP file: {file.filename}")
-                finally:
-                    # Clean up extracted folder
-                    if os.path.exists(extract_path):
-                        shutil.rmtree(extract_path)
+    for upload in sources:
+        # 1. Check if ZIP: members are streamed out of the archive one by one
+        if upload.ext == ".zip":
+            logger.info(f"📦 Detected ZIP archive: {upload.name}")
+            try:
+                with upload.open() as archive:
+                    for member in iter_zip_sources(archive, upload.name):
+                        with member:
+                            logger.info(f"⏳ Processing extracted file: {member.name}")
+                            zip_docs = iter_file_cached(member, cache_stats)
+                            label = f"{os.path.basename(member.name)} (from zip)"
+                            yield from _track(zip_docs, label, file_summary, progress)
+                        
+            except zipfile.BadZipFile:
+                logger.error(f"❌ Invalid ZIP file: {upload.name}")
+                skipped.append({"file": upload.name, "reason": "Invalid ZIP file"})
+            except ArchiveLimitError as e:
+                logger.error(f"❌ ZIP rejected: {e}")
+                skipped.append({"file": upload.name, "reason": str(e)})
 
-            else:
-                # 3. Process Regular File
-                logger.info(f"⏳ Starting ingestion for {file.filename}...")
-                docs = load_file(file_path)
-                if docs:
-                    all_docs.extend(docs)
-                    file_summary.append(file.filename)
-            
-            # 4. Clean up original uploaded file
-            if os.path.exists(file_path):
-                os.remove(file_path)
-        
-        if not all_docs:
-            return {
-                "status": "warning", 
-                "message": "⚠️ No text extracted from any of the uploaded files."
-            }
-
-        # 5. Add ALL docs to Vector DB at once
-        chunk_count = add_to_vector_db(all_docs)
-        logger.info(f"✅ Ingestion finished. Added {chunk_count} chunks from {len(file_summary)} files.")
-        
-        message = f"Successfully ingested {len(file_summary)} files ({chunk_count} chunks)."
+        else:
+            # 2. Process Regular File (in memory, spilled to disk only if huge)
+            logger.info(f"⏳ Starting ingestion for {upload.name}...")
+            docs = iter_file_cached(upload, cache_stats)
+            yield from _track(docs, upload.name, file_summary, progress)
 
+def run_ingest_job(job, sources, replace=False, replaces=(), collection=DEFAULT_COLLECTION):
+    """
+    Worker-side ingestion. Pages are streamed straight into the Vector DB in
+    micro-batches, so memory stays flat no matter how many files are uploaded.
+    With `replace`, every uploaded document replaces its earlier version;
+    `replaces` are sources deleted when the new chunks are published.
+    """
+    file_summary = []
+    skipped = []
+    cache_stats = new_cache_stats()
+    
+    # 3. Stream docs into the Vector DB (split + embed + add per micro-batch)
+    docs = iter_uploaded_docs(sources, file_summary, cache_stats, skipped, job)
+    chunk_count = add_documents_stream(docs, progress=job, replace=replace, replaces=replaces, collection=collection)
+    
+    if not file_summary:
         return {
-            "filenames": file_summary, 
-            "status": "success", 
-            "message": message
+            "status": "warning", 
+            "message": "⚠️ No text extracted from any of the uploaded files.",
+            "skipped": skipped,
+            "cache": cache_stats
         }
 
+    logger.info(f"✅ Ingestion finished. Added {chunk_count} chunks from {len(file_summary)} files.")
+    
+    message = f"Successfully ingested {len(file_summary)} files ({chunk_count} chunks)."
+    dedup = job.reports.get("dedup")
+    if dedup and dedup["dropped"]:
+        message += f" Skipped {dedup['dropped']} near-duplicate chunks ({dedup['shrink_pct']}% smaller)."
+
+    return {
+        "filenames": file_summary, 
+        "status": "success", 
+        "collection": collection,
+        "message": message,
+        "skipped": skipped,
+        "cache": cache_stats
+    }
+
+def _close_all(sources):
+    for source in sources:
+        source.close()
+
+async def spool_upload(file: UploadFile):
+    """
+    Streams an upload into an IngestSource WITHOUT blocking the event loop:
+    reads are awaited chunk by chunk, and only writes that hit the disk
+    (uploads above SPILL_THRESHOLD_MB) are offloaded to a thread.
+    """
+    spooler = SourceSpooler(file.filename)
+    try:
+        await file.seek(0)
+        while True:
+            block = await file.read(COPY_BLOCK_SIZE)
+            if not block:
+                break
+            if spooler.touches_disk(len(block)):
+                await run_in_threadpool(spooler.write, block)
+            else:
+                spooler.write(block)
+    except BaseException:
+        await run_in_threadpool(spooler.abort)
+        raise
+    return spooler.finish()
+
+def check_collection(name):
+    """400 for names that can't be a collection (they become folder names)."""
+    try:
+        return validate_name(name)
+    except InvalidCollectionName as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def queue_ingest(files, replace=False, replaces=(), collection=DEFAULT_COLLECTION):
+    sources = []
+    try:
+        # Uploads are closed when this request ends, so keep our own copy
+        # (in memory, spilled to a temp file above SPILL_THRESHOLD_MB).
+        for file in files:
+            sources.append(await spool_upload(file))
+        
+        job = get_job_manager().submit(
+            [source.name for source in sources], run_ingest_job, sources, replace, replaces, collection,
+            cleanup=lambda: _close_all(sources)
+        )
+        return {"job_id": job.id, "status": job.status, "filenames": job.filenames, "collection": collection}
+
     except Exception as e:
+        await run_in_threadpool(_close_all, sources)
         logger.error(f"❌ Ingestion Failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/ingest/", status_code=202)
+async def ingest_documents(files: list[UploadFile] = File(...), replace: bool = Form(False),
+                           collection: str = Form(DEFAULT_COLLECTION)):
+    """
+    Queues an ingestion job for multiple files, including ZIP archives, and
+    returns its job id immediately. Poll GET /ingest/{job_id} for progress.
+    All parsing / OCR / embedding runs on the job workers, never on the event loop.
+    With replace=true, files already in the DB (same name) are replaced instead of added twice.
+    `collection` picks the named index the files go into (created on first use).
+    """
+    return await queue_ingest(files, replace, collection=check_collection(collection))
+
+@app.get("/ingest/{job_id}")
+def ingest_status(job_id: str):
+    """Per-file and per-stage progress / timing of an ingestion job."""
+    job = get_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job id")
+    return job.to_dict()
+
+@app.delete("/ingest/{job_id}")
+def cancel_ingest(job_id: str):
+    """Cancels a queued or running job. A cancelled job never writes to the DB."""
+    status = get_job_manager().cancel(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Unknown job id")
+    return {"job_id": job_id, "status": status}
+
 @app.post("/chat/")
-def chat_with_docs(query: str = Form(...)):
-    # Streaming Chat Endpoint
-    response_generator = ask_question(query)
+def chat_with_docs(query: str = Form(...), collection: str = Form(DEFAULT_COLLECTION)):
+    # Streaming Chat Endpoint (retrieves from one collection only)
+    response_generator = ask_question(query, check_collection(collection))
     return StreamingResponse(response_generator, media_type="text/plain")
 
 @app.delete("/clear-db/")
-def clear_database():
-    db_path = "faiss_index"
-    if os.path.exists(db_path):
-        shutil.rmtree(db_path)
+def clear_database(collection: str = Query(DEFAULT_COLLECTION)):
+    if clear_vector_db(check_collection(collection)):
         return {"status": "✅ Database cleared successfully!"}
     return {"status": "⚠️ Database was already empty."}
+
+@app.get("/documents")
+def documents(collection: str = Query(DEFAULT_COLLECTION)):
+    """Every document in the collection with its ID and live chunk count."""
+    return {"collection": collection, "documents": list_documents(check_collection(collection))}
+
+@app.delete("/documents/{doc_id}")
+def delete_documents(doc_id: str, collection: str = Query(DEFAULT_COLLECTION)):
+    """Removes one document (tombstoned now, space reclaimed by background compaction)."""
+    source = find_document(doc_id, check_collection(collection))
+    if source is None:
+        raise HTTPException(status_code=404, detail="Unknown document id")
+    return {"doc_id": doc_id, "source": source, "deleted_chunks": delete_document(source, collection)}
+
+@app.put("/documents/{doc_id}", status_code=202)
+async def replace_document(doc_id: str, files: list[UploadFile] = File(...), collection: str = Query(DEFAULT_COLLECTION)):
+    """
+    Queues an ingest of the uploaded file(s) that replaces the document: its old
+    chunks are removed when the new ones are published. Costs one file's ingest.
+    """
+    source = await run_in_threadpool(find_document, doc_id, check_collection(collection))
+    if source is None:
+        raise HTTPException(status_code=404, detail="Unknown document id")
+    return await queue_ingest(files, replace=True, replaces=[source], collection=collection)
+
+@app.get("/collections")
+def collections():
+    """Collections on disk, which ones are loaded, and their memory use vs. the budget."""
+    return list_collections()
+
+@app.get("/db/status")
+def database_status(collection: str = Query(DEFAULT_COLLECTION)):
+    """Resident index cache: load time, loads vs. cache hits, version on disk."""
+    status = get_vector_db_status(check_collection(collection))
+    if status is None:
+        raise HTTPException(status_code=404, detail="Unknown collection")
+    return status
 # @app.post("/chat/")
 # def chat_with_docs(request: QuestionRequest):
 #     """
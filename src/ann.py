@@ -0,0 +1,135 @@
+import os
+import json
+import math
+import numpy as np
+import faiss
+from src.config import (
+    VECTOR_INDEX_TYPE, ANN_MIN_CHUNKS, ANN_IVF_PQ_MIN_CHUNKS, ANN_TRAIN_SAMPLE,
+    ANN_NPROBE, ANN_EF_SEARCH, ANN_HNSW_M, ANN_PQ_M, VECTOR_PQ_M, RESCORE_FACTOR,
+)
+from src.logger import logger
+
+# Approximate (ANN) indexes for memory-mapped segments.
+# The index is an extra file next to vectors.f32; rows in the index == rows in
+# the segment, so results map straight back to text / metadata.
+ANN_FILE = "ann.faiss"
+ANN_INFO_FILE = "ann.json"
+INDEX_TYPES = ["flat", "ivf_flat", "ivf_pq", "hnsw"]
+ADD_BLOCK_ROWS = 65536
+# IVF-PQ distances are approximate: fetch more candidates and re-score them exactly
+PQ_RESCORE_FACTOR = RESCORE_FACTOR
+CODES_FILE = "codes.faiss"
+# 8-bit PQ needs 256 centroids per sub-quantizer; smaller segments fall back to SQ8
+PQ_MIN_TRAIN_ROWS = 256 * 4
+
+# Fewest vectors each trained index type can be built from: 8-bit PQ needs 256
+# training points per sub-quantizer, IVF ~39 per cluster. Smaller segments stay flat.
+MIN_TRAIN_ROWS = {"ivf_flat": 39, "ivf_pq": 256}
+
+def choose_index_type(chunks, configured=None):
+    """Index type for a segment of `chunks` vectors ("auto" picks by size)."""
+    configured = configured or VECTOR_INDEX_TYPE
+    if configured != "auto":
+        if configured not in INDEX_TYPES:
+            raise ValueError(f"Unknown VECTOR_INDEX_TYPE: {configured}")
+        # An explicit type applies to every segment, including a 10-chunk upload
+        if chunks < MIN_TRAIN_ROWS.get(configured, 0):
+            return "flat"
+        return configured
+    if chunks < ANN_MIN_CHUNKS:
+        return "flat"
+    if chunks < ANN_IVF_PQ_MIN_CHUNKS:
+        return "ivf_flat"
+    return "ivf_pq"
+
+def divisor_at_most(dim, m):
+    """Largest number of PQ sub-quantizers <= m that divides `dim`."""
+    return next(x for x in range(min(m, dim), 0, -1) if dim % x == 0)
+
+def choose_nlist(chunks, sample_size):
+    """~4 * sqrt(N) clusters, but at least ~39 training points per cluster."""
+    return max(1, min(int(4 * math.sqrt(chunks)), sample_size // 39, 65536))
+
+def train_sample(vectors, sample_size=None, seed=0):
+    """Random rows of a (memory-mapped) vector matrix, sorted so the reads stay sequential."""
+    sample_size = min(len(vectors), sample_size or ANN_TRAIN_SAMPLE)
+    rows = np.sort(np.random.default_rng(seed).choice(len(vectors), sample_size, replace=False))
+    return np.ascontiguousarray(vectors[rows], dtype=np.float32)
+
+def build_index(vectors, index_type, sample_size=None):
+    """Builds a FAISS index of `index_type` over all rows of `vectors` (trained on a sample)."""
+    count, dim = vectors.shape
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, ANN_HNSW_M)
+    else:
+        sample = train_sample(vectors, sample_size)
+        nlist = choose_nlist(count, len(sample))
+        quantizer = faiss.IndexFlatL2(dim)
+        if index_type == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+        elif index_type == "ivf_pq":
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, divisor_at_most(dim, ANN_PQ_M), 8)
+        else:
+            raise ValueError(f"No ANN index for type: {index_type}")
+        logger.info(f"🎓 Training {index_type} (nlist={nlist}) on {len(sample)} of {count} vectors...")
+        index.train(sample)
+
+    for start in range(0, count, ADD_BLOCK_ROWS):
+        index.add(np.ascontiguousarray(vectors[start:start + ADD_BLOCK_ROWS], dtype=np.float32))
+    return index
+
+def build_codes(vectors, storage, sample_size=None):
+    """
+    Compressed copy of a segment's vectors for exhaustive search over codes:
+    "sq8" = 1 byte per dimension, "pq" = VECTOR_PQ_M bytes per vector.
+    Returns (index, storage actually used).
+    """
+    count, dim = vectors.shape
+    if storage == "pq" and count < PQ_MIN_TRAIN_ROWS:
+        storage = "sq8"
+    if storage == "sq8":
+        index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_L2)
+    elif storage == "pq":
+        index = faiss.IndexPQ(dim, divisor_at_most(dim, VECTOR_PQ_M), 8, faiss.METRIC_L2)
+    else:
+        raise ValueError(f"Unknown VECTOR_STORAGE: {storage}")
+    index.train(train_sample(vectors, sample_size))
+    for start in range(0, count, ADD_BLOCK_ROWS):
+        index.add(np.ascontiguousarray(vectors[start:start + ADD_BLOCK_ROWS], dtype=np.float32))
+    return index, storage
+
+def write_ann(path, index, index_type):
+    """Saves the index into a segment folder (tmp file + rename, so readers never see half a file)."""
+    tmp_path = os.path.join(path, ANN_FILE + ".tmp")
+    faiss.write_index(index, tmp_path)
+    os.replace(tmp_path, os.path.join(path, ANN_FILE))
+    with open(os.path.join(path, ANN_INFO_FILE), "w", encoding="utf-8") as f:
+        json.dump({"type": index_type, "ntotal": index.ntotal}, f)
+
+def remove_ann(path):
+    """Back to exact flat search (e.g. VECTOR_INDEX_TYPE=flat)."""
+    for file_name in (ANN_INFO_FILE, ANN_FILE):
+        file_path = os.path.join(path, file_name)
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+def read_ann(path):
+    """Returns (index, index_type) for a segment folder, or (None, "flat") if it has no ANN index."""
+    info_path = os.path.join(path, ANN_INFO_FILE)
+    if not os.path.exists(info_path):
+        return None, "flat"
+    with open(info_path, "r", encoding="utf-8") as f:
+        index_type = json.load(f)["type"]
+    index_path = os.path.join(path, ANN_FILE)
+    if index_type.startswith("ivf"):
+        # IVF lists are memory-mapped too (shared page cache, no load time)
+        return faiss.read_index(index_path, faiss.IO_FLAG_MMAP), index_type
+    return faiss.read_index(index_path), index_type
+
+def search_params(index_type, nprobe=None, ef_search=None):
+    """Per-query search effort (None = config default)."""
+    if index_type.startswith("ivf"):
+        return faiss.SearchParametersIVF(nprobe=nprobe or ANN_NPROBE)
+    if index_type == "hnsw":
+        return faiss.SearchParametersHNSW(efSearch=ef_search or ANN_EF_SEARCH)
+    return None
@@ -0,0 +1,125 @@
+import time
+import threading
+from langchain_core.embeddings import Embeddings
+from src.config import EMBED_BATCH_TOKENS, EMBED_MAX_BATCH
+
+# Length-bucketed batching for the embedder. A transformer batch is padded to
+# its longest member, so fixed batches of 32 chunks in document order (table
+# rows next to 1000-character paragraphs) spend most of their compute on
+# padding. Instead, chunks are sorted by token length and cut into batches of
+# at most EMBED_BATCH_TOKENS padded tokens (batch size x longest chunk): many
+# short chunks per batch, few long ones. Vectors come back in the input order.
+
+# Fixed batch size used before, kept as the baseline for the padding report
+FIXED_BATCH_SIZE = 32
+
+def new_batch_stats():
+    """Real vs. padded tokens of the encoded batches (and what fixed batches would have padded)."""
+    return {"texts": 0, "batches": 0, "tokens": 0, "padded_tokens": 0, "fixed_padded_tokens": 0, "seconds": 0.0}
+
+_stats = new_batch_stats()
+_stats_lock = threading.Lock()
+
+def get_batch_stats():
+    with _stats_lock:
+        return dict(_stats)
+
+def reset_batch_stats():
+    with _stats_lock:
+        _stats.update(new_batch_stats())
+
+def merge_batch_stats(stats):
+    """Adds `stats` (e.g. from an embedding worker process) to the process-wide totals."""
+    with _stats_lock:
+        for key, value in stats.items():
+            _stats[key] += value
+
+def diff_batch_stats(after, before):
+    return {key: after[key] - before[key] for key in after}
+
+def batch_rates(stats):
+    """Tokens/s and padding waste (% of padded tokens that were padding) of a stats dict."""
+    def waste(padded):
+        return round((1 - stats["tokens"] / padded) * 100, 1) if padded else 0.0
+    return {
+        "texts": stats["texts"],
+        "batches": stats["batches"],
+        "tokens": stats["tokens"],
+        "tokens_per_s": round(stats["tokens"] / stats["seconds"], 1) if stats["seconds"] else 0.0,
+        "padding_waste_pct": waste(stats["padded_tokens"]),
+        "fixed_batch_padding_waste_pct": waste(stats["fixed_padded_tokens"]),
+    }
+
+def padded_size(lengths):
+    return len(lengths) * max(lengths) if lengths else 0
+
+def token_budget_batches(lengths, max_tokens=EMBED_BATCH_TOKENS, max_batch=EMBED_MAX_BATCH):
+    """
+    Indices of the texts, sorted by length and grouped so that each batch's
+    padded size (count x longest) stays within max_tokens. A single text longer
+    than the budget still gets its own batch.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    batches, batch = [], []
+    for i in order:
+        # Ascending order: the new text is the longest in the batch
+        if batch and (len(batch) >= max_batch or (len(batch) + 1) * lengths[i] > max_tokens):
+            batches.append(batch)
+            batch = []
+        batch.append(i)
+    if batch:
+        batches.append(batch)
+    return batches
+
+class SentenceTransformerBatches:
+    """Batch interface for HuggingFaceEmbeddings: token lengths and one-batch encode, same preprocessing."""
+    def __init__(self, embeddings):
+        self.client = embeddings._client  # the SentenceTransformer
+        self.encode_kwargs = {k: v for k, v in embeddings.encode_kwargs.items() if k != "batch_size"}
+
+    def token_lengths(self, texts):
+        encoded = self.client.tokenizer([t.replace("\n", " ") for t in texts], truncation=True,
+                                        max_length=self.client.max_seq_length)
+        return [len(ids) for ids in encoded["input_ids"]]
+
+    def embed_batch(self, texts):
+        texts = [t.replace("\n", " ") for t in texts]
+        return self.client.encode(texts, batch_size=len(texts), show_progress_bar=False, **self.encode_kwargs).tolist()
+
+class TokenBudgetEmbeddings(Embeddings):
+    """
+    Wraps an Embeddings model with a batch interface (token_lengths(texts),
+    embed_batch(texts) -> one padded batch): embed_documents() encodes
+    length-sorted, token-budgeted batches and restores the original order.
+    """
+    def __init__(self, inner, batches, max_tokens=EMBED_BATCH_TOKENS, max_batch=EMBED_MAX_BATCH):
+        self.inner = inner
+        self.batches = batches
+        self.max_tokens = max_tokens
+        self.max_batch = max_batch
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        started = time.perf_counter()
+        lengths = self.batches.token_lengths(texts)
+        vectors = [None] * len(texts)
+        padded = 0
+        groups = token_budget_batches(lengths, self.max_tokens, self.max_batch)
+        for group in groups:
+            padded += padded_size([lengths[i] for i in group])
+            for i, vector in zip(group, self.batches.embed_batch([texts[i] for i in group])):
+                vectors[i] = vector
+
+        fixed = sum(padded_size(lengths[i:i + FIXED_BATCH_SIZE]) for i in range(0, len(lengths), FIXED_BATCH_SIZE))
+        with _stats_lock:
+            _stats["texts"] += len(texts)
+            _stats["batches"] += len(groups)
+            _stats["tokens"] += sum(lengths)
+            _stats["padded_tokens"] += padded
+            _stats["fixed_padded_tokens"] += fixed
+            _stats["seconds"] += time.perf_counter() - started
+        return vectors
+
+    def embed_query(self, text):
+        return self.inner.embed_query(text)
@@ -0,0 +1,185 @@
+import os
+import re
+import shutil
+import threading
+import weakref
+from collections import OrderedDict
+from src.config import (DEFAULT_COLLECTION, COLLECTIONS_DIR, COLLECTION_MEMORY_BUDGET_MB,
+                        VECTOR_DB_VERSION_CHECK_SECONDS, DEDUP_ENABLED)
+from src.segment_store import SegmentStore, IndexCache, TMP_PREFIX
+from src.dedup import DedupIndex
+from src.logger import logger
+
+COLLECTION_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]{0,63}$")
+
+class InvalidCollectionName(ValueError):
+    """Collection names are 1-64 letters, digits, '-' or '_' (they become folder names)."""
+
+def validate_name(name):
+    if not isinstance(name, str) or not COLLECTION_NAME.match(name):
+        raise InvalidCollectionName(f"Invalid collection name: {name!r}")
+    return name
+
+class Collection:
+    """One named index: its segment store, resident index cache and dedup signatures."""
+    def __init__(self, name, path, store, check_interval=VECTOR_DB_VERSION_CHECK_SECONDS):
+        self.name = name
+        self.path = path
+        self.store = store
+        self.index_cache = IndexCache(self.store, check_interval)
+        self.dedup_index = DedupIndex(self.store) if DEDUP_ENABLED else None
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def memory_bytes(self):
+        """Resident index + dedup tables."""
+        index = self.index_cache.index
+        size = index.memory_bytes() if index is not None else 0
+        if self.dedup_index is not None:
+            size += self.dedup_index.memory_bytes()
+        return size
+
+    def release(self):
+        """Drops everything held in memory; both parts load again on next use."""
+        self.index_cache.evict()
+        if self.dedup_index is not None:
+            self.dedup_index.release()
+
+class CollectionManager:
+    """
+    Named collections with lazily loaded indexes:
+
+        faiss_index/                 <- the default collection
+        collections/<name>/          <- every other collection (same layout)
+
+    A collection's index is loaded on its first search. Loaded collections are
+    kept in LRU order; once their total size (index + dedup tables, see
+    Collection.memory_bytes()) exceeds the budget, the least recently used ones
+    are unloaded. Unloading only drops what is in memory, so the next search
+    simply loads it again.
+    Only resident collections are held on to: any other Collection object lives
+    as long as a caller (e.g. a running ingest) uses it. Its SegmentStore is
+    shared while anything (e.g. a background compaction) still holds it, so one
+    path never has two stores with separate locks.
+    """
+    def __init__(self, embeddings, default_path, root=COLLECTIONS_DIR,
+                 budget_mb=COLLECTION_MEMORY_BUDGET_MB, check_interval=VECTOR_DB_VERSION_CHECK_SECONDS):
+        self.embeddings = embeddings
+        self.default_path = default_path
+        self.root = root
+        self.budget_bytes = budget_mb * 1024 * 1024
+        self.check_interval = check_interval
+        self._collections = weakref.WeakValueDictionary()
+        self._stores = weakref.WeakValueDictionary()  # path -> SegmentStore
+        self._resident = OrderedDict()  # name -> (Collection, memory bytes), least recently used first
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def path(self, name):
+        if name == DEFAULT_COLLECTION:
+            return self.default_path
+        return os.path.join(self.root, validate_name(name))
+
+    def get(self, name=DEFAULT_COLLECTION, create=True):
+        """
+        The Collection object (cheap: nothing is loaded). With create=False,
+        None for a collection that doesn't exist on disk, so lookups of unknown
+        names don't pile up Collection objects.
+        """
+        path = self.path(name)
+        with self._lock:
+            collection = self._collections.get(name)
+            if collection is None:
+                if not create and not os.path.exists(path):
+                    return None
+                store = self._stores.get(path)
+                if store is None:
+                    store = self._stores[path] = SegmentStore(path, self.embeddings)
+                collection = Collection(name, path, store, self.check_interval)
+                self._collections[name] = collection
+            return collection
+
+    def names(self):
+        """Collections that exist on disk."""
+        names = [DEFAULT_COLLECTION] if os.path.exists(self.default_path) else []
+        if os.path.isdir(self.root):
+            names += sorted(n for n in os.listdir(self.root)
+                            if COLLECTION_NAME.match(n) and n != DEFAULT_COLLECTION)
+        return names
+
+    def get_index(self, name=DEFAULT_COLLECTION):
+        """The collection's resident index (None if it is empty / doesn't exist)."""
+        collection = self.get(name, create=False)
+        if collection is None:
+            return None
+        index = collection.index_cache.get()
+        self._account(collection)
+        return index
+
+    def touch(self, name):
+        """Re-counts a collection's memory after it grew outside get_index() (an ingest loads its dedup tables)."""
+        collection = self.get(name, create=False)
+        if collection is not None:
+            self._account(collection)
+
+    def _account(self, collection):
+        size = collection.memory_bytes()
+        with self._lock:
+            if not size:
+                self._resident.pop(collection.name, None)
+                return
+            self._resident[collection.name] = (collection, size)
+            self._resident.move_to_end(collection.name)
+            self._evict_over_budget(keep=collection.name)
+
+    def _evict_over_budget(self, keep):
+        while sum(size for _, size in self._resident.values()) > self.budget_bytes and len(self._resident) > 1:
+            name = next(n for n in self._resident if n != keep)
+            collection, size = self._resident.pop(name)
+            collection.release()
+            self.evictions += 1
+            logger.info(f"♻️ Unloaded collection '{name}' ({size / 1024 / 1024:.1f} MB) to stay under the memory budget")
+
+    def unload(self, name):
+        """Drops a collection's resident index and dedup tables (e.g. after it was cleared)."""
+        with self._lock:
+            self._resident.pop(name, None)
+            collection = self._collections.get(name)
+        if collection is not None:
+            collection.release()
+
+    def drop(self, name):
+        """
+        Deletes a whole collection. Returns False if it didn't exist.
+        The folder itself goes only if no ingest is still writing into it
+        (see SegmentStore.clear()): such an ingest publishes into the empty collection.
+        """
+        collection = self.get(name, create=False)
+        if collection is None:
+            return False
+        existed = collection.store.clear()
+        if collection.dedup_index is not None:
+            collection.dedup_index.reset()
+        self.unload(name)
+        if name != DEFAULT_COLLECTION:
+            with collection.store.lock:
+                segments_dir = collection.store.segments_dir
+                in_flight = os.path.isdir(segments_dir) and any(
+                    entry.startswith(TMP_PREFIX) for entry in os.listdir(segments_dir))
+                if not in_flight:
+                    shutil.rmtree(collection.path, ignore_errors=True)
+            with self._lock:
+                self._collections.pop(name, None)
+        return existed
+
+    def status(self):
+        with self._lock:
+            resident = {name: size for name, (_, size) in self._resident.items()}
+        return {
+            "collections": self.names(),
+            "resident": {name: round(size / 1024 / 1024, 2) for name, size in resident.items()},
+            "resident_mb": round(sum(resident.values()) / 1024 / 1024, 2),
+            "budget_mb": round(self.budget_bytes / 1024 / 1024, 2),
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,250 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# ==========================================
+# PDF EXTRACTION
+# ==========================================
+# Number of worker processes used for page-parallel PDF extraction.
+# Set to 1 to force the serial path.
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(os.cpu_count() or 1)))
+
+# Small PDFs are not worth the process start-up cost.
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "8"))
+
+# Upper bound on pages per shard. Smaller shards balance uneven pages
+# (e.g. scanned pages that need OCR) better across workers.
+PDF_PAGES_PER_SHARD = int(os.getenv("PDF_PAGES_PER_SHARD", "8"))
+
+# ==========================================
+# OCR
+# ==========================================
+# Concurrent tesseract processes per Python process. Note that every PDF
+# worker process gets its own OCR pool (PDF_WORKERS x OCR_WORKERS in total).
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "4"))
+
+# Pages waiting for a free OCR worker. Submitting blocks when the queue is full,
+# which bounds the number of rendered pixmaps held in memory.
+OCR_QUEUE_SIZE = int(os.getenv("OCR_QUEUE_SIZE", "8"))
+
+# Scanned pages are rendered so that their long side is roughly this many pixels
+# (~200 DPI for A4/Letter), clamped to [OCR_MIN_DPI, OCR_MAX_DPI].
+OCR_TARGET_LONG_SIDE_PX = int(os.getenv("OCR_TARGET_LONG_SIDE_PX", "2300"))
+OCR_MIN_DPI = int(os.getenv("OCR_MIN_DPI", "100"))
+OCR_MAX_DPI = int(os.getenv("OCR_MAX_DPI", "300"))
+
+# ==========================================
+# EXTRACTION CACHE
+# ==========================================
+# Extracted page Documents are cached on disk, keyed by file content hash,
+# so re-uploading the same file skips parsing and OCR.
+EXTRACTION_CACHE_ENABLED = os.getenv("EXTRACTION_CACHE_ENABLED", "true").lower() == "true"
+EXTRACTION_CACHE_DIR = os.getenv("EXTRACTION_CACHE_DIR", "extraction_cache")
+# Least recently used entries are evicted beyond this size.
+EXTRACTION_CACHE_MAX_MB = int(os.getenv("EXTRACTION_CACHE_MAX_MB", "1024"))
+
+# ==========================================
+# STREAMING INGESTION
+# ==========================================
+# Chunks are embedded and added to the index in micro-batches of this size,
+# so peak memory doesn't grow with the size of the upload.
+EMBED_MICRO_BATCH_CHUNKS = int(os.getenv("EMBED_MICRO_BATCH_CHUNKS", "256"))
+# Inside a micro-batch, chunks are sorted by token length and sent to the model in
+# batches of at most EMBED_BATCH_TOKENS padded tokens (chunks x longest chunk)
+# instead of fixed batches of 32, so short chunks aren't padded to long ones.
+EMBED_BUCKETING = os.getenv("EMBED_BUCKETING", "true").lower() == "true"
+EMBED_BATCH_TOKENS = int(os.getenv("EMBED_BATCH_TOKENS", "8192"))
+EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", "128"))
+
+# ==========================================
+# UPLOADS & ZIP ARCHIVES
+# ==========================================
+# Uploads and ZIP members up to this size are parsed straight from memory,
+# bigger ones are spilled to a temp file first.
+SPILL_THRESHOLD_MB = int(os.getenv("SPILL_THRESHOLD_MB", "64"))
+SPILL_DIR = os.getenv("SPILL_DIR") or None  # None = system temp dir
+
+# Guard rails so one archive can't exhaust the node (zip bombs, millions of tiny files)
+ZIP_MAX_MEMBERS = int(os.getenv("ZIP_MAX_MEMBERS", "2000"))
+ZIP_MAX_UNCOMPRESSED_MB = int(os.getenv("ZIP_MAX_UNCOMPRESSED_MB", "2048"))
+
+# ==========================================
+# TABULAR FILES (CSV / XLSX)
+# ==========================================
+# Rows are read in chunks of this size, and each chunk becomes one Document
+# (with row_start / row_end metadata) instead of one giant blob per file.
+TABLE_ROWS_PER_DOC = int(os.getenv("TABLE_ROWS_PER_DOC", "200"))
+
+# ==========================================
+# BACKGROUND INGESTION JOBS
+# ==========================================
+# Ingest jobs run in this many worker threads (writes to the Vector DB are serialized).
+INGEST_JOB_WORKERS = int(os.getenv("INGEST_JOB_WORKERS", "2"))
+# Finished jobs kept around for GET /ingest/{job_id}
+INGEST_JOB_HISTORY = int(os.getenv("INGEST_JOB_HISTORY", "200"))
+
+# ==========================================
+# PDF TABLE DETECTION
+# ==========================================
+# Tier 1 (prefilter): a page needs at least this many horizontal AND vertical
+# ruling segments in its vector drawings before find_tables() runs on it.
+# find_tables() only detects ruled tables, so pages without ruling lines are skipped.
+TABLE_MIN_RULING_LINES = int(os.getenv("TABLE_MIN_RULING_LINES", "2"))
+# Segments shorter than this (in PDF points) are ignored (underlines, bullets, ticks).
+TABLE_MIN_LINE_LENGTH = float(os.getenv("TABLE_MIN_LINE_LENGTH", "10"))
+
+# ==========================================
+# SEGMENTED VECTOR STORE
+# ==========================================
+# Every ingest is written as a new, small FAISS segment. Segments with fewer
+# chunks than SEGMENT_SMALL_CHUNKS are merged in the background once there
+# are at least SEGMENT_COMPACT_MIN_SEGMENTS of them.
+SEGMENT_COMPACTION_ENABLED = os.getenv("SEGMENT_COMPACTION_ENABLED", "true").lower() == "true"
+SEGMENT_SMALL_CHUNKS = int(os.getenv("SEGMENT_SMALL_CHUNKS", "50000"))
+# While an ingest is written, its segment's metadata columns and BM25 postings are
+# held in memory: past this many chunks the segment is finished and a new one
+# started (all of them are published together when the ingest completes).
+SEGMENT_MAX_BUILD_CHUNKS = int(os.getenv("SEGMENT_MAX_BUILD_CHUNKS", "50000"))
+SEGMENT_COMPACT_MIN_SEGMENTS = int(os.getenv("SEGMENT_COMPACT_MIN_SEGMENTS", "8"))
+# Deleted / replaced documents are only tombstoned; a segment is rewritten without
+# them once at least this share of its chunks is deleted (fully deleted ones are dropped).
+SEGMENT_MAX_DELETED_RATIO = float(os.getenv("SEGMENT_MAX_DELETED_RATIO", "0.2"))
+
+# The loaded index stays resident in the API process. The on-disk VERSION
+# marker (bumped by ingest / compaction / clear) is checked at most this often.
+VECTOR_DB_VERSION_CHECK_SECONDS = float(os.getenv("VECTOR_DB_VERSION_CHECK_SECONDS", "1.0"))
+
+# ==========================================
+# APPROXIMATE SEARCH (ANN INDEXES)
+# ==========================================
+# Index type per segment: "auto", "flat", "ivf_flat", "ivf_pq" or "hnsw".
+# auto: exact flat search below ANN_MIN_CHUNKS, IVF-Flat above it and
+# IVF-PQ from ANN_IVF_PQ_MIN_CHUNKS on. ANN indexes are built in the background.
+VECTOR_INDEX_TYPE = os.getenv("VECTOR_INDEX_TYPE", "auto")
+ANN_MIN_CHUNKS = int(os.getenv("ANN_MIN_CHUNKS", "100000"))
+ANN_IVF_PQ_MIN_CHUNKS = int(os.getenv("ANN_IVF_PQ_MIN_CHUNKS", "2000000"))
+# IVF / PQ codebooks are trained on a random sample of this many vectors
+ANN_TRAIN_SAMPLE = int(os.getenv("ANN_TRAIN_SAMPLE", "100000"))
+# Default per-query search effort (can be overridden per query)
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "16"))
+ANN_EF_SEARCH = int(os.getenv("ANN_EF_SEARCH", "64"))
+ANN_HNSW_M = int(os.getenv("ANN_HNSW_M", "32"))
+# PQ sub-quantizers (must divide the embedding dimension; 384 / 48 = 8 dims each)
+ANN_PQ_M = int(os.getenv("ANN_PQ_M", "48"))
+
+# ==========================================
+# COMPRESSED VECTOR STORAGE
+# ==========================================
+# How segment vectors are searched: "float32" (exact), "sq8" (int8 scalar
+# quantization, 4x smaller) or "pq" (product quantization, VECTOR_PQ_M bytes
+# per vector: 96 bytes = 16x smaller for 384-d). Compressed codes are held in RAM.
+VECTOR_STORAGE = os.getenv("VECTOR_STORAGE", "float32")
+VECTOR_PQ_M = int(os.getenv("VECTOR_PQ_M", "96"))
+# Keep float16 originals on disk (memory-mapped) to re-score the shortlist exactly.
+VECTOR_KEEP_FLOAT16 = os.getenv("VECTOR_KEEP_FLOAT16", "true").lower() == "true"
+# Compressed / PQ searches fetch k x this many candidates, re-score them exactly and keep the top k.
+RESCORE_FACTOR = int(os.getenv("RESCORE_FACTOR", "4"))
+
+# ==========================================
+# EMBEDDING CACHE
+# ==========================================
+# Chunk embeddings are cached on disk, keyed by (model, normalized chunk text hash),
+# so repeated boilerplate / re-sent documents are never encoded twice.
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "embedding_cache")
+
+# ==========================================
+# NEAR-DUPLICATE SUPPRESSION
+# ==========================================
+# Chunks whose estimated Jaccard similarity (MinHash over character shingles)
+# to an indexed chunk of the same document, or to one kept earlier in the same
+# ingest, is >= DEDUP_THRESHOLD are not embedded or indexed. Off by default.
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "false").lower() == "true"
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.9"))
+# "drop" discards duplicates; "merge" also records each copy's source / page in the
+# kept chunk's "duplicates" metadata (when both come from the same ingest).
+DEDUP_MODE = os.getenv("DEDUP_MODE", "drop")
+DEDUP_NUM_PERM = int(os.getenv("DEDUP_NUM_PERM", "64"))
+DEDUP_SHINGLE = int(os.getenv("DEDUP_SHINGLE", "5"))
+
+# ==========================================
+# COLLECTIONS
+# ==========================================
+# Named collections, each with its own on-disk index. The default collection
+# keeps using faiss_index/ (where everything lived before collections existed).
+DEFAULT_COLLECTION = os.getenv("DEFAULT_COLLECTION", "default")
+COLLECTIONS_DIR = os.getenv("COLLECTIONS_DIR", "collections")
+# Loaded indexes stay resident until their total size exceeds this budget;
+# then the least recently used collections are unloaded (and lazily reloaded).
+COLLECTION_MEMORY_BUDGET_MB = int(os.getenv("COLLECTION_MEMORY_BUDGET_MB", "2048"))
+
+# ==========================================
+# MODEL LOADING
+# ==========================================
+# Models (embeddings, Cross-Encoder, Groq clients) load lazily on first use.
+# With warm-up on, they are loaded in a background thread at server start-up,
+# so the API answers immediately and /health/ready turns 200 once they're in.
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "true").lower() == "true"
+# Re-ranker (hub name or local folder)
+CROSS_ENCODER_MODEL = os.getenv("CROSS_ENCODER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+
+# ==========================================
+# EMBEDDING BACKEND
+# ==========================================
+# "torch" runs HuggingFaceEmbeddings (sentence-transformers). "onnx" runs the
+# same model exported to ONNX through onnxruntime (exported on first use into
+# ONNX_MODEL_DIR); faster on CPU-only nodes, and ONNX_QUANTIZE=true uses int8 weights.
+# Sentence-transformers model (hub name or local folder)
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "BAAI/bge-small-en-v1.5")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "onnx_models")
+ONNX_QUANTIZE = os.getenv("ONNX_QUANTIZE", "false").lower() == "true"
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", "0"))  # 0 = onnxruntime default (all cores)
+# Export check vs. the torch outputs: fp32 must match within this absolute difference,
+# int8 must keep at least this cosine similarity to the torch vectors.
+ONNX_MAX_ABS_DIFF = float(os.getenv("ONNX_MAX_ABS_DIFF", "1e-4"))
+ONNX_INT8_MIN_COSINE = float(os.getenv("ONNX_INT8_MIN_COSINE", "0.99"))
+
+# ==========================================
+# EMBEDDING WORKER POOL
+# ==========================================
+# Big ingests on CPU: once one ingest has encoded EMBED_POOL_MIN_CHUNKS chunks,
+# the rest are embedded by EMBED_POOL_WORKERS processes, each loading the model
+# once and taking tasks of up to EMBED_POOL_TASK_CHUNKS chunks from a shared
+# queue. 0 or 1 worker turns the pool off (it's never used on a GPU).
+EMBED_POOL_WORKERS = int(os.getenv("EMBED_POOL_WORKERS", str(max((os.cpu_count() or 1) // 4, 1))))
+EMBED_POOL_MIN_CHUNKS = int(os.getenv("EMBED_POOL_MIN_CHUNKS", "2000"))
+EMBED_POOL_TASK_CHUNKS = int(os.getenv("EMBED_POOL_TASK_CHUNKS", "64"))
+# Threads per worker (0 = one per core of its affinity group)
+EMBED_POOL_THREADS = int(os.getenv("EMBED_POOL_THREADS", "0"))
+# "auto" pins each worker to an equal share of the cores, "off" doesn't pin,
+# or explicit core groups, one per worker, e.g. "0-3;4-7"
+EMBED_POOL_AFFINITY = os.getenv("EMBED_POOL_AFFINITY", "auto")
+
+# ==========================================
+# INFERENCE SIDECAR
+# ==========================================
+# With INFERENCE_SOCKET set, API workers don't load the embedder / Cross-Encoder:
+# they call `python -m src.inference_server` on this Unix socket, which holds one
+# copy of each model and runs concurrent requests as one batch. A batch is run
+# INFERENCE_MAX_WAIT_MS after its first request, or sooner once it is full.
+INFERENCE_SOCKET = os.getenv("INFERENCE_SOCKET", "")
+INFERENCE_MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", "5"))
+INFERENCE_MAX_QUERIES = int(os.getenv("INFERENCE_MAX_QUERIES", "64"))  # queries per embed batch
+INFERENCE_MAX_PAIRS = int(os.getenv("INFERENCE_MAX_PAIRS", "256"))  # (query, passage) pairs per rerank batch
+INFERENCE_TIMEOUT_SECONDS = float(os.getenv("INFERENCE_TIMEOUT_SECONDS", "300"))
+
+# ==========================================
+# HYBRID RETRIEVAL
+# ==========================================
+# Every segment also gets a BM25 (keyword) index of its chunks, written at
+# ingest next to its vectors. Chat retrieval fuses the dense top-k with the
+# BM25 top-LEXICAL_K by reciprocal rank (sum of 1 / (RRF_K + rank)), so exact
+# identifiers (part numbers, clause IDs, error codes) make it to the re-ranker
+# without widening k.
+HYBRID_SEARCH_ENABLED = os.getenv("HYBRID_SEARCH_ENABLED", "true").lower() == "true"
+LEXICAL_K = int(os.getenv("LEXICAL_K", "12"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
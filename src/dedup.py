@@ -0,0 +1,394 @@
+import os
+import json
+import hashlib
+import threading
+import numpy as np
+from src.config import DEDUP_THRESHOLD, DEDUP_MODE, DEDUP_NUM_PERM, DEDUP_SHINGLE
+from src.logger import logger
+
+# Near-duplicate chunk detection with MinHash LSH:
+#   1. every chunk -> set of character shingles (DEDUP_SHINGLE chars of normalized text)
+#   2. shingles -> MinHash signature (DEDUP_NUM_PERM 32-bit minimums, one per hash function)
+#   3. signature -> `bands` band keys of `rows` values each; chunks sharing any band key
+#      are candidates, confirmed when the estimated Jaccard similarity >= threshold.
+# Band keys are mixed with a hash of the chunk's source, so a chunk is only ever
+# a duplicate of a chunk of the SAME document (repeated headers / boilerplate, a
+# re-upload of the same file). Dropping a copy of another document's chunk would
+# lose content once that document is deleted or replaced.
+# Hash functions are seeded, so signatures stay comparable across restarts.
+HASH_SEED = 1729
+MAX_SHINGLE = 8  # shingles are packed into one uint64
+MODES = ("drop", "merge")
+# Rough Python overhead per row of `sources` (dict + strings) and per recently added band key
+SOURCE_ROW_BYTES = 300
+RECENT_KEY_BYTES = 100
+
+def normalize(text):
+    return " ".join(text.lower().split())
+
+def shingles(text, size=DEDUP_SHINGLE):
+    """Unique `size`-byte shingles of the normalized text, packed as uint64."""
+    data = np.frombuffer(normalize(text).encode("utf-8"), dtype=np.uint8).astype(np.uint64)
+    if len(data) < size:
+        data = np.concatenate([data, np.zeros(size - len(data), dtype=np.uint64)])
+    count = len(data) - size + 1
+    grams = np.zeros(count, dtype=np.uint64)
+    for i in range(size):
+        grams = (grams << np.uint64(8)) | data[i:i + count]
+    return np.unique(grams)
+
+def choose_bands(num_perm, threshold):
+    """
+    (bands, rows) with bands * rows == num_perm whose LSH threshold
+    (1/bands)^(1/rows) is the highest one still <= `threshold`, so candidates
+    are found reliably and the exact signature check filters the rest.
+    """
+    best = (num_perm, 1)
+    best_t = 0.0
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        t = (1 / bands) ** (1 / rows)
+        if best_t < t <= threshold:
+            best, best_t = (bands, rows), t
+    return best
+
+class MinHasher:
+    """Computes MinHash signatures and LSH band keys (multiply-shift hashing, vectorized)."""
+    def __init__(self, num_perm=DEDUP_NUM_PERM, shingle=DEDUP_SHINGLE, threshold=DEDUP_THRESHOLD, seed=HASH_SEED):
+        if not 1 <= shingle <= MAX_SHINGLE:
+            raise ValueError(f"DEDUP_SHINGLE must be between 1 and {MAX_SHINGLE}")
+        self.num_perm = num_perm
+        self.shingle = shingle
+        self.bands, self.rows = choose_bands(num_perm, threshold)
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, 2**63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self.b = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64)
+        self.band_mix = rng.integers(1, 2**63, size=self.rows, dtype=np.uint64) | np.uint64(1)
+
+    def signature(self, text):
+        grams = shingles(text, self.shingle)
+        hashed = (grams[:, None] * self.a[None, :] + self.b[None, :]) >> np.uint64(32)
+        return hashed.min(axis=0).astype(np.uint32)
+
+    def signatures(self, texts):
+        if not texts:
+            return np.empty((0, self.num_perm), dtype=np.uint32)
+        return np.stack([self.signature(text) for text in texts])
+
+    def band_keys(self, signatures):
+        """(n, num_perm) signatures -> (n, bands) uint64 band keys."""
+        banded = signatures.reshape(len(signatures), self.bands, self.rows).astype(np.uint64)
+        return (banded * self.band_mix).sum(axis=2, dtype=np.uint64)
+
+def source_key(source):
+    """Stable 64-bit hash of a chunk's source (band keys are scoped to it)."""
+    digest = hashlib.blake2b(str(source or "").encode("utf-8"), digest_size=8).digest()
+    return np.uint64(int.from_bytes(digest, "little"))
+
+def scoped_keys(band_keys, source):
+    return band_keys ^ source_key(source)
+
+def similarity(signature, other):
+    """Estimated Jaccard similarity of two signatures."""
+    return float(np.mean(signature == other))
+
+class BandIndex:
+    """
+    band key -> first row with that key, one table per band.
+    Bulk-loaded rows live in sorted numpy arrays (12 bytes / key);
+    rows added afterwards go to small dicts until the next rebuild.
+    """
+    def __init__(self, bands):
+        self.bands = bands
+        self.keys = [np.empty(0, dtype=np.uint64) for _ in range(bands)]
+        self.rows = [np.empty(0, dtype=np.int64) for _ in range(bands)]
+        self.recent = [{} for _ in range(bands)]
+
+    def build(self, band_keys, rows):
+        """`band_keys[i]` belongs to row `rows[i]`."""
+        rows = np.asarray(rows, dtype=np.int64)
+        for band in range(self.bands):
+            keys, first = np.unique(band_keys[:, band], return_index=True)
+            self.keys[band] = keys
+            self.rows[band] = rows[first]
+            self.recent[band] = {}
+
+    def add(self, keys, row):
+        for band, key in enumerate(keys.tolist()):
+            if self._lookup(band, key) is None:
+                self.recent[band][key] = row
+
+    def _lookup(self, band, key):
+        row = self.recent[band].get(key)
+        if row is not None:
+            return row
+        keys = self.keys[band]
+        i = np.searchsorted(keys, np.uint64(key))
+        if i < len(keys) and int(keys[i]) == key:
+            return int(self.rows[band][i])
+        return None
+
+    def candidates(self, keys):
+        found = []
+        for band, key in enumerate(keys.tolist()):
+            row = self._lookup(band, key)
+            if row is not None and row not in found:
+                found.append(row)
+        return found
+
+class DedupIndex:
+    """
+    Persisted MinHash signatures of every indexed chunk, next to the vector store:
+
+        faiss_index/dedup/
+            meta.json        {"num_perm", "shingle", "seed"}
+            signatures.u32   row i = signature of indexed chunk i
+            sources.jsonl    line i = {"source", "page"} of chunk i
+            deleted.i64      rows of deleted / replaced documents
+
+    Rows are appended only after their segment was published, so a cancelled
+    ingest never suppresses future chunks, and rows of deleted documents are
+    ignored. The band tables (live rows only) are rebuilt in memory on first
+    use; a store that predates the index is backfilled once.
+    """
+    def __init__(self, store, hasher=None):
+        self.store = store
+        self.hasher = hasher or MinHasher()
+        self.path = os.path.join(store.root, "dedup")
+        self.meta_path = os.path.join(self.path, "meta.json")
+        self.signatures_path = os.path.join(self.path, "signatures.u32")
+        self.sources_path = os.path.join(self.path, "sources.jsonl")
+        self.deleted_path = os.path.join(self.path, "deleted.i64")
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Forgets the in-memory tables (e.g. after the DB was cleared)."""
+        self.loaded = False
+        self.signatures = np.empty((0, self.hasher.num_perm), dtype=np.uint32)
+        self.sources = []
+        self.dead = set()
+        self.bands = BandIndex(self.hasher.bands)
+
+    def release(self):
+        """Frees the in-memory tables (memory budget); they load again on next use."""
+        with self._lock:
+            self.reset()
+
+    def memory_bytes(self):
+        """Rough size of the in-memory tables (0 until first use)."""
+        if not self.loaded:
+            return 0
+        bands = self.bands
+        band_bytes = sum(keys.nbytes + rows.nbytes for keys, rows in zip(bands.keys, bands.rows))
+        recent = sum(len(table) for table in bands.recent) * RECENT_KEY_BYTES
+        return self.signatures.nbytes + band_bytes + recent + len(self.sources) * SOURCE_ROW_BYTES
+
+    def _meta(self):
+        return {"num_perm": self.hasher.num_perm, "shingle": self.hasher.shingle, "seed": HASH_SEED}
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def _ensure_loaded(self):
+        if self.loaded and os.path.exists(self.meta_path):
+            return
+        self.reset()
+        meta = None
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        if meta != self._meta():
+            self._backfill()
+        else:
+            self._read()
+        self._build_bands()
+        self.loaded = True
+
+    def _build_bands(self):
+        live = [row for row in range(len(self.signatures)) if row not in self.dead]
+        band_keys = self.hasher.band_keys(self.signatures[live])
+        hashes = {}
+        for i, row in enumerate(live):
+            source = self.sources[row]["source"]
+            if source not in hashes:
+                hashes[source] = source_key(source)
+            band_keys[i] ^= hashes[source]
+        self.bands = BandIndex(self.hasher.bands)
+        self.bands.build(band_keys, live)
+
+    def _read(self):
+        row_bytes = self.hasher.num_perm * 4
+        for path in (self.signatures_path, self.sources_path, self.deleted_path):
+            open(path, "ab").close()
+        with open(self.sources_path, "r", encoding="utf-8") as f:
+            sources = [line for line in f.read().split("\n") if line]
+        count = min(len(sources), os.path.getsize(self.signatures_path) // row_bytes)
+        # Drop a half-written tail (crash between the two appends)
+        with open(self.signatures_path, "r+b") as f:
+            f.truncate(count * row_bytes)
+            self.signatures = np.frombuffer(f.read(), dtype=np.uint32).reshape(count, self.hasher.num_perm).copy()
+        if len(sources) != count:
+            with open(self.sources_path, "w", encoding="utf-8") as f:
+                f.writelines(line + "\n" for line in sources[:count])
+        self.sources = [json.loads(line) for line in sources[:count]]
+        self.dead = set(np.fromfile(self.deleted_path, dtype=np.int64).tolist())
+        logger.info(f"♻️ Dedup index: {count} chunk signatures loaded")
+
+    def _backfill(self):
+        """(Re)computes signatures for all chunks already in the store."""
+        os.makedirs(self.path, exist_ok=True)
+        for path in (self.signatures_path, self.sources_path, self.deleted_path):
+            open(path, "wb").close()
+        db = self.store.load()
+        signatures, sources = [], []
+        for segment in (db.segments if db is not None else []):
+            segment = segment[1]
+            for row in segment.live_rows():
+                metadata = segment.get_metadata(row)
+                signatures.append(self.hasher.signature(segment.get_text(row)))
+                sources.append({"source": metadata.get("source"), "page": metadata.get("page")})
+        if signatures:
+            self._append(np.stack(signatures), sources)
+        with open(self.meta_path, "w", encoding="utf-8") as f:
+            json.dump(self._meta(), f)
+        if signatures:
+            logger.info(f"♻️ Dedup index backfilled with {len(signatures)} existing chunks")
+
+    def _append(self, signatures, sources):
+        with open(self.signatures_path, "ab") as f:
+            f.write(np.ascontiguousarray(signatures, dtype=np.uint32).tobytes())
+        with open(self.sources_path, "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(source) + "\n" for source in sources)
+        self.signatures = np.concatenate([self.signatures, signatures])
+        self.sources.extend(sources)
+
+    def find(self, signature, keys, threshold, source):
+        """Row of a live indexed chunk of `source` at least `threshold` similar, or None. `keys`: scoped band keys."""
+        with self._lock:
+            self._ensure_loaded()
+            for row in self.bands.candidates(keys):
+                if row in self.dead or self.sources[row]["source"] != source:
+                    continue
+                if similarity(signature, self.signatures[row]) >= threshold:
+                    return row
+        return None
+
+    def forget(self, sources):
+        """Marks the rows of deleted / replaced documents dead. Returns how many."""
+        sources = set(sources)
+        with self._lock:
+            self._ensure_loaded()
+            rows = [row for row, source in enumerate(self.sources)
+                    if source["source"] in sources and row not in self.dead]
+            if rows:
+                with open(self.deleted_path, "ab") as f:
+                    f.write(np.asarray(rows, dtype=np.int64).tobytes())
+                self.dead.update(rows)
+                # Dead rows leave the band tables, so a later version of the document is found again
+                self._build_bands()
+        return len(rows)
+
+    def commit(self, signatures, sources):
+        """Adds the chunks of a published segment."""
+        if not len(signatures):
+            return
+        with self._lock:
+            self._ensure_loaded()
+            start = len(self.signatures)
+            self._append(signatures, sources)
+            for i, keys in enumerate(self.hasher.band_keys(signatures)):
+                self.bands.add(scoped_keys(keys, sources[i]["source"]), start + i)
+
+    def session(self, threshold=DEDUP_THRESHOLD, mode=DEDUP_MODE, replace=False, replaces=()):
+        return DedupSession(self, threshold, mode, replace, replaces)
+
+class DedupSession:
+    """
+    Near-duplicate filter for ONE ingest. Each chunk is checked against the
+    indexed chunks and the chunks kept earlier in this ingest, of the same source.
+      drop  - duplicates are discarded
+      merge - copies of a chunk kept earlier in this ingest are folded into its
+              "duplicates" metadata (page of each copy); copies of already-stored
+              chunks (or of chunks in a segment finished mid-ingest, see seal())
+              are discarded as with drop
+    With `replace` every source seen in the ingest replaces its stored version
+    (plus the explicit `replaces`), so a revision is never dropped as a copy of itself.
+    """
+    def __init__(self, index, threshold=DEDUP_THRESHOLD, mode=DEDUP_MODE, replace=False, replaces=()):
+        if mode not in MODES:
+            raise ValueError(f"DEDUP_MODE must be one of {MODES}, got {mode!r}")
+        self.index = index
+        self.hasher = index.hasher
+        self.threshold = threshold
+        self.mode = mode
+        # Chunks of documents this ingest replaces are not duplicates
+        self.replace_all = replace
+        self.replacing = set(replaces)
+        self.local = BandIndex(self.hasher.bands)
+        self.signatures = []
+        self.sources = []
+        self.kept = {}  # session row -> kept chunk's metadata (merge mode)
+        self.seen = 0
+        self.dropped = 0
+        self.merged = 0
+
+    def filter(self, chunks):
+        """Returns the chunks to index (same order), minus near-duplicates."""
+        signatures = self.hasher.signatures([chunk.page_content for chunk in chunks])
+        band_keys = self.hasher.band_keys(signatures)
+        kept = []
+        for chunk, signature, keys in zip(chunks, signatures, band_keys):
+            self.seen += 1
+            source = chunk.metadata.get("source")
+            if self.replace_all:
+                self.replacing.add(source)
+            keys = scoped_keys(keys, source)
+            match = None
+            for row in self.local.candidates(keys):
+                if self.sources[row]["source"] == source and similarity(signature, self.signatures[row]) >= self.threshold:
+                    match = row
+                    break
+            if (match is None and source not in self.replacing
+                    and self.index.find(signature, keys, self.threshold, source) is not None):
+                match = -1
+            if match is None:
+                row = len(self.signatures)
+                self.signatures.append(signature)
+                self.sources.append({"source": source, "page": chunk.metadata.get("page")})
+                self.local.add(keys, row)
+                if self.mode == "merge":
+                    # The list goes into the segment with the chunk; copies found later are appended to it
+                    chunk.metadata["duplicates"] = []
+                    self.kept[row] = chunk.metadata
+                kept.append(chunk)
+                continue
+
+            self.dropped += 1
+            if self.mode == "merge" and match in self.kept:
+                self.kept[match]["duplicates"].append({"source": source, "page": chunk.metadata.get("page")})
+                self.merged += 1
+        return kept
+
+    def seal(self):
+        """The kept chunks so far were written out (segment finished): stop merging into them."""
+        self.kept = {}
+
+    def commit(self):
+        """Call once the segment holding the kept chunks was published."""
+        if self.replacing:
+            self.index.forget(self.replacing)
+        if self.signatures:
+            self.index.commit(np.stack(self.signatures), self.sources)
+
+    def stats(self):
+        kept = self.seen - self.dropped
+        return {
+            "chunks": self.seen,
+            "kept": kept,
+            "dropped": self.dropped,
+            "merged": self.merged,
+            "shrink_pct": round(self.dropped / self.seen * 100, 2) if self.seen else 0.0,
+        }
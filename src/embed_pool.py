@@ -0,0 +1,175 @@
+import os
+import math
+import time
+import queue
+import threading
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from src.config import (EMBED_POOL_WORKERS, EMBED_POOL_MIN_CHUNKS, EMBED_POOL_TASK_CHUNKS,
+                        EMBED_POOL_THREADS, EMBED_POOL_AFFINITY)
+from src.batching import get_batch_stats, diff_batch_stats, merge_batch_stats
+from src.logger import logger
+
+# Multi-process embedding for bulk ingests on CPU. One torch process scales
+# poorly across many cores for a small model like bge-small, so big ingests
+# fan out to worker processes instead: each worker is pinned to its own group
+# of cores, uses that many threads, loads the model once, and pulls batches of
+# chunks from the executor's shared queue.
+
+def parse_core_groups(spec):
+    """"0-3;4-7,9" -> [[0, 1, 2, 3], [4, 5, 6, 7, 9]]"""
+    groups = []
+    for group in spec.split(";"):
+        cores = []
+        for part in filter(None, (p.strip() for p in group.split(","))):
+            start, _, end = part.partition("-")
+            cores.extend(range(int(start), int(end or start) + 1))
+        if cores:
+            groups.append(cores)
+    return groups
+
+def core_groups(workers, affinity=EMBED_POOL_AFFINITY):
+    """Cores each worker is pinned to: equal contiguous shares ("auto"), explicit groups, or none ("off")."""
+    if affinity == "off" or not hasattr(os, "sched_getaffinity"):
+        return []
+    if affinity != "auto":
+        return parse_core_groups(affinity)
+    cpus = sorted(os.sched_getaffinity(0))
+    per_worker = max(1, len(cpus) // workers)
+    return [[cpus[(w * per_worker + i) % len(cpus)] for i in range(per_worker)] for w in range(workers)]
+
+# ==========================================
+# WORKER PROCESS
+# ==========================================
+_worker_embeddings = None
+
+def _init_worker(groups, threads, loader):
+    global _worker_embeddings
+    cores = None
+    if groups is not None:
+        try:
+            cores = groups.get_nowait()
+            os.sched_setaffinity(0, cores)
+        except (queue.Empty, OSError):
+            cores = None
+    threads = threads or (len(cores) if cores else 1)
+    # Before torch / onnxruntime are imported, so their thread pools start at this size
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    _worker_embeddings = loader(threads=threads)
+
+def _embed_task(texts):
+    before = get_batch_stats()
+    vectors = np.asarray(_worker_embeddings.embed_documents(texts), dtype=np.float32)
+    return vectors, diff_batch_stats(get_batch_stats(), before)
+
+# ==========================================
+# POOL
+# ==========================================
+class EmbeddingPool:
+    def __init__(self, loader, workers=EMBED_POOL_WORKERS, threads=EMBED_POOL_THREADS,
+                 affinity=EMBED_POOL_AFFINITY, task_chunks=EMBED_POOL_TASK_CHUNKS):
+        context = multiprocessing.get_context("spawn")
+        self.workers = workers
+        self.task_chunks = task_chunks
+        self.groups = core_groups(workers, affinity)
+        if not threads and not self.groups:
+            threads = max(1, (os.cpu_count() or 1) // workers)
+        groups = None
+        if self.groups:
+            groups = context.Queue()
+            for cores in self.groups:
+                groups.put(cores)
+        self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                                            initargs=(groups, threads, loader))
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        started = time.perf_counter()
+        # Enough tasks to keep every worker busy, at most task_chunks each
+        size = max(1, min(self.task_chunks, math.ceil(len(texts) / self.workers)))
+        futures = [self.executor.submit(_embed_task, texts[i:i + size]) for i in range(0, len(texts), size)]
+        vectors, stats = [], None
+        for future in futures:
+            task_vectors, task_stats = future.result()
+            vectors.extend(task_vectors.tolist())
+            stats = task_stats if stats is None else {k: stats[k] + task_stats[k] for k in stats}
+        if stats is not None:
+            # Workers run in parallel: throughput is over wall time, not summed worker time
+            merge_batch_stats({**stats, "seconds": time.perf_counter() - started})
+        return vectors
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_embedding_pool(loader):
+    """The process-wide worker pool (started on first use; workers load the model once)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            logger.info(f"🏭 Starting embedding pool: {EMBED_POOL_WORKERS} worker(s), affinity {EMBED_POOL_AFFINITY}")
+            _pool = EmbeddingPool(loader)
+        return _pool
+
+def reset_embedding_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+        _pool = None
+
+# ==========================================
+# PER-INGEST SWITCH
+# ==========================================
+_local = threading.local()
+
+@contextmanager
+def embedding_session():
+    """
+    Wraps one ingest (in its own thread): once it has encoded more than
+    EMBED_POOL_MIN_CHUNKS chunks, PooledEmbeddings sends the rest to the pool.
+    Yields {"chunks": encoded so far, "pooled": chunks sent to the pool, "failed": pool broke}.
+    """
+    previous = getattr(_local, "session", None)
+    _local.session = {"chunks": 0, "pooled": 0, "failed": False}
+    try:
+        yield _local.session
+    finally:
+        _local.session = previous
+
+class PooledEmbeddings(Embeddings):
+    """The local embedder, or the worker pool for the bulk of a big ingest (see embedding_session())."""
+    def __init__(self, local, loader, min_chunks=EMBED_POOL_MIN_CHUNKS, pool=None):
+        self.local = local
+        self.loader = loader
+        self.min_chunks = min_chunks
+        self.pool = pool
+
+    def embed_documents(self, texts):
+        session = getattr(_local, "session", None)
+        if session is not None:
+            session["chunks"] += len(texts)
+            if session["chunks"] > self.min_chunks and not session["failed"]:
+                if not session["pooled"]:
+                    logger.info(f"🏭 Large ingest ({session['chunks']} chunks): embedding in the worker pool")
+                try:
+                    vectors = (self.pool or get_embedding_pool(self.loader)).embed_documents(texts)
+                    session["pooled"] += len(texts)
+                    return vectors
+                except Exception as e:
+                    # A crashed worker breaks the pool: start a fresh one next time, embed here for now
+                    logger.error(f"❌ Embedding pool failed ({e}), embedding the rest of this ingest in-process")
+                    session["failed"] = True
+                    if self.pool is None:
+                        reset_embedding_pool()
+        return self.local.embed_documents(texts)
+
+    def embed_query(self, text):
+        return self.local.embed_query(text)
@@ -0,0 +1,156 @@
+import os
+import re
+import json
+import hashlib
+import threading
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from src.config import EMBEDDING_CACHE_DIR
+from src.file_lock import file_lock
+from src.logger import logger
+
+KEY_BYTES = 16
+
+def normalize_text(text):
+    """Whitespace-insensitive form of a chunk (re-flowed copies of the same text share a key)."""
+    return " ".join(text.split())
+
+def text_key(text):
+    return hashlib.blake2b(normalize_text(text).encode("utf-8"), digest_size=KEY_BYTES).digest()
+
+def model_slug(model_name):
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", model_name)
+
+class EmbeddingStore:
+    """
+    Append-only on-disk cache for one embedding model:
+
+        embedding_cache/<model>/
+            meta.json      {"model", "dim"}
+            vectors.f32    row i = embedding of key i
+            keys.bin       16-byte blake2b digest per row (the index)
+            lock           held while the files are appended to / repaired
+
+    Vectors are appended before their keys, so after a crash a row is only
+    visible once both are complete. The key -> row index lives in memory.
+    Several processes may share the store (uvicorn workers, embedding pool,
+    sidecar): appends hold the lock file and first read the keys the other
+    processes added, so a row number is always the row's real position in vectors.f32.
+    """
+    def __init__(self, model_name, cache_dir=EMBEDDING_CACHE_DIR):
+        self.model_name = model_name
+        self.path = os.path.join(cache_dir, model_slug(model_name))
+        self.vectors_path = os.path.join(self.path, "vectors.f32")
+        self.keys_path = os.path.join(self.path, "keys.bin")
+        self.meta_path = os.path.join(self.path, "meta.json")
+        self.lock_path = os.path.join(self.path, "lock")
+        self.dim = None
+        self.rows = {}
+        self._lock = threading.Lock()
+        self._reader = None
+        os.makedirs(self.path, exist_ok=True)
+        with self._lock, file_lock(self.lock_path):
+            self._refresh()
+        if self.rows:
+            logger.info(f"🧠 Embedding cache: {len(self.rows)} vectors for {self.model_name}")
+
+    def _refresh(self):
+        """Picks up rows appended since the last call (by any process). Call with the lock file held."""
+        if self.dim is None:
+            if not os.path.exists(self.meta_path):
+                return
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                self.dim = json.load(f)["dim"]
+        row_bytes = self.dim * 4
+        for path in (self.keys_path, self.vectors_path):
+            open(path, "ab").close()
+        known = len(self.rows)
+        with open(self.keys_path, "rb") as f:
+            f.seek(known * KEY_BYTES)
+            keys = f.read()
+        count = min(known + len(keys) // KEY_BYTES, os.path.getsize(self.vectors_path) // row_bytes)
+        # Drop a half-written tail (crash between the two appends): nobody else is writing now
+        for path, size in ((self.keys_path, count * KEY_BYTES), (self.vectors_path, count * row_bytes)):
+            if os.path.getsize(path) != size:
+                with open(path, "r+b") as f:
+                    f.truncate(size)
+        for row in range(known, count):
+            i = row - known
+            self.rows[keys[i * KEY_BYTES:(i + 1) * KEY_BYTES]] = row
+
+    def __len__(self):
+        return len(self.rows)
+
+    def get_many(self, keys):
+        """{key: vector} for the keys that are cached."""
+        with self._lock:
+            found = [(key, self.rows[key]) for key in keys if key in self.rows]
+            if not found:
+                return {}
+            if self._reader is None:
+                self._reader = open(self.vectors_path, "rb")
+            row_bytes = self.dim * 4
+            vectors = {}
+            for key, row in sorted(found, key=lambda item: item[1]):
+                self._reader.seek(row * row_bytes)
+                vectors[key] = np.frombuffer(self._reader.read(row_bytes), dtype=np.float32)
+            return vectors
+
+    def put_many(self, keys, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock, file_lock(self.lock_path):
+            self._refresh()
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                with open(self.meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"model": self.model_name, "dim": self.dim}, f)
+            new = {}
+            for key, vector in zip(keys, vectors):
+                if key not in self.rows and key not in new:
+                    new[key] = vector
+            if not new:
+                return
+            new = list(new.items())
+            with open(self.vectors_path, "ab") as f:
+                f.write(np.stack([vector for _, vector in new]).tobytes())
+            with open(self.keys_path, "ab") as f:
+                f.write(b"".join(key for key, _ in new))
+            for key, _ in new:
+                self.rows[key] = len(self.rows)
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an Embeddings model: embed_documents() only encodes chunks whose
+    (model, normalized text) was never seen before, across uploads and restarts.
+    Queries are passed straight through.
+    """
+    def __init__(self, inner, model_name, cache_dir=EMBEDDING_CACHE_DIR):
+        self.inner = inner
+        self.model_name = model_name
+        self.store = EmbeddingStore(model_name, cache_dir)
+        self.hits = 0
+        self.misses = 0
+
+    def embed_documents(self, texts):
+        keys = [text_key(text) for text in texts]
+        cached = self.store.get_many(keys)
+
+        # Encode each missing text once, even if it repeats inside this batch
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+        if missing:
+            vectors = self.inner.embed_documents(list(missing.values()))
+            self.store.put_many(list(missing), vectors)
+            cached.update(zip(missing, np.asarray(vectors, dtype=np.float32)))
+
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        return [cached[key].tolist() for key in keys]
+
+    def embed_query(self, text):
+        return self.inner.embed_query(text)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "cached_vectors": len(self.store)}
@@ -0,0 +1,166 @@
+import os
+import json
+import hashlib
+import time
+import threading
+from langchain_core.documents import Document
+from src.config import EXTRACTION_CACHE_DIR, EXTRACTION_CACHE_MAX_MB
+from src.logger import logger
+
+class ExtractionCache:
+    """
+    On-disk cache of extracted page Documents.
+    - One JSON-lines file per entry: <content hash>-<ext>-<extractor version>[-<settings hash>].jsonl
+      (content hash, not name: the same bytes re-uploaded under a new name still hit)
+    - LRU: hits refresh the file mtime, and the oldest entries are evicted once
+      the directory grows past `max_bytes`.
+    - `source` metadata is not stored; it is filled in with the current path on a hit.
+    """
+    def __init__(self, cache_dir=EXTRACTION_CACHE_DIR, max_bytes=EXTRACTION_CACHE_MAX_MB * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, content_hash, ext, version, settings=None):
+        """`settings`: the config values that change extraction output (hashed into the key)."""
+        key = f"{content_hash}{ext.replace('.', '-')}-v{version}"
+        if settings:
+            digest = hashlib.sha1(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()
+            key += f"-{digest[:12]}"
+        return key
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ".jsonl")
+
+    def get(self, key, source):
+        """Returns the cached Documents for `key` (with `source` metadata), or None on a miss."""
+        entry = self.open_entry(key, source)
+        if entry is None:
+            return None
+        try:
+            return list(entry)
+        except Exception as e:
+            logger.warning(f"⚠️ Corrupt extraction cache entry {key}: {e}")
+            self.discard(key)
+            return None
+
+    def discard(self, key):
+        """Drops an entry (e.g. found corrupt while streaming it)."""
+        self._remove(self._path(key))
+
+    def open_entry(self, key, source):
+        """Streaming variant of get(): returns a lazy Document iterator, or None on a miss."""
+        path = self._path(key)
+        try:
+            f = open(path, "r", encoding="utf-8")
+        except FileNotFoundError:
+            return None
+        # ✅ LRU bookkeeping: a hit makes the entry "recently used"
+        os.utime(path, None)
+        return self._read_entry(f, source)
+
+    @staticmethod
+    def _read_entry(f, source):
+        with f:
+            for line in f:
+                record = json.loads(line)
+                metadata = {"source": source, **record["metadata"]}
+                yield Document(page_content=record["page_content"], metadata=metadata)
+
+    def put(self, key, docs):
+        """Stores Documents atomically (temp file + rename), then enforces the size bound."""
+        writer = self.writer(key)
+        try:
+            for doc in docs:
+                writer.write(doc)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not write extraction cache entry {key}: {e}")
+            writer.abort()
+            return
+        writer.commit()
+
+    def writer(self, key):
+        """Incremental writer: pages are appended as they are extracted, published on commit()."""
+        return CacheWriter(self, key)
+
+    def evict(self):
+        """Deletes least recently used entries until the cache fits in max_bytes."""
+        with self._lock:
+            entries = []
+            total = 0
+            for entry in os.scandir(self.cache_dir):
+                if not entry.name.endswith(".jsonl"):
+                    continue
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+            if total <= self.max_bytes:
+                return
+
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                self._remove(path)
+                total -= size
+            logger.info(f"🧹 Extraction cache evicted down to {total / (1024 * 1024):.1f} MB")
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+class CacheWriter:
+    def __init__(self, cache, key):
+        self.cache = cache
+        self.key = key
+        self.path = cache._path(key)
+        self.tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        self.count = 0
+        self._f = open(self.tmp_path, "w", encoding="utf-8")
+
+    def write(self, doc):
+        metadata = {k: v for k, v in doc.metadata.items() if k != "source"}
+        self._f.write(json.dumps({"page_content": doc.page_content, "metadata": metadata}) + "\n")
+        self.count += 1
+
+    def commit(self):
+        """Publishes the entry atomically (temp file + rename), then enforces the size bound."""
+        self._f.close()
+        # Empty results may come from a transient error, don't pin them in the cache.
+        if self.count == 0:
+            self.cache._remove(self.tmp_path)
+            return
+        try:
+            os.replace(self.tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"⚠️ Could not write extraction cache entry {self.key}: {e}")
+            self.cache._remove(self.tmp_path)
+            return
+        self.cache.evict()
+
+    def abort(self):
+        self._f.close()
+        self.cache._remove(self.tmp_path)
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_extraction_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ExtractionCache()
+        return _cache
+
+def new_cache_stats():
+    return {"hits": 0, "misses": 0, "lookup_ms": 0.0}
+
+def record(stats, hit, started):
+    if stats is not None:
+        stats["hits" if hit else "misses"] += 1
+        stats["lookup_ms"] = round(stats["lookup_ms"] + (time.perf_counter() - started) * 1000, 2)
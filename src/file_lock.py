@@ -0,0 +1,18 @@
+import os
+import fcntl
+from contextlib import contextmanager
+
+@contextmanager
+def file_lock(path):
+    """
+    Exclusive lock across PROCESSES (uvicorn workers, embedding pool, sidecar)
+    on `path`, which is created if needed. Blocks until the lock is free.
+    threading locks only cover one process; take those first, then this one.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
@@ -0,0 +1,314 @@
+import os
+import sys
+import json
+import time
+import socket
+import struct
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.embeddings import Embeddings
+from src.config import (INFERENCE_SOCKET, INFERENCE_MAX_WAIT_MS, INFERENCE_MAX_QUERIES, INFERENCE_MAX_PAIRS,
+                        INFERENCE_TIMEOUT_SECONDS)
+from src.logger import logger
+
+# Local inference sidecar. One process owns the embedder and the Cross-Encoder
+# and serves every API worker over a Unix socket, so N uvicorn workers hold one
+# copy of the models instead of N. Concurrent chat requests each bring one query
+# to embed and ~12 (query, passage) pairs to score: the server queues them per
+# model and runs them as one micro-batch, either once the batch is full or
+# INFERENCE_MAX_WAIT_MS after its first request, whichever comes first.
+#
+# Wire format: 4-byte big-endian length + JSON, one request / one response.
+#   {"op": "embed_query", "texts": [...]}         -> {"ok": true, "result": [[...], ...]}
+#   {"op": "embed_documents", "texts": [...]}     -> same (not coalesced: already a batch)
+#   {"op": "rerank", "query": q, "passages": [...]} -> {"ok": true, "result": [score, ...]}
+#   {"op": "status"}                              -> models, cache and batch stats
+
+HEADER = struct.Struct(">I")
+# Model batch size inside one rerank micro-batch (pairs are length-sorted first)
+RERANK_BATCH_SIZE = 16
+
+class InferenceError(RuntimeError):
+    pass
+
+def _encode(message):
+    data = json.dumps(message).encode("utf-8")
+    return HEADER.pack(len(data)) + data
+
+def _recv_exactly(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        part = sock.recv(size - len(data))
+        if not part:
+            raise ConnectionError("inference server closed the connection")
+        data.extend(part)
+    return bytes(data)
+
+# ==========================================
+# SERVER
+# ==========================================
+class MicroBatcher:
+    """
+    Queue for one model. submit(items) waits for the results of its items;
+    run(flat_items) -> flat_results is called on the model's own thread for
+    each micro-batch (at most max_items, unless one request alone is bigger).
+    """
+    def __init__(self, name, run, max_items, max_wait_ms=INFERENCE_MAX_WAIT_MS):
+        self.name = name
+        self.run = run
+        self.max_items = max_items
+        self.max_wait = max_wait_ms / 1000
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"infer-{name}")
+        self.queue = asyncio.Queue()
+        self.stats = {"requests": 0, "batches": 0, "items": 0, "largest_batch": 0, "model_seconds": 0.0}
+
+    async def submit(self, items):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((items, future))
+        return await future
+
+    async def run_forever(self):
+        loop = asyncio.get_running_loop()
+        pending = None
+        while True:
+            # A request that didn't fit the last batch starts the next one
+            first = pending or await self.queue.get()
+            pending = None
+            batch, size = [first], len(first[0])
+            deadline = loop.time() + self.max_wait
+            while size < self.max_items:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    request = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if size + len(request[0]) > self.max_items:
+                    pending = request
+                    break
+                batch.append(request)
+                size += len(request[0])
+
+            flat = [item for items, _ in batch for item in items]
+            started = time.perf_counter()
+            try:
+                results = await loop.run_in_executor(self.executor, self.run, flat)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.stats["requests"] += len(batch)
+            self.stats["batches"] += 1
+            self.stats["items"] += len(flat)
+            self.stats["largest_batch"] = max(self.stats["largest_batch"], len(flat))
+            self.stats["model_seconds"] += time.perf_counter() - started
+
+            offset = 0
+            for items, future in batch:
+                if not future.done():
+                    future.set_result(results[offset:offset + len(items)])
+                offset += len(items)
+
+    def report(self):
+        stats = dict(self.stats)
+        stats["model_seconds"] = round(stats["model_seconds"], 3)
+        stats["mean_batch"] = round(stats["items"] / stats["batches"], 2) if stats["batches"] else 0.0
+        return stats
+
+def query_model(embeddings):
+    """Queries skip the embedding cache (like CachedEmbeddings.embed_query) but still go out as one batch."""
+    from src.embedding_cache import CachedEmbeddings
+    return embeddings.inner if isinstance(embeddings, CachedEmbeddings) else embeddings
+
+class InferenceServer:
+    def __init__(self, embeddings, cross_encoder=None, socket_path=INFERENCE_SOCKET,
+                 max_wait_ms=INFERENCE_MAX_WAIT_MS, max_queries=INFERENCE_MAX_QUERIES, max_pairs=INFERENCE_MAX_PAIRS):
+        self.embeddings = embeddings
+        self.cross_encoder = cross_encoder
+        self.socket_path = socket_path
+        queries = query_model(embeddings)
+        self.batchers = {
+            "embed_query": MicroBatcher("embed_query", queries.embed_documents, max_queries, max_wait_ms),
+            "rerank": MicroBatcher("rerank", self._score_pairs, max_pairs, max_wait_ms),
+        }
+        # Ingest batches are big already: no waiting, but their own thread so queries don't queue behind them
+        self.documents = ThreadPoolExecutor(max_workers=1, thread_name_prefix="infer-documents")
+        self.ready = threading.Event()
+        self._loop = None
+        self._server = None
+
+    def _score_pairs(self, pairs):
+        # Pairs from different requests vary in length: sort them so each model batch pads little
+        order = sorted(range(len(pairs)), key=lambda i: len(pairs[i][0]) + len(pairs[i][1]))
+        scores = self.cross_encoder.predict([pairs[i] for i in order], batch_size=RERANK_BATCH_SIZE,
+                                            show_progress_bar=False)
+        results = [0.0] * len(pairs)
+        for i, score in zip(order, scores):
+            results[i] = float(score)
+        return results
+
+    def status(self):
+        status = {
+            "pid": os.getpid(),
+            "embeddings": True,
+            "cross_encoder": self.cross_encoder is not None,
+            "batches": {name: batcher.report() for name, batcher in self.batchers.items()},
+        }
+        if hasattr(self.embeddings, "stats"):
+            status["cache"] = self.embeddings.stats()
+        return status
+
+    async def handle(self, request):
+        op = request.get("op")
+        if op == "embed_query":
+            return await self.batchers["embed_query"].submit(request["texts"])
+        if op == "embed_documents":
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.documents, self.embeddings.embed_documents, request["texts"])
+        if op == "rerank":
+            if self.cross_encoder is None:
+                raise InferenceError("no Cross-Encoder loaded")
+            passages = request["passages"]
+            if not passages:
+                return []
+            return await self.batchers["rerank"].submit([[request["query"], p] for p in passages])
+        if op == "status":
+            return self.status()
+        raise InferenceError(f"unknown op: {op}")
+
+    async def _connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    (size,) = HEADER.unpack(await reader.readexactly(HEADER.size))
+                    request = json.loads(await reader.readexactly(size))
+                except asyncio.IncompleteReadError:
+                    break
+                try:
+                    response = {"ok": True, "result": await self.handle(request)}
+                except Exception as e:
+                    logger.error(f"❌ Inference request {request.get('op')} failed: {e}")
+                    response = {"ok": False, "error": str(e)}
+                writer.write(_encode(response))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def _claim_socket(self):
+        """Removes a stale socket file left by a dead server; refuses to replace a live one."""
+        if not os.path.exists(self.socket_path):
+            return
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            try:
+                probe.connect(self.socket_path)
+            except OSError:
+                os.unlink(self.socket_path)
+                return
+        raise InferenceError(f"an inference server is already listening on {self.socket_path}")
+
+    async def serve_forever(self):
+        self._loop = asyncio.get_running_loop()
+        self._claim_socket()
+        tasks = [asyncio.create_task(batcher.run_forever()) for batcher in self.batchers.values()]
+        self._server = await asyncio.start_unix_server(self._connection, path=self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+        logger.info(f"🛰️ Inference server listening on {self.socket_path}")
+        self.ready.set()
+        try:
+            async with self._server:
+                await self._server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    def start_in_background(self, timeout=30):
+        """Runs the server on a daemon thread (tests, benchmarks); returns once it accepts connections."""
+        thread = threading.Thread(target=asyncio.run, args=(self.serve_forever(),), name="inference-server", daemon=True)
+        thread.start()
+        if not self.ready.wait(timeout):
+            raise InferenceError("inference server did not start")
+        return thread
+
+    def stop(self):
+        if self._loop is not None and self._server is not None:
+            self._loop.call_soon_threadsafe(self._server.close)
+
+# ==========================================
+# CLIENTS (what the API workers use)
+# ==========================================
+class InferenceClient:
+    def __init__(self, socket_path=INFERENCE_SOCKET, timeout=INFERENCE_TIMEOUT_SECONDS):
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def call(self, op, **payload):
+        # One short-lived connection per call: connecting to a Unix socket costs microseconds
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(self.timeout)
+                sock.connect(self.socket_path)
+                sock.sendall(_encode({"op": op, **payload}))
+                (size,) = HEADER.unpack(_recv_exactly(sock, HEADER.size))
+                response = json.loads(_recv_exactly(sock, size))
+        except OSError as e:
+            raise InferenceError(f"inference server at {self.socket_path} unreachable: {e}") from e
+        if not response["ok"]:
+            raise InferenceError(response["error"])
+        return response["result"]
+
+    def status(self):
+        return self.call("status")
+
+class SidecarEmbeddings(Embeddings):
+    """Embeddings served by the inference server (its cache and batching apply)."""
+    def __init__(self, client):
+        self.client = client
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        return self.client.call("embed_documents", texts=list(texts))
+
+    def embed_query(self, text):
+        return self.client.call("embed_query", texts=[text])[0]
+
+class SidecarCrossEncoder:
+    """The part of sentence_transformers.CrossEncoder that rag.py uses, served by the inference server."""
+    def __init__(self, client):
+        self.client = client
+
+    def rank(self, query, passages):
+        scores = self.client.call("rerank", query=query, passages=list(passages))
+        ranks = [{"corpus_id": i, "score": score} for i, score in enumerate(scores)]
+        return sorted(ranks, key=lambda x: x["score"], reverse=True)
+
+# ==========================================
+# ENTRY POINT: python -m src.inference_server
+# ==========================================
+def serve(socket_path=INFERENCE_SOCKET or "/tmp/rag-inference.sock"):
+    # Loads the models in THIS process (the factories, not the registry's sidecar clients)
+    from src.models import load_embeddings, load_cross_encoder
+
+    embeddings = load_embeddings()
+    try:
+        cross_encoder = load_cross_encoder()
+    except Exception as e:
+        logger.warning(f"⚠️ Could not load Cross-Encoder ({e}), rerank requests will fail")
+        cross_encoder = None
+    server = InferenceServer(embeddings, cross_encoder, socket_path=socket_path)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        logger.info("🛑 Inference server stopped")
+
+if __name__ == "__main__":
+    serve(*sys.argv[1:2])
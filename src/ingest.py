@@ -1,188 +1,343 @@
 import os
 import fitz  # PyMuPDF
 import pdfplumber  # Better table extraction
-import pytesseract
 from PIL import Image
 import io
 from langchain_community.document_loaders import TextLoader
 from langchain_core.documents import Document
 from src.logger import logger
 from dotenv import load_dotenv
-import platform
 import docx
-import pandas as pd
+import math
+import itertools
+import time
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from src.ocr import get_ocr_pool, render_page
+from src.sources import IngestSource
+from src.tabular import iter_csv, iter_xlsx
+from src.tables import extract_page_tables, new_table_stats, merge_table_stats, table_hit_rates
+from src.config import (PDF_WORKERS, PDF_PARALLEL_MIN_PAGES, PDF_PAGES_PER_SHARD, EXTRACTION_CACHE_ENABLED,
+                        OCR_TARGET_LONG_SIDE_PX, OCR_MIN_DPI, OCR_MAX_DPI, TABLE_ROWS_PER_DOC,
+                        TABLE_MIN_RULING_LINES, TABLE_MIN_LINE_LENGTH)
+from src.extraction_cache import get_extraction_cache, record
 
 load_dotenv()
 
-# ✅ CONFIG: Tesseract Path
-if platform.system() == "Windows":
-    pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
-else:
-    # On Hugging Face (Linux), Tesseract is already in the PATH
-    pytesseract.pytesseract.tesseract_cmd = "/usr/bin/tesseract"
-
-def format_table_to_markdown(table):
-    """Helper to convert a raw list of lists into a Markdown string."""
-    if not table:
-        return ""
+# ⚠️ Bump this whenever extraction output changes, so cached results are not reused.
+EXTRACTOR_VERSION = 5
+
+# Settings that change extraction output: they are hashed into the cache key
+# next to EXTRACTOR_VERSION, so changing one of them in .env is enough.
+EXTRACTION_SETTINGS = {
+    "ocr_target_long_side_px": OCR_TARGET_LONG_SIDE_PX,
+    "ocr_min_dpi": OCR_MIN_DPI,
+    "ocr_max_dpi": OCR_MAX_DPI,
+    "table_rows_per_doc": TABLE_ROWS_PER_DOC,
+    "table_min_ruling_lines": TABLE_MIN_RULING_LINES,
+    "table_min_line_length": TABLE_MIN_LINE_LENGTH,
+}
+
+def process_pdf_page(page, page_num, plumber_pdf, table_stats=None):
+    """
+    Extracts text and tables from a single PDF page.
+    Scanned pages are handed to the OCR pool; the returned `ocr_job` is a Future
+    (or None) so the caller can move on to the next page while tesseract runs.
+    """
+    # A. Extract Regular Text (Instant)
+    text = page.get_text()
+    text_length = len(text.strip())
     
-    table_text = ""
-    for row_idx, row in enumerate(table):
-        clean_row = [str(cell).strip().replace("\n", " ") if cell else "" for cell in row]
+    # B. Intelligent Table Extraction
+    # ✅ OPTIMIZATION 2: Tiered Gatekeeper (see src/tables.py)
+    # Ruling-line prefilter -> PyMuPDF find_tables -> pdfplumber on the table boxes only.
+    table_text = extract_page_tables(page, page_num, plumber_pdf, table_stats)
+    
+    # C. OCR Check (Only if text is missing)
+    ocr_job = None
+    if text_length < 50:
+        logger.info(f"🔍 Page {page_num+1} appears scanned. Queuing OCR...")
         
-        if row_idx == 0:
-            table_text += "| " + " | ".join(clean_row) + " |\n"
-            table_text += "|" + "|".join(["---" for _ in clean_row]) + "|\n"
-        else:
-            table_text += "| " + " | ".join(clean_row) + " |\n"
-            
-    return table_text
+        # ✅ DPI picked from the page size, pixmap handed over without a PNG round trip
+        ocr_job = get_ocr_pool().ocr_pixmap(render_page(page))
+    
+    return text, table_text, ocr_job
 
-def extract_tables_as_text(page):
-    """FALLBACK: PyMuPDF table extraction."""
-    try:
-        tables = page.find_tables()
-        if not tables:
-            return ""
+def finish_pdf_page(source_name, page_num, text, table_text, ocr_job):
+    """Waits for the page's OCR job (if any) and builds the page Document."""
+    if ocr_job is not None:
+        ocr_text = ocr_job.result()
         
-        table_text = "\n\n=== TABLES DETECTED (PyMuPDF) ===\n"
-        for i, table in enumerate(tables):
-            table_text += f"\n--- Table {i+1} ---\n"
-            table_data = table.extract()
-            for row in table_data:
-                clean_row = [str(cell) if cell is not None else "" for cell in row]
-                row_text = " | ".join(clean_row)
-                table_text += row_text + "\n"
-            table_text += "\n"
-        return table_text
-    except Exception as e:
-        logger.warning(f"⚠️ PyMuPDF table extraction failed: {e}")
-        return ""
+        if len(ocr_text.strip()) > len(text.strip()):
+            text = ocr_text
+            logger.info(f"✅ OCR completed for page {page_num+1}")
+    
+    # D. Combine
+    combined_text = text + table_text
+    
+    if not combined_text.strip():
+        return None
+    return Document(
+        page_content=combined_text, 
+        metadata={"source": source_name, "page": page_num+1}
+    )
+
+def as_source(source):
+    """Accepts a plain path (old API) or an IngestSource."""
+    if isinstance(source, IngestSource):
+        return source
+    return IngestSource.from_path(source)
+
+def open_pdf(source):
+    """Opens fitz + pdfplumber handles on a path OR straight from memory (no temp file)."""
+    if source.data is not None:
+        return fitz.open(stream=source.data, filetype="pdf"), pdfplumber.open(io.BytesIO(source.data))
+    return fitz.open(source.path), pdfplumber.open(source.path)
+
+def iter_pdf_pages(source, start, end, name=None, table_stats=None):
+    """
+    Extracts pages [start, end) of a PDF, yielding one Document per page.
+    Every caller (including each process-pool worker) opens its OWN
+    fitz/pdfplumber handles (they can't be shared across processes).
+    Table detection counters go to `table_stats`, or to the process-wide totals if None.
+    """
+    source = as_source(source)
+    stats = new_table_stats() if table_stats is None else table_stats
+    source_name = name or source.name
+    # Pages whose OCR is still running. Finished pages are drained from the
+    # front as soon as possible, which keeps the output in page order.
+    pending = deque()
+    
+    def drain(wait):
+        while pending and (wait or pending[0][-1] is None or pending[0][-1].done()):
+            page_doc = finish_pdf_page(source_name, *pending.popleft())
+            if page_doc:
+                yield page_doc
+    
+    # ✅ OPTIMIZATION 1: Open BOTH libraries ONCE per shard
+    # This prevents re-parsing the file 100 times for 100 pages.
+    doc, plumber_pdf = open_pdf(source)
+    with doc, plumber_pdf:
+        for page_num in range(start, min(end, len(doc))):
+            pending.append((page_num, *process_pdf_page(doc[page_num], page_num, plumber_pdf, stats)))
+            yield from drain(wait=False)
+    
+    yield from drain(wait=True)
+    if table_stats is None:
+        log_table_stats(source_name, stats)
+
+def extract_pdf_pages(file_path, start, end, name=None):
+    """Process-pool worker: extracts a whole shard of pages. Returns (docs, table stats)."""
+    stats = new_table_stats()
+    return list(iter_pdf_pages(file_path, start, end, name, stats)), stats
+
+def log_table_stats(source_name, stats):
+    """Adds a file's table counters to the process-wide totals and logs the tier hit rates."""
+    merge_table_stats(stats)
+    if stats["pages"]:
+        rates = table_hit_rates(stats)
+        logger.info(
+            f"📊 Table tiers for {os.path.basename(source_name)}: {stats['pages']} pages -> "
+            f"prefilter {rates['prefilter']:.0%} -> find_tables {rates['find_tables']:.0%} -> "
+            f"extracted {rates['extracted']:.0%} "
+            f"({stats['find_tables_ms']:.0f} ms in find_tables, {stats['extract_ms']:.0f} ms in pdfplumber)"
+        )
 
-def load_file(file_path):
+def split_page_range(total_pages, workers, max_shard_pages=None):
+    """Splits [0, total_pages) into contiguous (start, end) shards."""
+    if max_shard_pages is None:
+        max_shard_pages = PDF_PAGES_PER_SHARD
+    # Give every worker at least one shard, but keep shards small enough to balance.
+    shard_size = max(1, min(max_shard_pages, math.ceil(total_pages / max(workers, 1))))
+    return [(start, min(start + shard_size, total_pages)) for start in range(0, total_pages, shard_size)]
+
+_pdf_pool = None
+_pdf_pool_workers = 0
+
+def get_pdf_pool(workers):
+    """Returns a reusable process pool (spawn start method: safe inside a threaded server)."""
+    global _pdf_pool, _pdf_pool_workers
+    if _pdf_pool is None or _pdf_pool_workers != workers:
+        if _pdf_pool is not None:
+            _pdf_pool.shutdown(wait=False)
+        _pdf_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        _pdf_pool_workers = workers
+    return _pdf_pool
+
+def iter_pdf_parallel(source, total_pages, workers):
+    """
+    Runs extract_pdf_pages over page shards in a process pool and yields the
+    pages in page order. Only `2 x workers` shards are in flight at a time,
+    so a huge PDF never sits in memory all at once.
     """
-    SPEED OPTIMIZED LOADER:
+    source = as_source(source)
+    shard_list = split_page_range(total_pages, workers)
+    logger.info(f"⚡ Parallel PDF mode: {len(shard_list)} shard(s) across {workers} worker(s)")
+    shards = iter(shard_list)
+    
+    # Every worker needs to open the file itself, so an in-memory PDF is written
+    # to ONE temp file here (instead of pickling the bytes into every shard).
+    with source.as_path() as file_path:
+        pool = get_pdf_pool(workers)
+        submit = lambda start, end: pool.submit(extract_pdf_pages, file_path, start, end, source.name)
+        in_flight = deque(submit(start, end) for start, end in itertools.islice(shards, workers * 2))
+        table_stats = new_table_stats()
+        try:
+            while in_flight:
+                shard_docs, shard_stats = in_flight.popleft().result()
+                merge_table_stats(shard_stats, into=table_stats)
+                next_shard = next(shards, None)
+                if next_shard:
+                    in_flight.append(submit(*next_shard))
+                yield from shard_docs
+            log_table_stats(source.name, table_stats)
+        finally:
+            # Consumer stopped early (error / cancel): don't leave shards queued
+            for future in in_flight:
+                future.cancel()
+
+def load_pdf_parallel(source, total_pages, workers):
+    return list(iter_pdf_parallel(source, total_pages, workers))
+
+def _iter_file(source, workers=None):
+    ext = source.ext
+    logger.info(f"📂 Loading file type: {ext}")
+
+    if ext in [".txt", ".md"]:
+        if ext == ".md":
+            logger.info("📝 Loading Markdown file...")
+        if source.path is not None:
+            loader = TextLoader(source.path, encoding="utf-8")
+            for doc in loader.lazy_load():
+                doc.metadata["source"] = source.name
+                yield doc
+        else:
+            yield Document(page_content=source.data.decode("utf-8"), metadata={"source": source.name})
+
+    elif ext == ".docx":
+        logger.info("📝 Loading Word document...")
+        with source.open() as f:
+            doc = docx.Document(f)
+        full_text = [para.text for para in doc.paragraphs]
+        text = "\n".join(full_text)
+        yield Document(page_content=text, metadata={"source": source.name})
+
+    elif ext == ".csv":
+        yield from iter_csv(source)
+
+    elif ext == ".xlsx":
+        yield from iter_xlsx(source)
+
+    elif ext == ".pdf":
+        doc, plumber_pdf = open_pdf(source)
+        with doc, plumber_pdf:
+            total_pages = len(doc)
+        logger.info(f"📄 Processing {total_pages} pages...")
+
+        # ✅ OPTIMIZATION 3: Big PDFs are split into page shards and
+        # extracted by a process pool (one core per shard).
+        if workers is None:
+            workers = PDF_WORKERS
+        if workers > 1 and total_pages >= PDF_PARALLEL_MIN_PAGES:
+            yield from iter_pdf_parallel(source, total_pages, workers)
+        else:
+            yield from iter_pdf_pages(source, 0, total_pages)
+
+    elif ext in [".png", ".jpg", ".jpeg"]:
+        try:
+            with source.open() as f:
+                image = Image.open(f)
+                image.load()
+            logger.info("🔍 Performing OCR on image...")
+            text = get_ocr_pool().ocr_image(image).result()
+            if text.strip():
+                yield Document(page_content=text, metadata={"source": source.name, "page": 1})
+        except Exception as e:
+            logger.error(f"❌ OCR Error: {e}")
+    else:
+        logger.warning(f"⚠️ Unsupported file type: {ext}")
+
+def iter_file(source, workers=None):
+    """
+    STREAMING LOADER: yields page Documents lazily, so a 50,000 page upload
+    never has to sit in memory as one list.
+    `source` is a file path or an IngestSource (in-memory upload / ZIP member).
     1. Opens PDF files ONCE (Massive speedup).
     2. Uses PyMuPDF as a 'Gatekeeper' to only run slow pdfplumber on pages with actual tables.
+    3. Extracts large PDFs page-parallel across `workers` processes (defaults to PDF_WORKERS).
     """
     try:
-        ext = os.path.splitext(file_path)[1].lower()
-        logger.info(f"📂 Loading file type: {ext}")
+        yield from _iter_file(as_source(source), workers)
+    except Exception as e:
+        logger.error(f"❌ Error loading file: {e}")
 
-        if ext == ".txt":
-            loader = TextLoader(file_path, encoding="utf-8")
-            loader = TextLoader(file_path, encoding="utf-8")
-            return loader.load()
+def load_file(source, workers=None):
+    """List version of iter_file()."""
+    return list(iter_file(source, workers))
 
-        elif ext == ".md":
-            logger.info("📝 Loading Markdown file...")
-            loader = TextLoader(file_path, encoding="utf-8")
-            return loader.load()
-
-        elif ext == ".docx":
-            logger.info("📝 Loading Word document...")
-            doc = docx.Document(file_path)
-            full_text = [para.text for para in doc.paragraphs]
-            text = "\n".join(full_text)
-            return [Document(page_content=text, metadata={"source": file_path})]
-
-        elif ext == ".csv":
-            logger.info("📊 Loading CSV file...")
-            df = pd.read_csv(file_path)
-            
-            # Convert each row to a sensible text format
-            text_lines = []
-            for index, row in df.iterrows():
-                # "Column: Value | Column: Value"
-                row_text = " | ".join([f"{col}: {val}" for col, val in row.items() if pd.notna(val)])
-                text_lines.append(row_text)
-            
-            combined_text = "\n".join(text_lines)
-            return [Document(page_content=combined_text, metadata={"source": file_path})]
-
-        elif ext == ".pdf":
-            documents = []
-            
-            # ✅ OPTIMIZATION 1: Open BOTH libraries ONCE at the start
-            # This prevents re-parsing the file 100 times for 100 pages.
-            with fitz.open(file_path) as doc, pdfplumber.open(file_path) as plumber_pdf:
-                
-                total_pages = len(doc)
-                logger.info(f"📄 Processing {total_pages} pages...")
-                
-                for page_num, page in enumerate(doc):
-                    
-                    # A. Extract Regular Text (Instant)
-                    text = page.get_text()
-                    text_length = len(text.strip())
-                    
-                    # B. Intelligent Table Extraction
-                    table_text = ""
-                    
-                    # ✅ OPTIMIZATION 2: The Gatekeeper
-                    # PyMuPDF is C++ fast. We ask it: "Are there tables here?"
-                    # If NO, we skip the slow pdfplumber entirely.
-                    possible_tables = page.find_tables()
-                    
-                    if possible_tables:
-                        # Found a potential table! Now use the slow but accurate tool.
-                        try:
-                            if page_num < len(plumber_pdf.pages):
-                                plumber_page = plumber_pdf.pages[page_num]
-                                tables = plumber_page.extract_tables()
-                                
-                                if tables:
-                                    table_text += "\n\n=== TABLES DETECTED ===\n"
-                                    for i, table in enumerate(tables):
-                                        table_text += f"\n--- Table {i+1} ---\n"
-                                        table_text += format_table_to_markdown(table)
-                                        table_text += "\n"
-                                    logger.info(f"📊 Extracted {len(tables)} table(s) on Page {page_num+1}")
-                        except Exception as e:
-                            logger.warning(f"⚠️ pdfplumber failed on page {page_num}: {e}")
-                            # Fallback to the PyMuPDF tables we already found
-                            table_text = extract_tables_as_text(page)
-                    
-                    # C. OCR Check (Only if text is missing)
-                    if text_length < 50:
-                        logger.info(f"🔍 Page {page_num+1} appears scanned. Running OCR...")
-                        
-                        # ✅ DPI 200 is 2x faster than 300 and good enough
-                        pix = page.get_pixmap(dpi=200)
-                        img_data = pix.tobytes("png")
-                        img = Image.open(io.BytesIO(img_data))
-                        
-                        ocr_text = pytesseract.image_to_string(img, config='--psm 6')
-                        
-                        if len(ocr_text.strip()) > text_length:
-                            text = ocr_text
-                            logger.info(f"✅ OCR completed for page {page_num+1}")
-                    
-                    # D. Combine
-                    combined_text = text + table_text
-                    
-                    if combined_text.strip():
-                        documents.append(Document(
-                            page_content=combined_text, 
-                            metadata={"source": file_path, "page": page_num+1}
-                        ))
-            
-            return documents
-
-        elif ext in [".png", ".jpg", ".jpeg"]:
-            try:
-                image = Image.open(file_path)
-                logger.info("🔍 Performing OCR on image...")
-                text = pytesseract.image_to_string(image, config='--psm 6')
-                if not text.strip(): return []
-                return [Document(page_content=text, metadata={"source": file_path, "page": 1})]
-            except Exception as e:
-                logger.error(f"❌ OCR Error: {e}")
-                return []
-        else:
-            logger.warning(f"⚠️ Unsupported file type: {ext}")
-            return []
+def iter_file_cached(source, stats=None):
+    """
+    iter_file() behind the content-addressed extraction cache.
+    Hits stream straight from the cache entry; misses are written to the cache
+    page by page while they are yielded (published only if the file completes).
+    `stats` (optional dict with "hits"/"misses") is updated for reporting.
+    """
+    source = as_source(source)
+    if not EXTRACTION_CACHE_ENABLED:
+        yield from iter_file(source)
+        return
 
+    started = time.perf_counter()
+    try:
+        cache = get_extraction_cache()
+        key = cache.key(source.sha256(), source.ext, EXTRACTOR_VERSION, EXTRACTION_SETTINGS)
+        entry = cache.open_entry(key, source=source.name)
     except Exception as e:
+        logger.warning(f"⚠️ Extraction cache unavailable: {e}")
+        yield from iter_file(source)
+        return
+
+    # Pages already handed out from a cache entry that turned out corrupt half-way
+    served = 0
+    if entry is not None:
+        record(stats, hit=True, started=started)
+        logger.info(f"⚡ Extraction cache hit: {os.path.basename(source.name)}")
+        try:
+            for doc in entry:
+                yield doc
+                served += 1
+            return
+        except Exception as e:
+            # Same as ExtractionCache.get(): a corrupt entry is a miss, not a failed ingest
+            logger.warning(f"⚠️ Corrupt extraction cache entry {key}: {e}, re-extracting")
+            cache.discard(key)
+    else:
+        record(stats, hit=False, started=started)
+
+    try:
+        writer = cache.writer(key)
+    except Exception as e:
+        # Cache disk full / read-only: still ingest, just without caching
+        logger.warning(f"⚠️ Extraction cache write unavailable: {e}")
+        yield from itertools.islice(iter_file(source), served, None)
+        return
+
+    try:
+        for i, doc in enumerate(_iter_file(source)):
+            writer.write(doc)
+            if i >= served:
+                yield doc
+    except Exception as e:
+        writer.abort()
         logger.error(f"❌ Error loading file: {e}")
-        return []
\ No newline at end of file
+        return
+    except BaseException:
+        # GeneratorExit: the consumer stopped early, the entry is incomplete
+        writer.abort()
+        raise
+    writer.commit()
+
+def load_file_cached(source, stats=None):
+    """List version of iter_file_cached()."""
+    return list(iter_file_cached(source, stats))
@@ -0,0 +1,211 @@
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from src.config import INGEST_JOB_WORKERS, INGEST_JOB_HISTORY
+from src.logger import logger
+
+class JobCancelled(Exception):
+    """Raised inside a running job once cancellation was requested."""
+
+class NullProgress:
+    """Progress tracker that does nothing (plain function calls outside of a job)."""
+    @contextmanager
+    def timed(self, stage):
+        yield
+
+    def start_file(self, name):
+        pass
+
+    def page_done(self):
+        pass
+
+    def finish_file(self, status="done"):
+        pass
+
+    def add_chunks(self, count):
+        pass
+
+    def report(self, name, value):
+        pass
+
+    def check_cancelled(self):
+        pass
+
+class IngestJob(NullProgress):
+    """
+    One background ingestion. Tracks per-file progress and per-stage timings
+    (extract / split / embed / index / save) while the worker runs it.
+    """
+    def __init__(self, filenames):
+        self.id = uuid.uuid4().hex
+        self.status = "queued"
+        self.filenames = list(filenames)
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.files = []
+        self.stages = {}
+        self.chunks = 0
+        self.reports = {}
+        self.result = None
+        self.error = None
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    # ---------- progress hooks (called from the worker thread) ----------
+    @contextmanager
+    def timed(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.stages[stage] = self.stages.get(stage, 0.0) + elapsed
+                if self.files and self.files[-1]["status"] == "running":
+                    file_stages = self.files[-1]["stages"]
+                    file_stages[stage] = file_stages.get(stage, 0.0) + elapsed
+
+    def start_file(self, name):
+        with self._lock:
+            self.files.append({"name": name, "status": "running", "pages": 0, "stages": {}, "started_at": time.time(), "elapsed": None})
+
+    def page_done(self):
+        with self._lock:
+            self.files[-1]["pages"] += 1
+        self.check_cancelled()
+
+    def finish_file(self, status="done"):
+        with self._lock:
+            current = self.files[-1]
+            current["status"] = status
+            current["elapsed"] = round(time.time() - current["started_at"], 3)
+
+    def add_chunks(self, count):
+        with self._lock:
+            self.chunks += count
+        self.check_cancelled()
+
+    def report(self, name, value):
+        """Stage summaries shown with the job, e.g. report("dedup", {...})."""
+        with self._lock:
+            self.reports[name] = value
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise JobCancelled(f"Job {self.id} was cancelled")
+
+    # ---------- control ----------
+    def cancel(self):
+        """Queued jobs are cancelled right away; running ones stop at the next page / batch."""
+        if self.status == "queued":
+            self._cancel.set()
+            self.status = "cancelled"
+            self.finished_at = time.time()
+        elif self.status == "running":
+            self._cancel.set()
+            return "cancelling"
+        return self.status
+
+    @property
+    def done(self):
+        return self.status in ("succeeded", "failed", "cancelled")
+
+    def to_dict(self):
+        with self._lock:
+            end = self.finished_at or time.time()
+            return {
+                "job_id": self.id,
+                "status": self.status,
+                "filenames": self.filenames,
+                "files": [
+                    {**{k: v for k, v in f.items() if k not in ("stages", "started_at")},
+                     "stages": {k: round(v, 3) for k, v in f["stages"].items()}}
+                    for f in self.files
+                ],
+                "chunks": self.chunks,
+                "reports": dict(self.reports),
+                "stages": {k: round(v, 3) for k, v in self.stages.items()},
+                "queued_seconds": round((self.started_at or end) - self.created_at, 3),
+                "elapsed_seconds": round(end - self.started_at, 3) if self.started_at else 0.0,
+                "cancel_requested": self._cancel.is_set(),
+                "result": self.result,
+                "error": self.error,
+            }
+
+class JobManager:
+    """
+    In-process ingest job queue. Jobs run on a DEDICATED worker pool, independent
+    of the HTTP request that created them (a client disconnect doesn't stop them)
+    and separate from the server's threadpool, so sync endpoints like /chat/
+    never wait behind a long ingest.
+    """
+    def __init__(self, workers=INGEST_JOB_WORKERS, history=INGEST_JOB_HISTORY):
+        self._executor = ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="ingest-job")
+        self._jobs = OrderedDict()
+        self._history = history
+        self._lock = threading.Lock()
+
+    def submit(self, filenames, fn, *args, cleanup=None):
+        """Queues `fn(job, *args)`. `cleanup()` (e.g. delete spooled uploads) always runs afterwards."""
+        job = IngestJob(filenames)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._trim()
+        self._executor.submit(self._run, job, fn, args, cleanup)
+        logger.info(f"🧾 Queued ingest job {job.id} ({len(job.filenames)} file(s))")
+        return job
+
+    def _run(self, job, fn, args, cleanup):
+        try:
+            if job.status == "cancelled":
+                return
+            job.status = "running"
+            job.started_at = time.time()
+            job.check_cancelled()
+            job.result = fn(job, *args)
+            job.status = "succeeded"
+            logger.info(f"✅ Ingest job {job.id} finished in {time.time() - job.started_at:.1f}s")
+        except JobCancelled:
+            job.status = "cancelled"
+            logger.warning(f"🛑 Ingest job {job.id} cancelled")
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            logger.error(f"❌ Ingest job {job.id} failed: {e}")
+        finally:
+            job.finished_at = time.time()
+            if job.files and job.files[-1]["status"] == "running":
+                job.finish_file(job.status)
+            if cleanup:
+                try:
+                    cleanup()
+                except Exception as e:
+                    logger.warning(f"⚠️ Job cleanup failed: {e}")
+
+    def _trim(self):
+        # Forget the oldest FINISHED jobs beyond the history limit
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[:max(0, len(finished) - self._history)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        return job.cancel() if job else None
+
+_manager = None
+_manager_lock = threading.Lock()
+
+def get_job_manager():
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager()
+        return _manager
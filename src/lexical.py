@@ -0,0 +1,181 @@
+import os
+import re
+import json
+import math
+import threading
+from array import array
+from collections import Counter
+import numpy as np
+from src.config import BM25_K1, BM25_B, RRF_K
+from src.logger import logger
+
+# BM25 (keyword) index of one segment, next to its vectors:
+#
+#   lex.json          {"docs", "total_length", "terms": [sorted terms]}  (written last)
+#   lex-offsets.i64   terms + 1 offsets into the posting files
+#   lex-rows.i32      segment rows containing each term, term after term
+#   lex-tf.i32        ... and how often the term occurs in that row
+#   lex-doclen.i32    tokens per row
+#
+# Rows are segment rows, so tombstones and compaction apply as for the vectors.
+# Segments are searched with corpus-wide IDF and average length (see
+# SegmentedIndex.lexical_search_with_score), so their scores are comparable.
+LEXICAL_INFO_FILE = "lex.json"
+
+TOKEN_RE = re.compile(r"\w+(?:[-./:]\w+)*")
+SPLIT_RE = re.compile(r"[-./:_]")
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have if in into is it its of on or "
+    "such that the their then there these they this to was were what when where which will with".split()
+)
+
+def tokenize(text):
+    """
+    Lower-cased words without stopwords. Identifiers such as "XK-2041",
+    "4.2.1" or "E_1042" are kept whole and also split into their parts, so
+    "XK 2041" in a question still matches.
+    """
+    tokens = []
+    for token in TOKEN_RE.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        tokens.append(token)
+        parts = [p for p in SPLIT_RE.split(token) if p and p not in STOPWORDS]
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+def bm25_idf(doc_freq, docs):
+    return math.log(1 + (docs - doc_freq + 0.5) / (doc_freq + 0.5))
+
+class LexicalIndex:
+    def __init__(self, terms, offsets, rows, tf, lengths, total_length):
+        self.terms = terms
+        self.term_ids = {term: i for i, term in enumerate(terms)}
+        self.offsets = offsets
+        self.rows = rows
+        self.tf = tf
+        self.lengths = lengths
+        self.docs = len(lengths)
+        self.total_length = total_length
+
+    def doc_freq(self, term):
+        i = self.term_ids.get(term)
+        return 0 if i is None else int(self.offsets[i + 1] - self.offsets[i])
+
+    def search(self, terms, idf, avg_length, k=4, deleted=None):
+        """BM25 top-k: [(row, score)] best first. `idf`: term -> corpus-wide IDF."""
+        scores = None
+        for term in terms:
+            i = self.term_ids.get(term)
+            if i is None or term not in idf:
+                continue
+            start, end = self.offsets[i], self.offsets[i + 1]
+            rows = np.asarray(self.rows[start:end])
+            tf = np.asarray(self.tf[start:end], dtype=np.float32)
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[rows] / avg_length)
+            if scores is None:
+                scores = np.zeros(self.docs, dtype=np.float32)
+            # A term lists each row once, so plain fancy-index += is safe
+            scores[rows] += idf[term] * tf * (BM25_K1 + 1) / (tf + norm)
+        if scores is None:
+            return []
+        if deleted is not None:
+            scores[deleted] = 0
+        found = np.flatnonzero(scores)
+        if len(found) > k:
+            found = found[np.argpartition(-scores[found], k)[:k]]
+        found = found[np.argsort(-scores[found], kind="stable")]
+        return [(int(row), float(scores[row])) for row in found]
+
+class LexicalBuilder:
+    """Collects postings while a segment is written (rows in the order of add())."""
+    def __init__(self):
+        self.postings = {}  # term -> (rows, term frequencies)
+        self.lengths = array("i")
+
+    def add(self, texts):
+        for text in texts:
+            row = len(self.lengths)
+            counts = Counter(tokenize(text))
+            self.lengths.append(sum(counts.values()))
+            for term, count in counts.items():
+                entry = self.postings.get(term)
+                if entry is None:
+                    entry = self.postings[term] = (array("i"), array("i"))
+                entry[0].append(row)
+                entry[1].append(count)
+
+    def finish(self):
+        terms = sorted(self.postings)
+        sizes = np.array([len(self.postings[t][0]) for t in terms], dtype=np.int64)
+        offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+        rows = np.frombuffer(b"".join(self.postings[t][0].tobytes() for t in terms), dtype=np.int32)
+        tf = np.frombuffer(b"".join(self.postings[t][1].tobytes() for t in terms), dtype=np.int32)
+        lengths = np.frombuffer(self.lengths.tobytes(), dtype=np.int32)
+        return LexicalIndex(terms, offsets, rows, tf, lengths, int(lengths.sum()))
+
+def write_lexical(path, index):
+    """Saves the index into a segment folder; lex.json goes last, so a half-written index is never read."""
+    index.offsets.tofile(os.path.join(path, "lex-offsets.i64"))
+    index.rows.tofile(os.path.join(path, "lex-rows.i32"))
+    index.tf.tofile(os.path.join(path, "lex-tf.i32"))
+    index.lengths.tofile(os.path.join(path, "lex-doclen.i32"))
+    tmp_path = os.path.join(path, LEXICAL_INFO_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"docs": index.docs, "total_length": index.total_length, "terms": index.terms}, f)
+    os.replace(tmp_path, os.path.join(path, LEXICAL_INFO_FILE))
+
+def _map_file(path, dtype):
+    if os.path.getsize(path) == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r")
+
+def read_lexical(path):
+    """The segment's BM25 index (postings memory-mapped), or None if it has none."""
+    info_path = os.path.join(path, LEXICAL_INFO_FILE)
+    if not os.path.exists(info_path):
+        return None
+    with open(info_path, "r", encoding="utf-8") as f:
+        info = json.load(f)
+    return LexicalIndex(info["terms"], _map_file(os.path.join(path, "lex-offsets.i64"), np.int64),
+                        _map_file(os.path.join(path, "lex-rows.i32"), np.int32),
+                        _map_file(os.path.join(path, "lex-tf.i32"), np.int32),
+                        _map_file(os.path.join(path, "lex-doclen.i32"), np.int32), info["total_length"])
+
+_load_lock = threading.Lock()
+
+def load_lexical(path, texts):
+    """
+    read_lexical(), or for segments written before BM25 existed: builds the
+    index from `texts()` (every row, in row order) once and saves it.
+    """
+    with _load_lock:
+        index = read_lexical(path)
+        if index is not None:
+            return index
+        logger.info(f"🔤 Building BM25 index for {os.path.basename(path)}...")
+        builder = LexicalBuilder()
+        builder.add(texts())
+        index = builder.finish()
+        try:
+            write_lexical(path, index)
+        except OSError as e:
+            logger.warning(f"⚠️ Could not save BM25 index for {path} ({e}), keeping it in memory")
+        return index
+
+def doc_key(doc):
+    return (doc.page_content, doc.metadata.get("source"), doc.metadata.get("page"))
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """
+    Merges ranked Document lists (e.g. dense + BM25): each document scores
+    sum(1 / (k + rank)) over the lists it appears in. Best first, no duplicates.
+    """
+    scores, docs = {}, {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, 1):
+            key = doc_key(doc)
+            docs.setdefault(key, doc)
+            scores[key] = scores.get(key, 0.0) + 1 / (k + rank)
+    return [docs[key] for key in sorted(scores, key=lambda key: scores[key], reverse=True)]
@@ -0,0 +1,374 @@
+import os
+import json
+import numbers
+import numpy as np
+import faiss
+from langchain_core.documents import Document
+from src.ann import read_ann, search_params, build_codes, PQ_RESCORE_FACTOR, CODES_FILE, ANN_FILE
+from src.lexical import LexicalBuilder, write_lexical, load_lexical
+from src.config import VECTOR_STORAGE, VECTOR_KEEP_FLOAT16, RESCORE_FACTOR
+
+# On-disk layout of one segment (all plain files, no pickle):
+#
+#   meta.json          {"format": 1, "count", "dim", "storage", "columns": [{"name", "type"}]}
+#   vectors.f32        count x dim float32, row-major   -> np.memmap  (storage "float32")
+#   codes.faiss        SQ8 / PQ codes, held in RAM                    (storage "sq8" / "pq")
+#   vectors.f16        optional float16 originals for exact re-scoring of compressed search
+#   norms.f32          squared L2 norm per row          -> np.memmap
+#   text.bin           all chunk texts, utf-8, back to back
+#   offsets.i64        count + 1 byte offsets into text.bin
+#   col-<i>.i64        int metadata column (INT_NULL = missing)
+#   col-<i>.codes.i32  string / json metadata column: dictionary codes (-1 = missing)
+#   col-<i>.dict.json  ... and the dictionary itself
+#   ann.faiss/.json    optional IVF / HNSW index over the same rows (see src/ann.py)
+#   lex*.json/.i64/.i32  BM25 keyword index over the same rows (see src/lexical.py)
+#
+# Segments are never modified: deleted rows ("tombstones") are listed as
+# [start, end) row ranges in the store manifest and skipped by searches.
+# Opening a segment only maps the files and reads the (small) dictionaries,
+# so it is ~O(1) in the number of chunks, and the OS page cache is shared
+# by every process that maps the same segment.
+SEGMENT_FORMAT = 1
+INT_NULL = np.iinfo(np.int64).min
+SEARCH_BLOCK_ROWS = 65536
+
+def _map(path, dtype, shape=None):
+    """np.memmap that also works for empty files (mmap can't map 0 bytes)."""
+    if os.path.getsize(path) == 0:
+        return np.zeros(0 if shape is None else shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=shape)
+
+def _is_int(value):
+    return isinstance(value, numbers.Integral) and not isinstance(value, bool)
+
+def rows_to_ranges(rows):
+    """Sorted unique row ids -> [[start, end), ...] (compact form for the manifest)."""
+    rows = np.asarray(rows, dtype=np.int64)
+    if not len(rows):
+        return []
+    breaks = np.flatnonzero(np.diff(rows) != 1)
+    starts = np.concatenate([[rows[0]], rows[breaks + 1]])
+    ends = np.concatenate([rows[breaks], [rows[-1]]]) + 1
+    return [[int(a), int(b)] for a, b in zip(starts, ends)]
+
+def ranges_to_mask(ranges, count):
+    mask = np.zeros(count, dtype=bool)
+    for start, end in ranges or []:
+        mask[start:end] = True
+    return mask
+
+def read_source_column(path):
+    """
+    (codes, dictionary) of a segment's "source" column, without opening the
+    whole segment: enough to find the rows of a document. None if it has none.
+    """
+    with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    for i, column in enumerate(meta["columns"]):
+        if column["name"] == "source" and column["type"] == "str":
+            with open(os.path.join(path, f"col-{i}.dict.json"), "r", encoding="utf-8") as f:
+                dictionary = json.load(f)
+            return _map(os.path.join(path, f"col-{i}.codes.i32"), np.int32), dictionary
+    return None
+
+def source_rows(path, sources):
+    """Row ids of the chunks whose "source" is in `sources`."""
+    column = read_source_column(path)
+    if column is None:
+        return np.empty(0, dtype=np.int64)
+    codes, dictionary = column
+    wanted = [i for i, value in enumerate(dictionary) if value in sources]
+    if not wanted:
+        return np.empty(0, dtype=np.int64)
+    return np.flatnonzero(np.isin(codes, wanted))
+
+class SegmentBuilder:
+    """
+    Streams chunks straight into the segment files in `path`.
+    Vectors and text go to disk batch by batch; only the metadata columns are
+    kept in memory until finish() decides each column's type.
+    With a compressed `storage` the float32 vectors are quantized in finish()
+    (the quantizer needs the whole segment to train on) and then dropped.
+    """
+    def __init__(self, path, storage=None, keep_float16=None):
+        self.path = path
+        self.storage = storage or VECTOR_STORAGE
+        self.keep_float16 = VECTOR_KEEP_FLOAT16 if keep_float16 is None else keep_float16
+        os.makedirs(path, exist_ok=True)
+        self.count = 0
+        self.dim = None
+        self.text_size = 0
+        self.offsets = [0]
+        self.columns = {}  # name -> list of values (None = missing)
+        self.lexical = LexicalBuilder()
+        self._vectors = open(os.path.join(path, "vectors.f32"), "wb")
+        self._norms = open(os.path.join(path, "norms.f32"), "wb")
+        self._text = open(os.path.join(path, "text.bin"), "wb")
+
+    def add(self, texts, vectors, metadatas):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) != len(texts):
+            raise ValueError(f"Expected {len(texts)} vectors, got shape {vectors.shape}")
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"Vector dimension {vectors.shape[1]} != segment dimension {self.dim}")
+
+        self._vectors.write(vectors.tobytes())
+        self._norms.write(np.einsum("ij,ij->i", vectors, vectors).astype(np.float32).tobytes())
+        for text in texts:
+            data = text.encode("utf-8")
+            self._text.write(data)
+            self.text_size += len(data)
+            self.offsets.append(self.text_size)
+        self.lexical.add(texts)
+
+        for i, metadata in enumerate(metadatas or [{}] * len(texts)):
+            for name, value in metadata.items():
+                if name not in self.columns:
+                    self.columns[name] = [None] * (self.count + i)
+                self.columns[name].append(value)
+            for name, values in self.columns.items():
+                if len(values) < self.count + i + 1:
+                    values.append(None)
+        self.count += len(texts)
+
+    def finish(self):
+        """Writes offsets + metadata columns and closes the files. Returns the chunk count."""
+        for f in (self._vectors, self._norms, self._text):
+            f.close()
+        np.asarray(self.offsets, dtype=np.int64).tofile(os.path.join(self.path, "offsets.i64"))
+
+        column_info = []
+        for i, (name, values) in enumerate(self.columns.items()):
+            present = [v for v in values if v is not None]
+            if present and all(_is_int(v) for v in present):
+                column = np.array([INT_NULL if v is None else int(v) for v in values], dtype=np.int64)
+                column.tofile(os.path.join(self.path, f"col-{i}.i64"))
+                column_info.append({"name": name, "type": "int"})
+                continue
+
+            # Strings are dictionary-encoded (a handful of distinct sources, sheets, ...)
+            kind = "str" if all(isinstance(v, str) for v in present) else "json"
+            encode = (lambda v: v) if kind == "str" else json.dumps
+            dictionary, codes = {}, np.full(len(values), -1, dtype=np.int32)
+            for row, value in enumerate(values):
+                if value is not None:
+                    codes[row] = dictionary.setdefault(encode(value), len(dictionary))
+            codes.tofile(os.path.join(self.path, f"col-{i}.codes.i32"))
+            with open(os.path.join(self.path, f"col-{i}.dict.json"), "w", encoding="utf-8") as f:
+                json.dump(list(dictionary), f)
+            column_info.append({"name": name, "type": kind})
+
+        write_lexical(self.path, self.lexical.finish())
+        self.lexical = None
+
+        storage = self._compress() if self.storage != "float32" and self.count else "float32"
+        with open(os.path.join(self.path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"format": SEGMENT_FORMAT, "count": self.count, "dim": self.dim,
+                       "storage": storage, "columns": column_info}, f)
+        return self.count
+
+    def _compress(self):
+        """float32 vectors -> SQ8 / PQ codes (+ float16 originals). Returns the storage used."""
+        f32_path = os.path.join(self.path, "vectors.f32")
+        vectors = np.memmap(f32_path, dtype=np.float32, mode="r", shape=(self.count, self.dim))
+        codes, storage = build_codes(vectors, self.storage)
+        faiss.write_index(codes, os.path.join(self.path, CODES_FILE))
+        if self.keep_float16:
+            with open(os.path.join(self.path, "vectors.f16"), "wb") as f:
+                for start in range(0, self.count, SEARCH_BLOCK_ROWS):
+                    f.write(np.asarray(vectors[start:start + SEARCH_BLOCK_ROWS], dtype=np.float16).tobytes())
+        del vectors
+        os.remove(f32_path)
+        return storage
+
+    def abort(self):
+        for f in (self._vectors, self._norms, self._text):
+            f.close()
+
+class MmapSegment:
+    """
+    Read-only, memory-mapped segment. Searched through its ANN index if it has
+    one, otherwise with a blocked brute-force L2 scan.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.count = meta["count"]
+        self.dim = meta["dim"]
+        self.storage = meta.get("storage", "float32")
+        self.codes = None
+        if self.storage == "float32":
+            self.vectors = _map(os.path.join(path, "vectors.f32"), np.float32, (self.count, self.dim))
+        else:
+            self.codes = faiss.read_index(os.path.join(path, CODES_FILE))
+            f16_path = os.path.join(path, "vectors.f16")
+            self.vectors = _map(f16_path, np.float16, (self.count, self.dim)) if os.path.exists(f16_path) else None
+        self.norms = _map(os.path.join(path, "norms.f32"), np.float32)
+        self.text = _map(os.path.join(path, "text.bin"), np.uint8)
+        self.offsets = _map(os.path.join(path, "offsets.i64"), np.int64)
+        self.columns = []  # (name, type, data, dictionary)
+        for i, column in enumerate(meta["columns"]):
+            if column["type"] == "int":
+                self.columns.append((column["name"], "int", _map(os.path.join(path, f"col-{i}.i64"), np.int64), None))
+            else:
+                with open(os.path.join(path, f"col-{i}.dict.json"), "r", encoding="utf-8") as f:
+                    dictionary = json.load(f)
+                if column["type"] == "json":
+                    dictionary = [json.loads(v) for v in dictionary]
+                codes = _map(os.path.join(path, f"col-{i}.codes.i32"), np.int32)
+                self.columns.append((column["name"], column["type"], codes, dictionary))
+        self.ann, self.index_type = read_ann(path)
+        self.ann_bytes = os.path.getsize(os.path.join(path, ANN_FILE)) if self.ann is not None else 0
+        self._lexical = None  # opened on the first keyword search
+        self.set_deleted([])
+
+    def __len__(self):
+        return self.count
+
+    def set_deleted(self, ranges):
+        """Applies the tombstones from the manifest (takes effect for the next search)."""
+        self.deleted_ranges = [list(r) for r in ranges or []]
+        mask = ranges_to_mask(self.deleted_ranges, self.count) if self.deleted_ranges else None
+        self.deleted_count = int(mask.sum()) if mask is not None else 0
+        self.deleted = mask
+
+    @property
+    def live_count(self):
+        return self.count - self.deleted_count
+
+    def live_rows(self):
+        if self.deleted is None:
+            return np.arange(self.count)
+        return np.flatnonzero(~self.deleted)
+
+    def memory_bytes(self):
+        """Size of what a search has to scan: the codes (in RAM) or the float32 vectors."""
+        if self.codes is not None:
+            return self.codes.sa_code_size() * self.count
+        return self.count * self.dim * 4
+
+    def read_vectors(self, start, end):
+        """float32 rows [start, end): originals if stored, otherwise decoded from the codes."""
+        if self.vectors is not None:
+            return np.asarray(self.vectors[start:end], dtype=np.float32)
+        return self.codes.reconstruct_n(start, end - start)
+
+    def float_vectors(self):
+        """All vectors as a (memory-mapped where possible) matrix, e.g. to build an ANN index."""
+        if self.vectors is not None:
+            return self.vectors
+        return self.read_vectors(0, self.count)
+
+    def get_text(self, row):
+        return bytes(self.text[self.offsets[row]:self.offsets[row + 1]]).decode("utf-8")
+
+    def get_metadata(self, row):
+        metadata = {}
+        for name, kind, data, dictionary in self.columns:
+            value = data[row]
+            if kind == "int":
+                if value != INT_NULL:
+                    metadata[name] = int(value)
+            elif value >= 0:
+                metadata[name] = dictionary[value]
+        return metadata
+
+    def lexical(self):
+        """The BM25 index of this segment (built and saved on first use for older segments)."""
+        if self._lexical is None:
+            self._lexical = load_lexical(self.path, lambda: (self.get_text(row) for row in range(self.count)))
+        return self._lexical
+
+    def get_document(self, row):
+        return Document(page_content=self.get_text(row), metadata=self.get_metadata(row))
+
+    def iter_batches(self, batch_size=SEARCH_BLOCK_ROWS):
+        """(texts, vectors, metadatas) blocks of the live rows, e.g. for compaction."""
+        for start in range(0, self.count, batch_size):
+            end = min(start + batch_size, self.count)
+            vectors = self.read_vectors(start, end)
+            rows = np.arange(start, end)
+            if self.deleted is not None:
+                keep = ~self.deleted[start:end]
+                rows, vectors = rows[keep], vectors[keep]
+                if not len(rows):
+                    continue
+            yield ([self.get_text(r) for r in rows], vectors, [self.get_metadata(r) for r in rows])
+
+    def search(self, query, k=4, nprobe=None, ef_search=None):
+        """
+        Squared L2 distances (same scores as FAISS IndexFlatL2): [(row, distance)] best first.
+        `nprobe` (IVF) / `ef_search` (HNSW) trade recall for speed per query.
+        """
+        if not self.live_count:
+            return []
+        query = np.asarray(query, dtype=np.float32)
+        if self.ann is None and self.codes is None:
+            return self._search_flat(query, k)
+        # Index searches can't skip tombstones: fetch more until k live rows are found
+        fetch = k
+        while True:
+            if self.ann is not None:
+                results = self._search_ann(query, fetch, nprobe, ef_search)
+            else:
+                results = self._search_codes(query, fetch)
+            if self.deleted is None:
+                return results
+            live = [(row, score) for row, score in results if not self.deleted[row]]
+            if len(live) >= k or fetch >= self.count:
+                return live[:k]
+            fetch *= 4
+
+    def _rescore(self, query, rows):
+        """Squared L2 distances against the stored originals, for a short list of rows."""
+        rows = np.sort(rows)
+        diff = np.asarray(self.vectors[rows], dtype=np.float32) - query
+        return rows, np.einsum("ij,ij->i", diff, diff)
+
+    def _search_codes(self, query, k):
+        """Exhaustive search over the SQ8 / PQ codes, then exact re-scoring of the shortlist."""
+        fetch = k * RESCORE_FACTOR if self.vectors is not None else k
+        distances, rows = self.codes.search(query[None, :], min(fetch, self.count))
+        found = rows[0] >= 0
+        rows, scores = rows[0][found], distances[0][found]
+        if self.vectors is not None:
+            rows, scores = self._rescore(query, rows)
+        order = np.argsort(scores, kind="stable")[:k]
+        return [(int(rows[i]), float(max(scores[i], 0.0))) for i in order]
+
+    def _search_ann(self, query, k, nprobe, ef_search):
+        fetch = k * PQ_RESCORE_FACTOR if self.index_type == "ivf_pq" else k
+        params = search_params(self.index_type, nprobe, ef_search)
+        distances, rows = self.ann.search(query[None, :], min(fetch, self.count), params=params)
+        found = rows[0] >= 0
+        rows, scores = rows[0][found], distances[0][found]
+        if self.index_type == "ivf_pq" and self.vectors is not None:
+            rows, scores = self._rescore(query, rows)
+        order = np.argsort(scores, kind="stable")[:k]
+        return [(int(rows[i]), float(max(scores[i], 0.0))) for i in order]
+
+    def _search_flat(self, query, k):
+        query_norm = float(query @ query)
+        best_rows, best_scores = [], []
+        # Blocked scan: one BLAS matvec per block, memory use independent of segment size
+        for start in range(0, self.count, SEARCH_BLOCK_ROWS):
+            block = self.vectors[start:start + SEARCH_BLOCK_ROWS]
+            scores = self.norms[start:start + len(block)] - 2 * (block @ query) + query_norm
+            if self.deleted is not None:
+                scores[self.deleted[start:start + len(block)]] = np.inf
+            if len(scores) > k:
+                top = np.argpartition(scores, k)[:k]
+            else:
+                top = np.arange(len(scores))
+            best_rows.append(top + start)
+            best_scores.append(scores[top])
+        rows, scores = np.concatenate(best_rows), np.concatenate(best_scores)
+        order = np.argsort(scores, kind="stable")[:k]
+        order = order[np.isfinite(scores[order])]
+        return [(int(rows[i]), float(max(scores[i], 0.0))) for i in order]
+
+    def similarity_search_with_score_by_vector(self, embedding, k=4, **search_kwargs):
+        return [(self.get_document(row), score) for row, score in self.search(embedding, k, **search_kwargs)]
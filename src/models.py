@@ -0,0 +1,228 @@
+import os
+import time
+import threading
+from langchain_core.embeddings import Embeddings
+from src.config import (EMBEDDING_MODEL, EMBEDDING_CACHE_ENABLED, EMBEDDING_BACKEND, ONNX_QUANTIZE, ONNX_THREADS, EMBED_BUCKETING,
+                        EMBED_POOL_WORKERS, CROSS_ENCODER_MODEL, INFERENCE_SOCKET)
+from src.logger import logger
+
+# Lazy model registry: nothing heavy (torch, transformers, sentence-transformers,
+# Groq clients) is imported or loaded at import time. Each model is built by its
+# factory on first use (or by the background warm-up at startup), exactly once.
+
+# ✅ UPDATED: BGE-Small (Fast + Good Quality), see EMBEDDING_MODEL in config
+EMBEDDING_MODEL_NAME = EMBEDDING_MODEL
+# "ms-marco-MiniLM-L-6-v2" is fast and effective for passing to LLM (see CROSS_ENCODER_MODEL in config)
+CROSS_ENCODER_MODEL_NAME = CROSS_ENCODER_MODEL
+
+class ModelRegistry:
+    """
+    name -> factory. get(name) builds the model on first use (one thread
+    builds, concurrent callers wait for it). A failing REQUIRED model raises and
+    is retried on the next get(); a failing optional one returns None (e.g. no
+    re-ranking) and is not retried.
+    """
+    def __init__(self):
+        self._specs = {}  # name -> (factory, required)
+        self._models = {}
+        self._errors = {}
+        self._load_seconds = {}
+        self._locks = {}
+        self._warmup = None
+
+    def register(self, name, factory, required=True):
+        self._specs[name] = (factory, required)
+        self._locks[name] = threading.Lock()
+
+    def get(self, name):
+        model = self._models.get(name)
+        if model is not None:
+            return model
+        factory, required = self._specs[name]
+        with self._locks[name]:
+            if name in self._models:
+                return self._models[name]
+            if not required and name in self._errors:
+                return None
+            logger.info(f"⏳ Loading {name}...")
+            started = time.perf_counter()
+            try:
+                model = factory()
+            except Exception as e:
+                self._errors[name] = str(e)
+                if required:
+                    logger.error(f"❌ Failed to load {name}: {e}")
+                    raise
+                logger.warning(f"⚠️ Could not load {name}: {e}")
+                return None
+            self._load_seconds[name] = round(time.perf_counter() - started, 3)
+            self._errors.pop(name, None)
+            self._models[name] = model
+            logger.info(f"✅ {name} loaded in {self._load_seconds[name]}s")
+            return model
+
+    def is_loaded(self, name):
+        return name in self._models
+
+    def warm_up(self, names=None):
+        """Loads the given (default: all) models now; failures are only recorded."""
+        for name in names or list(self._specs):
+            try:
+                self.get(name)
+            except Exception:
+                pass
+
+    def warm_up_in_background(self, names=None):
+        """Starts warm_up() on a daemon thread, so the server accepts requests meanwhile."""
+        if self._warmup is not None and self._warmup.is_alive():
+            return self._warmup
+        self._warmup = threading.Thread(target=self.warm_up, args=(names,), name="model-warmup", daemon=True)
+        self._warmup.start()
+        return self._warmup
+
+    def ready(self):
+        """True once every required model is loaded."""
+        return all(name in self._models for name, (_, required) in self._specs.items() if required)
+
+    def status(self):
+        return {
+            "ready": self.ready(),
+            "warming_up": bool(self._warmup and self._warmup.is_alive()),
+            "models": {
+                name: {
+                    "required": required,
+                    "loaded": name in self._models,
+                    "load_seconds": self._load_seconds.get(name),
+                    "error": self._errors.get(name),
+                }
+                for name, (_, required) in self._specs.items()
+            },
+        }
+
+class LazyEmbeddings(Embeddings):
+    """
+    Embeddings object that can be handed out at import time: the registry
+    model behind it is only loaded on the first embed call. Other attributes
+    (e.g. the embedding cache's hits / misses) are forwarded to the model.
+    """
+    def __init__(self, registry, name):
+        self.registry = registry
+        self.name = name
+
+    @property
+    def model(self):
+        return self.registry.get(self.name)
+
+    def embed_documents(self, texts):
+        return self.model.embed_documents(texts)
+
+    def embed_query(self, text):
+        return self.model.embed_query(text)
+
+    def __getattr__(self, attr):
+        if attr.startswith("_") or attr in ("registry", "name"):
+            raise AttributeError(attr)
+        return getattr(self.model, attr)
+
+# ==========================================
+# FACTORIES
+# ==========================================
+def load_embeddings():
+    from src.embedding_cache import CachedEmbeddings
+    from src.embed_pool import PooledEmbeddings
+
+    embeddings = load_base_embeddings()
+    # ✅ Big ingests on CPU fan out to a pool of embedding processes (see src/embed_pool.py)
+    if EMBED_POOL_WORKERS > 1 and embedding_on_cpu():
+        embeddings = PooledEmbeddings(embeddings, load_base_embeddings)
+    # ✅ Identical chunks (boilerplate, re-sent revisions) are never encoded twice
+    if EMBEDDING_CACHE_ENABLED:
+        cache_name = EMBEDDING_MODEL_NAME
+        if EMBEDDING_BACKEND == "onnx" and ONNX_QUANTIZE:
+            # int8 vectors are close but not identical: keep them out of the fp32 cache
+            cache_name = f"{EMBEDDING_MODEL_NAME}-onnx-int8"
+        embeddings = CachedEmbeddings(embeddings, cache_name)
+    return embeddings
+
+def load_base_embeddings(threads=None):
+    """The embedding model without the disk cache (also what each embedding pool worker loads)."""
+    from src.batching import TokenBudgetEmbeddings, SentenceTransformerBatches
+
+    if EMBEDDING_BACKEND == "onnx":
+        # ✅ ONNX Runtime on CPU: same normalized vectors (checked at export), no torch at run time
+        from src.onnx_embedder import load_onnx_embeddings
+        embeddings = load_onnx_embeddings(EMBEDDING_MODEL_NAME, quantized=ONNX_QUANTIZE, batch_size=32,
+                                          threads=threads or ONNX_THREADS)
+        batches = embeddings
+    else:
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        embeddings = load_torch_embeddings()
+        batches = SentenceTransformerBatches(embeddings) if hasattr(embeddings, "_client") else None
+    # ✅ Length-sorted, token-budgeted batches: short chunks aren't padded to long ones
+    if EMBED_BUCKETING and batches is not None:
+        embeddings = TokenBudgetEmbeddings(embeddings, batches)
+    return embeddings
+
+def embedding_on_cpu():
+    if EMBEDDING_BACKEND == "onnx":
+        return True
+    import torch
+    return not torch.cuda.is_available()
+
+def load_torch_embeddings(model_name=EMBEDDING_MODEL_NAME):
+    import torch
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    # ✅ ADDED: Auto-Detect GPU
+    # If you have an NVIDIA card, it will switch to 'cuda' automatically.
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    logger.info(f"🚀 Embedding Device: {device.upper()}")
+
+    return HuggingFaceEmbeddings(
+        model_name=model_name,
+        model_kwargs={'device': device},
+        # ✅ UPDATED: Increased batch size for BGE-Small (faster)
+        encode_kwargs={'normalize_embeddings': True, 'batch_size': 32}
+    )
+
+def load_cross_encoder():
+    # Cross-Encoder for Re-Ranking
+    from sentence_transformers import CrossEncoder
+    return CrossEncoder(CROSS_ENCODER_MODEL_NAME)
+
+def load_sidecar_embeddings():
+    from src.inference_server import InferenceClient, SidecarEmbeddings
+    client = InferenceClient(INFERENCE_SOCKET)
+    # Not "loaded" (and /health/ready stays 503) until the inference server answers
+    client.status()
+    return SidecarEmbeddings(client)
+
+def load_sidecar_cross_encoder():
+    from src.inference_server import InferenceClient, SidecarCrossEncoder
+    # No check here: an optional model that fails is never retried, and a failed
+    # rerank call already falls back to vector order
+    return SidecarCrossEncoder(InferenceClient(INFERENCE_SOCKET))
+
+def llm_factory(model, max_tokens):
+    def load_llm():
+        from langchain_groq import ChatGroq
+        return ChatGroq(
+            model=model,
+            temperature=0.3,
+            max_tokens=max_tokens,
+            api_key=os.getenv("GROQ_API_KEY")
+        )
+    return load_llm
+
+models = ModelRegistry()
+if INFERENCE_SOCKET:
+    # ✅ Thin client: the models live in the inference server (python -m src.inference_server)
+    models.register("embeddings", load_sidecar_embeddings)
+    models.register("cross_encoder", load_sidecar_cross_encoder, required=False)
+else:
+    models.register("embeddings", load_embeddings)
+    models.register("cross_encoder", load_cross_encoder, required=False)
+models.register("llm_70b", llm_factory("llama-3.3-70b-versatile", 2500))
+models.register("llm_8b", llm_factory("llama-3.1-8b-instant", 856))
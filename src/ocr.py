@@ -0,0 +1,96 @@
+import os
+import platform
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import fitz  # PyMuPDF
+import pytesseract
+from PIL import Image
+from src.config import OCR_WORKERS, OCR_QUEUE_SIZE, OCR_TARGET_LONG_SIDE_PX, OCR_MIN_DPI, OCR_MAX_DPI
+
+# ✅ CONFIG: Tesseract Path
+if platform.system() == "Windows":
+    pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+else:
+    # On Hugging Face (Linux), Tesseract is already in the PATH
+    pytesseract.pytesseract.tesseract_cmd = "/usr/bin/tesseract"
+
+# We run several tesseract processes side by side, so each one should stay
+# single-threaded instead of fighting the others for cores (OpenMP). The limit
+# goes into a copy of the environment for the tesseract subprocess only: setting
+# it in os.environ would also cap torch in this process and the embedding workers.
+_subprocess_args = pytesseract.pytesseract.subprocess_args
+
+def _tesseract_subprocess_args(include_stdout=True):
+    kwargs = _subprocess_args(include_stdout)
+    kwargs["env"] = {"OMP_THREAD_LIMIT": "1", **os.environ}
+    return kwargs
+
+pytesseract.pytesseract.subprocess_args = _tesseract_subprocess_args
+
+TESSERACT_CONFIG = '--psm 6'
+
+def choose_dpi(page):
+    """Picks a render DPI from the page size (points are 1/72 inch)."""
+    long_side_inches = max(page.rect.width, page.rect.height) / 72
+    if long_side_inches <= 0:
+        return OCR_MAX_DPI
+    dpi = int(OCR_TARGET_LONG_SIDE_PX / long_side_inches)
+    return max(OCR_MIN_DPI, min(OCR_MAX_DPI, dpi))
+
+def render_page(page):
+    """Renders a page as a grayscale pixmap (tesseract binarizes anyway, 1/3 the memory of RGB)."""
+    return page.get_pixmap(dpi=choose_dpi(page), colorspace=fitz.csGRAY, alpha=False)
+
+def pixmap_to_image(pix):
+    """
+    Wraps the pixmap sample buffer in a PIL image WITHOUT a PNG encode/decode round trip.
+    The caller must keep `pix` alive while the image is in use (the buffer is shared).
+    """
+    mode = {1: "L", 3: "RGB", 4: "RGBA"}.get(pix.n, "RGB")
+    samples = getattr(pix, "samples_mv", None) or pix.samples
+    return Image.frombuffer(mode, (pix.width, pix.height), samples, "raw", mode, pix.stride, 1)
+
+def image_to_text(image):
+    return pytesseract.image_to_string(image, config=TESSERACT_CONFIG)
+
+def pixmap_to_text(pix):
+    # `pix` is referenced by this frame until tesseract is done with the shared buffer.
+    return image_to_text(pixmap_to_image(pix))
+
+class OCRPool:
+    """
+    Runs several tesseract processes at once behind a BOUNDED queue.
+    submit() blocks once `workers + queue_size` jobs are in flight, so a fast
+    producer (text extraction) can't pile up unbounded rendered pages in memory.
+    Threads are enough here: the heavy lifting happens in the tesseract subprocess.
+    """
+    def __init__(self, workers=OCR_WORKERS, queue_size=OCR_QUEUE_SIZE):
+        self._executor = ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="ocr")
+        self._slots = threading.BoundedSemaphore(max(workers, 1) + max(queue_size, 0))
+
+    def submit(self, fn, *args):
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def ocr_pixmap(self, pix):
+        return self.submit(pixmap_to_text, pix)
+
+    def ocr_image(self, image):
+        return self.submit(image_to_text, image)
+
+_ocr_pool = None
+_ocr_pool_lock = threading.Lock()
+
+def get_ocr_pool():
+    """Process-wide OCR pool (created on first use, so PDF workers build their own)."""
+    global _ocr_pool
+    with _ocr_pool_lock:
+        if _ocr_pool is None:
+            _ocr_pool = OCRPool()
+        return _ocr_pool
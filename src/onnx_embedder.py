@@ -0,0 +1,174 @@
+import os
+import json
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from src.config import ONNX_MODEL_DIR, ONNX_THREADS, ONNX_MAX_ABS_DIFF, ONNX_INT8_MIN_COSINE
+from src.logger import logger
+
+# ONNX Runtime backend for the sentence-transformers embedder (CPU-only nodes).
+# The model is exported once from the same SentenceTransformer that
+# HuggingFaceEmbeddings runs (transformer + pooling + normalize), so both
+# backends produce the same normalized vectors; export_onnx() checks that.
+#
+#   onnx_models/<model>/model.onnx        fp32 export
+#   onnx_models/<model>/model.int8.onnx   dynamically quantized (int8 weights)
+#   onnx_models/<model>/tokenizer.json
+#   onnx_models/<model>/embedder.json     pooling, max length, tolerance check results
+
+FP32_FILE = "model.onnx"
+INT8_FILE = "model.int8.onnx"
+META_FILE = "embedder.json"
+
+# Sentences the export is checked on (short, long, table-ish, numbers)
+CHECK_TEXTS = [
+    "What is the warranty period for the pump?",
+    "Invoice 10423: 3 x filter cartridge, 2 x pressure valve, total 418.50 EUR.",
+    "Battery | Voltage | Capacity\nLFP-200 | 12.8 V | 200 Ah",
+    "The firmware update procedure requires the panel to be powered down. " * 12,
+    "ok",
+]
+
+def model_dir(model_name, root=ONNX_MODEL_DIR):
+    from src.embedding_cache import model_slug
+    return os.path.join(root, model_slug(model_name))
+
+def compare(reference, candidate):
+    """Max abs difference and min cosine similarity between two sets of normalized vectors."""
+    reference, candidate = np.asarray(reference, dtype=np.float32), np.asarray(candidate, dtype=np.float32)
+    cosines = np.sum(reference * candidate, axis=1) / (
+        np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1))
+    return {"max_abs_diff": float(np.max(np.abs(reference - candidate))), "min_cosine": float(np.min(cosines))}
+
+def within_tolerance(result, quantized):
+    # fp32 must match the torch output; int8 weights only have to keep the same direction
+    if quantized:
+        return result["min_cosine"] >= ONNX_INT8_MIN_COSINE
+    return result["max_abs_diff"] <= ONNX_MAX_ABS_DIFF
+
+def _pooling_mode(pooling):
+    config = pooling.get_config_dict()
+    mode = config.get("pooling_mode")
+    if mode is None:  # older sentence-transformers: one flag per mode
+        mode = "cls" if config.get("pooling_mode_cls_token") else (
+            "mean" if config.get("pooling_mode_mean_tokens") else None)
+    if mode not in ("cls", "mean"):
+        raise ValueError(f"Unsupported pooling for ONNX export: {config}")
+    return mode
+
+def export_onnx(model_name, out_dir=None, quantize=True, texts=CHECK_TEXTS):
+    """
+    Exports the SentenceTransformer's transformer to ONNX (+ an int8 copy) and
+    checks the ONNX outputs against the torch ones. Raises ValueError if they
+    are out of tolerance. Needs torch / sentence-transformers (once).
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    out_dir = out_dir or model_dir(model_name)
+    os.makedirs(out_dir, exist_ok=True)
+    logger.info(f"📦 Exporting {model_name} to ONNX in {out_dir}...")
+    st = SentenceTransformer(model_name, device="cpu")
+    transformer = st[0]
+    pooling = _pooling_mode(st[1])
+    transformer.tokenizer.save_pretrained(out_dir)
+
+    encoded = transformer.tokenizer(texts[:2], padding=True, return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in encoded]
+
+    class Encoder(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+        def forward(self, *inputs):
+            return self.model(**dict(zip(input_names, inputs))).last_hidden_state
+
+    dynamic_axes = {name: {0: "batch", 1: "tokens"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "tokens"}
+    with torch.no_grad():
+        torch.onnx.export(Encoder(transformer.auto_model.eval()), tuple(encoded[n] for n in input_names),
+                          os.path.join(out_dir, FP32_FILE), input_names=input_names,
+                          output_names=["last_hidden_state"], dynamic_axes=dynamic_axes,
+                          opset_version=17, dynamo=False)
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantize_dynamic(os.path.join(out_dir, FP32_FILE), os.path.join(out_dir, INT8_FILE),
+                         weight_type=QuantType.QInt8)
+
+    meta = {"model": model_name, "pooling": pooling, "max_length": transformer.max_seq_length,
+            "dim": len(st.encode(["dim"])[0]), "checks": {}}
+    with open(os.path.join(out_dir, META_FILE), "w") as f:
+        json.dump(meta, f, indent=2)
+
+    # Tolerance check against the torch path (same texts, normalized outputs)
+    reference = st.encode(texts, normalize_embeddings=True)
+    for quantized in ([False, True] if quantize else [False]):
+        result = compare(reference, OnnxEmbeddings(out_dir, quantized=quantized).embed_documents(texts))
+        meta["checks"][INT8_FILE if quantized else FP32_FILE] = result
+        if not within_tolerance(result, quantized):
+            os.remove(os.path.join(out_dir, META_FILE))  # never load an export that failed the check
+            raise ValueError(f"ONNX export of {model_name} is out of tolerance ({'int8' if quantized else 'fp32'}): {result}")
+        logger.info(f"✅ ONNX {'int8' if quantized else 'fp32'} matches torch: {result}")
+    with open(os.path.join(out_dir, META_FILE), "w") as f:
+        json.dump(meta, f, indent=2)
+    return out_dir
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Same vectors as HuggingFaceEmbeddings(normalize_embeddings=True), computed by
+    onnxruntime: tokenizers -> ONNX transformer -> CLS / mean pooling -> L2 normalize.
+    """
+    def __init__(self, path, quantized=False, batch_size=32, threads=ONNX_THREADS):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(path, META_FILE)) as f:
+            self.meta = json.load(f)
+        self.quantized = quantized
+        self.batch_size = batch_size
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(os.path.join(path, INT8_FILE if quantized else FP32_FILE),
+                                            options, providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+        self.tokenizer = Tokenizer.from_file(os.path.join(path, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.meta["max_length"])
+        self.tokenizer.enable_padding(pad_id=self.tokenizer.token_to_id("[PAD]") or 0)
+
+    def _embed(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        inputs = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        hidden = self.session.run(None, {name: inputs[name] for name in self.input_names})[0]
+        if self.meta["pooling"] == "cls":
+            pooled = hidden[:, 0]
+        else:
+            mask = inputs["attention_mask"][:, :, None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        return pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+
+    def token_lengths(self, texts):
+        return [sum(e.attention_mask) for e in self.tokenizer.encode_batch(texts)]
+
+    def embed_batch(self, texts):
+        """One padded batch (used by TokenBudgetEmbeddings, which picks the batches)."""
+        return self._embed(texts).tolist()
+
+    def embed_documents(self, texts):
+        vectors = [self._embed(texts[i:i + self.batch_size]) for i in range(0, len(texts), self.batch_size)]
+        return np.concatenate(vectors).tolist() if vectors else []
+
+    def embed_query(self, text):
+        return self._embed([text])[0].tolist()
+
+def load_onnx_embeddings(model_name, quantized=False, batch_size=32, threads=ONNX_THREADS):
+    """The ONNX embedder for model_name, exported on first use if it isn't on disk yet."""
+    path = model_dir(model_name)
+    if not os.path.exists(os.path.join(path, META_FILE)) or (
+            quantized and not os.path.exists(os.path.join(path, INT8_FILE))):
+        export_onnx(model_name, path, quantize=True)
+    logger.info(f"🚀 Embedding backend: ONNX Runtime ({'int8' if quantized else 'fp32'}, {path})")
+    return OnnxEmbeddings(path, quantized=quantized, batch_size=batch_size, threads=threads)
@@ -204,43 +204,23 @@
 import os
 import time
 from collections import Counter
-from langchain_groq import ChatGroq
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from src.vector_store import get_vector_db
+from src.config import DEFAULT_COLLECTION, HYBRID_SEARCH_ENABLED, LEXICAL_K
+from src.models import models
+from src.lexical import reciprocal_rank_fusion
 from src.logger import logger
 from dotenv import load_dotenv
 
 load_dotenv()
 
-from sentence_transformers import CrossEncoder
-
 # ==========================================
 # 2. SETUP MODELS
 # ==========================================
-try:
-    # Load Cross-Encoder for Re-Ranking
-    # "ms-marco-MiniLM-L-6-v2" is fast and effective for passing to LLM
-    logger.info("⏳ Loading Cross-Encoder for Re-ranking...")
-    cross_encoder = CrossEncoder("cross-encoder/ms-marco-MiniLM-L-6-v2")
-    logger.info("✅ Cross-Encoder loaded.")
-except Exception as e:
-    logger.warning(f"⚠️ Could not load Cross-Encoder: {e}. Re-ranking will be skipped.")
-    cross_encoder = None
-
-llm_70b = ChatGroq(
-    model="llama-3.3-70b-versatile",
-    temperature=0.3,
-    max_tokens=2500,
-    api_key=os.getenv("GROQ_API_KEY")
-)
-
-llm_8b = ChatGroq(
-    model="llama-3.1-8b-instant",
-    temperature=0.3,
-    max_tokens=856,
-    api_key=os.getenv("GROQ_API_KEY")
-)
+# ✅ Cross-Encoder (re-ranking) and the Groq LLMs live in the lazy model registry
+# (src/models.py): they load on first use or in the start-up warm-up, not at import.
+# If the Cross-Encoder can't be loaded, re-ranking is skipped.
 
 # ==========================================
 # 2. IMPROVED PROMPT
@@ -321,13 +301,23 @@ def get_relevant_docs(query: str, db):
 
     # Step 1: Retrieve Broad Set (Top 12)
     # Vector search is fast but approximate. We cast a wide net.
-    retriever = db.as_retriever(search_kwargs={"k": 12})
-    initial_docs = retriever.invoke(query)
+    # (fans out over all index segments and merges by score)
+    initial_docs = db.similarity_search(query, k=12)
+
+    # Step 1b: Hybrid - BM25 keyword hits (part numbers, clause IDs, error codes the
+    # embedding misses), fused with the vector hits by rank. Still 12 for the re-ranker.
+    if HYBRID_SEARCH_ENABLED and hasattr(db, "lexical_search"):
+        try:
+            keyword_docs = db.lexical_search(query, k=LEXICAL_K)
+            initial_docs = reciprocal_rank_fusion([initial_docs, keyword_docs])[:12]
+        except Exception as e:
+            logger.warning(f"⚠️ Keyword search failed ({e}). Using vector results only.")
     
     if not initial_docs:
         return None, []
     
     # Step 2: Re-Rank with Cross-Encoder (The "Judge")
+    cross_encoder = models.get("cross_encoder")
     if cross_encoder:
         try:
             # Prepare pairs [Query, Doc Text]
@@ -402,7 +392,7 @@ def decompose_query(query: str) -> list[str]:
         start_time = time.time()
         
         # Use simple non-streaming call
-        response = llm_8b.invoke([
+        response = models.get("llm_8b").invoke([
             ("system", system),
             ("user", query)
         ])
@@ -467,14 +457,15 @@ def decompose_query(query: str) -> list[str]:
 # ==========================================
 # 5. ASK QUESTION (STREAMING GENERATOR)
 # ==========================================
-def ask_question(query: str):
+def ask_question(query: str, collection: str = DEFAULT_COLLECTION):
     """
     GENERATOR: Handles multi-step reasoning by decomposing the query first.
+    Retrieval only searches the given collection.
     """
     try:
         logger.info(f"❓ Processing Query: {query}")
         
-        db = get_vector_db()
+        db = get_vector_db(collection)
         if not db:
             yield "⚠️ Database is empty! Please upload a document first."
             return
@@ -530,14 +521,14 @@ def ask_question(query: str):
             try:
                 # Use 8B for speed in multi-hop, or 70B for quality? 
                 # User has free tier, let's stick to 70B for quality answer, 8B was for routing.
-                chain = get_chain(llm_70b)
+                chain = get_chain(models.get("llm_70b"))
                 for chunk in chain.stream({"context": context_text, "question": sub_q}):
                     yield chunk
                     answer_generated = True
             except Exception as e:
                 logger.warning(f"⚠️ 70B Error ({e}). Falling back to 8B.")
                 try:
-                    chain = get_chain(llm_8b)
+                    chain = get_chain(models.get("llm_8b"))
                     for chunk in chain.stream({"context": context_text, "question": sub_q}):
                         yield chunk
                         answer_generated = True
@@ -559,13 +550,13 @@ def ask_question(query: str):
 # ==========================================
 # 5. ALTERNATIVE: NON-STREAMING VERSION
 # ==========================================
-def ask_question_sync(query: str) -> dict:
+def ask_question_sync(query: str, collection: str = DEFAULT_COLLECTION) -> dict:
     """
     Non-streaming version that returns complete response
     Useful for debugging or API endpoints
     """
     try:
-        db = get_vector_db()
+        db = get_vector_db(collection)
         if not db:
             return {"answer": "⚠️ Database is empty!", "sources": []}
 
@@ -587,7 +578,7 @@ def ask_question_sync(query: str) -> dict:
                 source_list.append(s_str)
 
         # Generate answer
-        chain = prompt_template | llm_70b | StrOutputParser()
+        chain = prompt_template | models.get("llm_70b") | StrOutputParser()
         answer = chain.invoke({"context": context_text, "question": query})
         
         return {
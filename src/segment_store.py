@@ -0,0 +1,698 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import threading
+from contextlib import contextmanager
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from src.mmap_segment import (MmapSegment, SegmentBuilder, SEGMENT_FORMAT, SEARCH_BLOCK_ROWS,
+                              rows_to_ranges, ranges_to_mask, read_source_column, source_rows)
+from src.lexical import tokenize, bm25_idf
+from src.ann import choose_index_type, build_index, write_ann, remove_ann
+from src.config import (SEGMENT_COMPACTION_ENABLED, SEGMENT_SMALL_CHUNKS, SEGMENT_COMPACT_MIN_SEGMENTS, SEGMENT_MAX_DELETED_RATIO,
+                        SEGMENT_MAX_BUILD_CHUNKS)
+from src.file_lock import file_lock
+from src.logger import logger
+
+MANIFEST_FILE = "manifest.json"
+VERSION_FILE = "VERSION"
+LOCK_FILE = "manifest.lock"
+SEGMENTS_DIR = "segments"
+# Segment folders still being written (ingests, compaction) until they are renamed into place
+TMP_PREFIX = ".tmp-"
+
+def document_id(source):
+    """Stable ID of a document (its "source": upload name or ZIP member path)."""
+    return hashlib.sha1(source.encode("utf-8")).hexdigest()[:16]
+
+def _remove_path(entry):
+    if entry.is_dir(follow_symlinks=False):
+        shutil.rmtree(entry.path, ignore_errors=True)
+    else:
+        os.remove(entry.path)
+
+def deleted_chunks(seg):
+    """Tombstoned rows of a manifest segment entry."""
+    return sum(end - start for start, end in seg.get("deleted", []))
+
+class SegmentedIndex:
+    """
+    A set of loaded, immutable (memory-mapped) segments that is searched as one index.
+    Every segment returns its own top-k; the results are merged by L2 distance
+    (all segments share the same embedding model, so the scores are comparable).
+    """
+    def __init__(self, segments, embeddings):
+        self.segments = segments  # [(name, MmapSegment)]
+        self.embeddings = embeddings
+
+    def __len__(self):
+        return sum(segment.live_count for _, segment in self.segments)
+
+    @property
+    def names(self):
+        return [name for name, _ in self.segments]
+
+    def memory_bytes(self):
+        """What searching this index keeps in memory: vectors / codes plus ANN indexes."""
+        return sum(segment.memory_bytes() + segment.ann_bytes for _, segment in self.segments)
+
+    def similarity_search_with_score_by_vector(self, embedding, k=4, **search_kwargs):
+        """`search_kwargs`: per-query nprobe (IVF) / ef_search (HNSW) for segments with an ANN index."""
+        results = []
+        for _, segment in self.segments:
+            results.extend(segment.similarity_search_with_score_by_vector(embedding, k=k, **search_kwargs))
+        results.sort(key=lambda pair: pair[1])
+        return results[:k]
+
+    def similarity_search_with_score(self, query, k=4, **search_kwargs):
+        return self.similarity_search_with_score_by_vector(self.embeddings.embed_query(query), k, **search_kwargs)
+
+    def similarity_search(self, query, k=4, **search_kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, **search_kwargs)]
+
+    def lexical_search_with_score(self, query, k=4):
+        """
+        BM25 keyword search: [(Document, score)], best first. IDF and average
+        chunk length are taken over all segments, so per-segment scores merge.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        indexes = [(segment, segment.lexical()) for _, segment in self.segments]
+        docs = sum(index.docs for _, index in indexes)
+        if not terms or not docs:
+            return []
+        idf = {}
+        for term in terms:
+            doc_freq = sum(index.doc_freq(term) for _, index in indexes)
+            if doc_freq:
+                idf[term] = bm25_idf(doc_freq, docs)
+        avg_length = max(sum(index.total_length for _, index in indexes) / docs, 1.0)
+
+        results = []
+        for segment, index in indexes:
+            for row, score in index.search(terms, idf, avg_length, k, segment.deleted):
+                results.append((segment.get_document(row), score))
+        results.sort(key=lambda pair: pair[1], reverse=True)
+        return results[:k]
+
+    def lexical_search(self, query, k=4):
+        return [doc for doc, _ in self.lexical_search_with_score(query, k)]
+
+class SegmentWriter:
+    """
+    Streams one ingest's chunks into NEW segment folders (hidden until commit()).
+    Existing segments are never touched, so the cost of an ingest depends on
+    the upload only, not on the corpus size.
+    A builder holds its metadata columns and BM25 postings in memory, so once it
+    has `max_chunks` chunks it is finished and the next add() starts a new
+    folder; commit() publishes all of them in one manifest update.
+    """
+    def __init__(self, store, max_chunks=SEGMENT_MAX_BUILD_CHUNKS):
+        self.store = store
+        self.max_chunks = max_chunks
+        self.builder = None
+        self.parts = []  # finished, unpublished (tmp_dir, chunks, dim)
+        self.published = []
+
+    def add(self, texts, vectors, metadatas):
+        """Returns True if this call finished a segment (its chunks can no longer change)."""
+        if self.builder is None:
+            self.builder = SegmentBuilder(self.store.new_tmp_dir())
+        self.builder.add(texts, vectors, metadatas)
+        if self.builder.count < self.max_chunks:
+            return False
+        self._finish_builder()
+        return True
+
+    def _finish_builder(self):
+        builder, self.builder = self.builder, None
+        try:
+            self.parts.append((builder.path, builder.finish(), builder.dim))
+        except BaseException:
+            shutil.rmtree(builder.path, ignore_errors=True)
+            raise
+
+    def commit(self, replaces=None):
+        """
+        Publishes the segment(s). Returns the name of the last one (None if
+        nothing was added); `published` lists them all.
+        Chunks of the `replaces` sources in older segments are tombstoned in the
+        same manifest update, so searches never see both versions (or neither).
+        """
+        if self.builder is not None:
+            self._finish_builder()
+        if not self.parts:
+            if replaces:
+                self.store.delete_documents(replaces)
+            return None
+        parts, self.parts = self.parts, []
+        self.published = self.store.publish_parts(parts, replaces)
+        return self.published[-1]
+
+    def abort(self):
+        if self.builder is not None:
+            self.builder.abort()
+            shutil.rmtree(self.builder.path, ignore_errors=True)
+            self.builder = None
+        for tmp_dir, _, _ in self.parts:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        self.parts = []
+
+class SegmentStore:
+    """
+    Append-only, segmented vector store on disk:
+
+        faiss_index/
+            manifest.json            <- {"next_segment", "dim", "segments": [{"name", "chunks", "format", "index", "deleted"}]}
+            VERSION                  <- changes on every publish / delete / compaction / clear
+            manifest.lock            <- held (fcntl) around every manifest update, see locked()
+            segments/seg-000001/     <- memory-mapped segment files (see src/mmap_segment.py)
+            segments/seg-000002/
+            ...
+
+    - Each ingest writes one new segment (see SegmentWriter); existing segments are never rewritten.
+    - The manifest is replaced atomically, so readers always see a complete set of segments.
+    - Deleting / replacing a document only tombstones its rows ("deleted" row ranges
+      in the manifest); compaction rewrites segments with many tombstones.
+    - Small segments are merged in the background (compact()), and big segments
+      get an IVF / HNSW index picked by size (build_indexes(), see src/ann.py).
+    - A legacy flat index (faiss_index/index.faiss + index.pkl) is migrated as segment 0,
+      and segments saved by FAISS.save_local() are converted to the mmap format.
+    """
+    def __init__(self, root, embeddings):
+        self.root = root
+        self.embeddings = embeddings
+        self.segments_dir = os.path.join(root, SEGMENTS_DIR)
+        self.manifest_path = os.path.join(root, MANIFEST_FILE)
+        self.version_path = os.path.join(root, VERSION_FILE)
+        self.lock_path = os.path.join(root, LOCK_FILE)
+        # Guards manifest read-modify-write cycles (publish / compaction / reset) in
+        # this process; locked() adds the lock file for the other workers
+        self.lock = threading.RLock()
+        self._lock_depth = 0
+        self._compacting = threading.Lock()
+
+    @contextmanager
+    def locked(self):
+        """
+        Exclusive access to the manifest across threads AND processes (uvicorn
+        workers share the store). Re-entrant; read the manifest after taking it.
+        """
+        with self.lock:
+            self._lock_depth += 1
+            try:
+                if self._lock_depth == 1:
+                    with file_lock(self.lock_path):
+                        yield
+                else:
+                    yield
+            finally:
+                self._lock_depth -= 1
+
+    # ---------- manifest ----------
+    def _empty_manifest(self):
+        return {"next_segment": 1, "dim": None, "segments": []}
+
+    def read_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            self._migrate_legacy()
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return self._empty_manifest()
+        if any(seg.get("format") != SEGMENT_FORMAT for seg in manifest["segments"]):
+            manifest = self._upgrade_segments()
+        return manifest
+
+    def _write_manifest(self, manifest):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def version(self):
+        """Current VERSION marker (None if the store was never written)."""
+        try:
+            with open(self.version_path, "r", encoding="utf-8") as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return None
+
+    def bump_version(self):
+        """Tells every process holding a loaded index (see IndexCache) to reload."""
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = self.version_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(f"{time.time_ns()}-{uuid.uuid4().hex[:8]}")
+        os.replace(tmp_path, self.version_path)
+
+    def _convert_faiss_folder(self, folder):
+        """FAISS.save_local() folder -> new mmap segment (tmp dir). Returns (path, chunks, dim)."""
+        db = FAISS.load_local(folder, self.embeddings, allow_dangerous_deserialization=True)
+        builder = SegmentBuilder(self.new_tmp_dir())
+        try:
+            total = db.index.ntotal
+            for start in range(0, total, SEARCH_BLOCK_ROWS):
+                end = min(start + SEARCH_BLOCK_ROWS, total)
+                docs = [db.docstore.search(db.index_to_docstore_id[i]) for i in range(start, end)]
+                builder.add([d.page_content for d in docs], db.index.reconstruct_n(start, end - start), [d.metadata for d in docs])
+            return builder.path, builder.finish(), db.index.d
+        except BaseException:
+            builder.abort()
+            shutil.rmtree(builder.path, ignore_errors=True)
+            raise
+
+    def _migrate_legacy(self):
+        """Old single-index layout -> segment 0."""
+        legacy_index = os.path.join(self.root, "index.faiss")
+        if not os.path.exists(legacy_index):
+            return
+        with self.locked():
+            if os.path.exists(self.manifest_path) or not os.path.exists(legacy_index):
+                return
+            logger.info("🔄 Migrating legacy FAISS index to segment seg-000000...")
+            tmp_dir, chunks, dim = self._convert_faiss_folder(self.root)
+            os.replace(tmp_dir, os.path.join(self.segments_dir, "seg-000000"))
+            manifest = self._empty_manifest()
+            manifest["dim"] = dim
+            manifest["segments"].append({"name": "seg-000000", "chunks": chunks, "format": SEGMENT_FORMAT})
+            self._write_manifest(manifest)
+            self.bump_version()
+            for file_name in ("index.faiss", "index.pkl"):
+                os.remove(os.path.join(self.root, file_name))
+
+    def _upgrade_segments(self):
+        """Converts segments written by FAISS.save_local() to the mmap format (in place)."""
+        with self.locked():
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            for seg in manifest["segments"]:
+                if seg.get("format") == SEGMENT_FORMAT:
+                    continue
+                logger.info(f"🔄 Converting segment {seg['name']} to the mmap format...")
+                folder = os.path.join(self.segments_dir, seg["name"])
+                tmp_dir, seg["chunks"], _ = self._convert_faiss_folder(folder)
+                shutil.rmtree(folder)
+                os.replace(tmp_dir, folder)
+                seg["format"] = SEGMENT_FORMAT
+            self._write_manifest(manifest)
+            self.bump_version()
+            return manifest
+
+    # ---------- writing ----------
+    def writer(self):
+        return SegmentWriter(self)
+
+    def new_tmp_dir(self):
+        """Hidden folder next to the live segments (so publishing is a rename)."""
+        os.makedirs(self.segments_dir, exist_ok=True)
+        return os.path.join(self.segments_dir, f"{TMP_PREFIX}{uuid.uuid4().hex}")
+
+    def publish(self, tmp_dir, chunks, dim, replaces=None):
+        """
+        Renames a finished segment folder into place and links it into the manifest.
+        Existing chunks of the `replaces` sources are tombstoned in the same update.
+        """
+        return self.publish_parts([(tmp_dir, chunks, dim)], replaces)[0]
+
+    def publish_parts(self, parts, replaces=None):
+        """publish() for several finished folders [(tmp_dir, chunks, dim)] in ONE manifest update. Returns their names."""
+        names = []
+        dim = parts[0][2]
+        try:
+            with self.locked():
+                manifest = self.read_manifest()
+                if manifest["dim"] not in (None, dim):
+                    # ✅ Safety catch for Dimension Mismatch (embedding model changed)
+                    logger.warning(f"⚠️ Segment dimension {dim} != index dimension {manifest['dim']} (Likely model change)")
+                    logger.warning("⚠️ Deleting old segments and starting fresh...")
+                    self._remove_segments([seg["name"] for seg in manifest["segments"]])
+                    manifest = {**self._empty_manifest(), "next_segment": manifest["next_segment"]}
+                if replaces:
+                    replaced = self._tombstone(manifest, replaces)
+                    if replaced:
+                        logger.info(f"♻️ Replacing {replaced} chunks of {len(replaces)} document(s)")
+
+                for tmp_dir, chunks, _ in parts:
+                    name = f"seg-{manifest['next_segment']:06d}"
+                    os.replace(tmp_dir, os.path.join(self.segments_dir, name))
+                    manifest["next_segment"] += 1
+                    manifest["segments"].append({"name": name, "chunks": chunks, "format": SEGMENT_FORMAT})
+                    names.append(name)
+                manifest["dim"] = dim
+                self._write_manifest(manifest)
+                self.bump_version()
+        finally:
+            for tmp_dir, _, _ in parts:
+                if os.path.exists(tmp_dir):
+                    shutil.rmtree(tmp_dir, ignore_errors=True)
+        logger.info(f"💾 Published segment {', '.join(names)} ({sum(chunks for _, chunks, _ in parts)} chunks)")
+        return names
+
+    def clear(self):
+        """
+        Deletes every segment (and the manifest). Returns False if the store was already empty.
+        Folders of ingests still being written are left alone: such an ingest
+        publishes into the empty store instead of failing half-way.
+        """
+        with self.locked():
+            existed = bool(self.read_manifest()["segments"])
+            if os.path.isdir(self.root):
+                for entry in os.scandir(self.root):
+                    if entry.path not in (self.segments_dir, self.lock_path):
+                        _remove_path(entry)
+            if os.path.isdir(self.segments_dir):
+                for entry in os.scandir(self.segments_dir):
+                    if not entry.name.startswith(TMP_PREFIX):
+                        _remove_path(entry)
+            self.bump_version()
+            return existed
+
+    # ---------- documents ----------
+    def _tombstone(self, manifest, sources):
+        """Marks every live chunk of `sources` deleted in `manifest` (in place). Returns the count."""
+        sources = set(sources)
+        total = 0
+        for seg in manifest["segments"]:
+            rows = source_rows(os.path.join(self.segments_dir, seg["name"]), sources)
+            if not len(rows):
+                continue
+            deleted = ranges_to_mask(seg.get("deleted"), seg["chunks"])
+            new = int((~deleted[rows]).sum())
+            if new:
+                deleted[rows] = True
+                seg["deleted"] = rows_to_ranges(np.flatnonzero(deleted))
+                total += new
+        return total
+
+    def delete_documents(self, sources):
+        """
+        Tombstones all chunks of `sources`: one manifest update, no segment is
+        rewritten. Returns the number of chunks deleted.
+        """
+        with self.locked():
+            manifest = self.read_manifest()
+            deleted = self._tombstone(manifest, sources)
+            if deleted:
+                self._write_manifest(manifest)
+                self.bump_version()
+        return deleted
+
+    def documents(self):
+        """[{"doc_id", "source", "chunks"}] of every document with live chunks."""
+        totals = {}
+        for seg in self.read_manifest()["segments"]:
+            try:
+                column = read_source_column(os.path.join(self.segments_dir, seg["name"]))
+            except FileNotFoundError:
+                continue  # compacted away meanwhile
+            if column is None:
+                continue
+            codes, dictionary = column
+            live = codes >= 0
+            if seg.get("deleted"):
+                live &= ~ranges_to_mask(seg["deleted"], len(codes))
+            counts = np.bincount(codes[live], minlength=len(dictionary))
+            for i in np.flatnonzero(counts):
+                totals[dictionary[i]] = totals.get(dictionary[i], 0) + int(counts[i])
+        return [{"doc_id": document_id(source), "source": source, "chunks": chunks}
+                for source, chunks in sorted(totals.items())]
+
+    def find_document(self, doc_id):
+        """Source of a document ID (None if no live chunk has it)."""
+        for seg in self.read_manifest()["segments"]:
+            path = os.path.join(self.segments_dir, seg["name"])
+            try:
+                column = read_source_column(path)
+            except FileNotFoundError:
+                continue
+            for source in (column[1] if column else []):
+                if document_id(source) != doc_id:
+                    continue
+                deleted = ranges_to_mask(seg.get("deleted"), seg["chunks"])
+                if not deleted[source_rows(path, {source})].all():
+                    return source
+        return None
+
+    def _remove_segments(self, names):
+        for name in names:
+            shutil.rmtree(os.path.join(self.segments_dir, name), ignore_errors=True)
+
+    # ---------- reading ----------
+    def _load_segment(self, name):
+        # Only maps the files: cheap, whatever the segment size
+        return MmapSegment(os.path.join(self.segments_dir, name))
+
+    def load(self, previous=None):
+        """
+        Loads all live segments as one SegmentedIndex (None if the store is empty).
+        Segments already loaded in `previous` are reused (segments are immutable),
+        so only new / compacted / re-indexed segments are opened again.
+        """
+        reuse = dict(previous.segments) if previous else {}
+        for _ in range(3):
+            manifest = self.read_manifest()
+            try:
+                segments = []
+                for seg in manifest["segments"]:
+                    segment = reuse.get(seg["name"])
+                    # Reload a segment whose ANN index was (re)built since
+                    if segment is None or segment.index_type != seg.get("index", "flat"):
+                        segment = self._load_segment(seg["name"])
+                    if segment.deleted_ranges != seg.get("deleted", []):
+                        segment.set_deleted(seg.get("deleted"))
+                    segments.append((seg["name"], segment))
+                break
+            except FileNotFoundError as e:
+                # A compaction removed a segment between reading the manifest and loading it
+                logger.warning(f"⚠️ Segment vanished while loading ({e}). Retrying...")
+        else:
+            return None
+        if not segments:
+            return None
+        return SegmentedIndex(segments, self.embeddings)
+
+    # ---------- compaction ----------
+    def compaction_candidates(self, small_chunks=None, min_segments=None, max_deleted=None):
+        """Small segments (once there are enough of them) + segments with many tombstones."""
+        small_chunks = SEGMENT_SMALL_CHUNKS if small_chunks is None else small_chunks
+        min_segments = SEGMENT_COMPACT_MIN_SEGMENTS if min_segments is None else min_segments
+        max_deleted = SEGMENT_MAX_DELETED_RATIO if max_deleted is None else max_deleted
+        segments = self.read_manifest()["segments"]
+        small = [seg["name"] for seg in segments if seg["chunks"] < small_chunks]
+        names = set(small) if len(small) >= min_segments else set()
+        names.update(seg["name"] for seg in segments
+                     if seg.get("deleted") and deleted_chunks(seg) >= seg["chunks"] * max_deleted)
+        return [seg["name"] for seg in segments if seg["name"] in names]
+
+    def compact(self, small_chunks=None, min_segments=None, max_deleted=None):
+        """
+        Merges all small segments into one and rewrites segments with many
+        tombstones without their deleted rows. The merged segment is built
+        without holding the lock; the manifest swap at the end is atomic, so
+        searches and ingests keep running meanwhile. Deletes that happen during
+        the build are carried over to the new segment.
+        Returns the new segment name (or None).
+        """
+        if not self._compacting.acquire(blocking=False):
+            return None
+        tmp_dir = None
+        try:
+            names = self.compaction_candidates(small_chunks, min_segments, max_deleted)
+            if not names:
+                return None
+            snapshot = {seg["name"]: seg.get("deleted", []) for seg in self.read_manifest()["segments"]}
+            logger.info(f"🧹 Compacting {len(names)} segments...")
+            # Streams the live rows of the old segments into one new segment, block by block
+            builder = SegmentBuilder(self.new_tmp_dir())
+            tmp_dir = builder.path
+            placed = {}  # old name -> (first new row, old live rows)
+            for name in names:
+                segment = self._load_segment(name)
+                segment.set_deleted(snapshot.get(name))
+                placed[name] = (builder.count, segment.live_rows())
+                for texts, vectors, metadatas in segment.iter_batches():
+                    builder.add(texts, vectors, metadatas)
+            chunks = builder.finish()
+
+            with self.locked():
+                manifest = self.read_manifest()
+                live = {seg["name"]: seg for seg in manifest["segments"]}
+                if not all(name in live for name in names):
+                    # The store was cleared / reset meanwhile
+                    return None
+                # Rows deleted since the snapshot -> rows of the new segment
+                carried = []
+                for name in names:
+                    if live[name].get("deleted", []) == snapshot.get(name, []):
+                        continue
+                    now = ranges_to_mask(live[name].get("deleted"), live[name]["chunks"])
+                    before = ranges_to_mask(snapshot.get(name), live[name]["chunks"])
+                    start, old_rows = placed[name]
+                    carried.append(start + np.searchsorted(old_rows, np.flatnonzero(now & ~before)))
+
+                new_name = None
+                if chunks:
+                    new_name = f"seg-{manifest['next_segment']:06d}"
+                    os.replace(tmp_dir, os.path.join(self.segments_dir, new_name))
+                    manifest["next_segment"] += 1
+                # The merged segment takes the place of the first one it replaces
+                kept = []
+                for seg in manifest["segments"]:
+                    if seg["name"] == names[0] and new_name:
+                        entry = {"name": new_name, "chunks": chunks, "format": SEGMENT_FORMAT}
+                        if carried:
+                            entry["deleted"] = rows_to_ranges(np.unique(np.concatenate(carried)))
+                        kept.append(entry)
+                    elif seg["name"] not in names:
+                        kept.append(seg)
+                manifest["segments"] = kept
+                self._write_manifest(manifest)
+                self.bump_version()
+                self._remove_segments(names)
+            if new_name:
+                logger.info(f"✅ Compacted {len(names)} segments into {new_name} ({chunks} chunks)")
+            else:
+                logger.info(f"✅ Removed {len(names)} fully deleted segments")
+            return new_name
+        except Exception as e:
+            logger.error(f"❌ Segment compaction failed: {e}")
+            return None
+        finally:
+            if tmp_dir and os.path.exists(tmp_dir):
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+            self._compacting.release()
+
+    # ---------- ANN indexes ----------
+    def index_candidates(self, index_type=None):
+        """Segments whose index type doesn't match what their size calls for: [(name, wanted type)]."""
+        candidates = []
+        for seg in self.read_manifest()["segments"]:
+            wanted = choose_index_type(seg["chunks"], index_type)
+            if seg.get("index", "flat") != wanted:
+                candidates.append((seg["name"], wanted))
+        return candidates
+
+    def build_indexes(self, index_type=None):
+        """
+        (Re)builds ANN indexes where needed, e.g. a flat segment that grew past
+        ANN_MIN_CHUNKS through compaction, or after VECTOR_INDEX_TYPE changed.
+        The index file is added next to the segment's vectors; the segment itself is unchanged.
+        """
+        built = []
+        for name, wanted in self.index_candidates(index_type):
+            path = os.path.join(self.segments_dir, name)
+            try:
+                if wanted == "flat":
+                    remove_ann(path)
+                else:
+                    segment = self._load_segment(name)
+                    logger.info(f"🏗️ Building {wanted} index for {name} ({len(segment)} chunks)...")
+                    write_ann(path, build_index(segment.float_vectors(), wanted), wanted)
+            except FileNotFoundError:
+                continue  # compacted away meanwhile
+            with self.locked():
+                manifest = self.read_manifest()
+                for seg in manifest["segments"]:
+                    if seg["name"] == name:
+                        seg["index"] = wanted
+                        self._write_manifest(manifest)
+                        self.bump_version()
+                        built.append(name)
+            logger.info(f"✅ {name} now uses a {wanted} index")
+        return built
+
+    def maintain(self):
+        """Background upkeep: merge small segments, then build the ANN indexes they need."""
+        self.compact()
+        with self._compacting:
+            try:
+                self.build_indexes()
+            except Exception as e:
+                logger.error(f"❌ ANN index build failed: {e}")
+
+    def compact_in_background(self):
+        """Starts maintain() on a daemon thread if there is something to merge or index."""
+        if not SEGMENT_COMPACTION_ENABLED or not (self.compaction_candidates() or self.index_candidates()):
+            return None
+        thread = threading.Thread(target=self.maintain, name="segment-maintenance", daemon=True)
+        thread.start()
+        return thread
+
+class IndexCache:
+    """
+    Keeps the loaded SegmentedIndex resident in the process.
+    The VERSION marker is checked at most every `check_interval` seconds; as long
+    as it is unchanged, get() returns the in-memory index without touching the disk.
+    On a change only the new segments are loaded (see SegmentStore.load()).
+    """
+    def __init__(self, store, check_interval=1.0):
+        self.store = store
+        self.check_interval = check_interval
+        self.index = None
+        self.version = None
+        self.loaded = False
+        self.checked_at = 0.0
+        self.loaded_at = None
+        self.last_load_ms = None
+        self.loads = 0
+        self.version_checks = 0
+        self.hits = 0
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            now = time.monotonic()
+            if self.loaded and now - self.checked_at < self.check_interval:
+                self.hits += 1
+                return self.index
+
+            self.checked_at = now
+            self.version_checks += 1
+            # Read the marker BEFORE loading: a publish during the load bumps it
+            # again, so the next check reloads instead of missing it.
+            version = self.store.version()
+            if self.loaded and version == self.version:
+                self.hits += 1
+                return self.index
+
+            started = time.perf_counter()
+            self.index = self.store.load(previous=self.index)
+            self.last_load_ms = round((time.perf_counter() - started) * 1000, 2)
+            self.version = version
+            self.loaded = True
+            self.loaded_at = time.time()
+            self.loads += 1
+            logger.info(f"📦 Vector DB loaded in {self.last_load_ms} ms (version {version})")
+            return self.index
+
+    def invalidate(self):
+        """Forces a VERSION check on the next get() (used after in-process writes)."""
+        with self._lock:
+            self.checked_at = 0.0
+
+    def evict(self):
+        """Drops the resident index (the next get() loads it again)."""
+        with self._lock:
+            self.index = None
+            self.version = None
+            self.loaded = False
+
+    def status(self):
+        with self._lock:
+            return {
+                "loaded": self.loaded,
+                "version": self.version,
+                "segments": self.index.names if self.index else [],
+                "chunks": len(self.index) if self.index else 0,
+                "loads": self.loads,
+                "last_load_ms": self.last_load_ms,
+                "loaded_at": self.loaded_at,
+                "version_checks": self.version_checks,
+                "cache_hits": self.hits,
+                "check_interval_seconds": self.check_interval,
+            }
@@ -0,0 +1,184 @@
+import os
+import io
+import hashlib
+import tempfile
+import zipfile
+from contextlib import contextmanager
+from src.config import SPILL_THRESHOLD_MB, SPILL_DIR, ZIP_MAX_MEMBERS, ZIP_MAX_UNCOMPRESSED_MB
+from src.logger import logger
+
+COPY_BLOCK_SIZE = 1024 * 1024
+
+class ArchiveLimitError(ValueError):
+    """Raised when an archive exceeds the configured member-count / size limits."""
+
+class IngestSource:
+    """
+    A file to ingest, WITHOUT assuming it lives on disk.
+    - `name`: display name / metadata source (its extension picks the loader)
+    - `path`: a real file on disk, OR
+    - `data`: the raw bytes in memory
+    Spilled temp files are deleted by close() (or when used as a context manager).
+    """
+    def __init__(self, name, path=None, data=None, temp_path=None):
+        self.name = name
+        self.path = path
+        self.data = data
+        self._temp_path = temp_path
+
+    @classmethod
+    def from_path(cls, path):
+        return cls(name=path, path=path)
+
+    @property
+    def ext(self):
+        return os.path.splitext(self.name)[1].lower()
+
+    @property
+    def size(self):
+        return len(self.data) if self.data is not None else os.path.getsize(self.path)
+
+    def open(self):
+        """Returns a fresh binary file object (pdfplumber, python-docx, pandas and PIL all accept one)."""
+        if self.data is not None:
+            return io.BytesIO(self.data)
+        return open(self.path, "rb")
+
+    def sha256(self):
+        digest = hashlib.sha256()
+        if self.data is not None:
+            digest.update(self.data)
+        else:
+            with open(self.path, "rb") as f:
+                for block in iter(lambda: f.read(COPY_BLOCK_SIZE), b""):
+                    digest.update(block)
+        return digest.hexdigest()
+
+    @contextmanager
+    def as_path(self):
+        """Yields a path on disk, writing in-memory data to a temp file only if really needed."""
+        if self.path is not None:
+            yield self.path
+            return
+        fd, temp_path = tempfile.mkstemp(suffix=self.ext, dir=SPILL_DIR)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(self.data)
+            yield temp_path
+        finally:
+            os.remove(temp_path)
+
+    def close(self):
+        self.data = None
+        if self._temp_path and os.path.exists(self._temp_path):
+            os.remove(self._temp_path)
+        self._temp_path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class SourceSpooler:
+    """
+    Incremental version of spool_stream(): feed it blocks with write(), get an
+    IngestSource from finish(). Small inputs stay in memory; once `spill_threshold`
+    bytes have arrived the rest goes to a temp file. More than `max_bytes` raises
+    ArchiveLimitError (the declared sizes in a ZIP header can lie, the byte count can't).
+    """
+    def __init__(self, name, max_bytes=None, spill_threshold=None):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.spill_threshold = SPILL_THRESHOLD_MB * 1024 * 1024 if spill_threshold is None else spill_threshold
+        self.total = 0
+        self._buffer = io.BytesIO()
+        self._spill_file = None
+        self._spill_path = None
+
+    def touches_disk(self, block_size):
+        """True if writing a block of this size would hit the disk (async callers offload those)."""
+        return self._spill_file is not None or self.total + block_size > self.spill_threshold
+
+    def write(self, block):
+        self.total += len(block)
+        if self.max_bytes is not None and self.total > self.max_bytes:
+            raise ArchiveLimitError(f"{self.name}: read more than the allowed {self.max_bytes} bytes")
+
+        if self._spill_file is None and self.total > self.spill_threshold:
+            # ⚠️ Too big for memory: move what we have so far to disk
+            fd, self._spill_path = tempfile.mkstemp(suffix=os.path.splitext(self.name)[1], dir=SPILL_DIR)
+            self._spill_file = os.fdopen(fd, "wb")
+            self._spill_file.write(self._buffer.getvalue())
+            self._buffer = None
+        if self._spill_file is not None:
+            self._spill_file.write(block)
+        else:
+            self._buffer.write(block)
+
+    def finish(self):
+        if self._spill_file is not None:
+            self._spill_file.close()
+            logger.info(f"💽 Spilled {self.name} ({self.total / (1024 * 1024):.1f} MB) to disk")
+            return IngestSource(self.name, path=self._spill_path, temp_path=self._spill_path)
+        return IngestSource(self.name, data=self._buffer.getvalue())
+
+    def abort(self):
+        self._buffer = None
+        if self._spill_file is not None:
+            self._spill_file.close()
+            os.remove(self._spill_path)
+            self._spill_file = None
+
+def spool_stream(stream, name, max_bytes=None, spill_threshold=None):
+    """Reads a binary stream into an IngestSource (see SourceSpooler)."""
+    spooler = SourceSpooler(name, max_bytes, spill_threshold)
+    try:
+        for block in iter(lambda: stream.read(COPY_BLOCK_SIZE), b""):
+            spooler.write(block)
+    except BaseException:
+        spooler.abort()
+        raise
+    return spooler.finish()
+
+def is_hidden_member(member_name):
+    parts = member_name.replace("\\", "/").split("/")
+    return any(part.startswith(".") or part == "__MACOSX" for part in parts if part)
+
+def check_zip_limits(zip_ref, archive_name, max_members=None, max_bytes=None):
+    """Rejects archives whose DECLARED member count / uncompressed size is over the limits."""
+    if max_members is None:
+        max_members = ZIP_MAX_MEMBERS
+    if max_bytes is None:
+        max_bytes = ZIP_MAX_UNCOMPRESSED_MB * 1024 * 1024
+
+    members = [info for info in zip_ref.infolist() if not info.is_dir()]
+    if len(members) > max_members:
+        raise ArchiveLimitError(f"{archive_name} has {len(members)} files (limit {max_members})")
+    declared = sum(info.file_size for info in members)
+    if declared > max_bytes:
+        raise ArchiveLimitError(f"{archive_name} expands to {declared} bytes (limit {max_bytes})")
+    return members
+
+def iter_zip_sources(stream, archive_name, max_members=None, max_bytes=None):
+    """
+    GENERATOR: yields one IngestSource per ZIP member, read straight from the
+    archive stream (no extractall, no scratch directory). The caller should
+    close each source once it's done with it.
+    """
+    if max_bytes is None:
+        max_bytes = ZIP_MAX_UNCOMPRESSED_MB * 1024 * 1024
+
+    with zipfile.ZipFile(stream, 'r') as zip_ref:
+        members = check_zip_limits(zip_ref, archive_name, max_members, max_bytes)
+        remaining = max_bytes
+
+        for info in members:
+            # Skip hidden files
+            if is_hidden_member(info.filename):
+                continue
+
+            with zip_ref.open(info) as member:
+                source = spool_stream(member, info.filename, max_bytes=remaining)
+            remaining -= source.size
+            yield source
@@ -0,0 +1,183 @@
+import time
+import threading
+from src.config import TABLE_MIN_RULING_LINES, TABLE_MIN_LINE_LENGTH
+from src.logger import logger
+
+# Tiered table detection for PDF pages (cheapest first):
+#   1. prefilter   - count ruling lines in the page's vector drawings (~0.5 ms/page)
+#   2. find_tables - PyMuPDF table finder, only on pages that passed tier 1 (~100+ ms/page)
+#   3. pdfplumber  - extract_tables() on the detected table boxes only, not the whole page
+TIERS = ["pages", "prefilter", "find_tables", "extracted"]
+
+# Small margin around PyMuPDF's table box so border lines fall inside the crop
+CROP_PADDING = 2
+
+def new_table_stats():
+    """Per-tier counters: how many pages reached / passed each tier, and the time spent in it."""
+    return {"pages": 0, "prefilter": 0, "find_tables": 0, "extracted": 0,
+            "prefilter_ms": 0.0, "find_tables_ms": 0.0, "extract_ms": 0.0}
+
+_stats = new_table_stats()
+_stats_lock = threading.Lock()
+
+def merge_table_stats(stats, into=None):
+    """Adds `stats` (e.g. returned by a PDF worker process) to the process-wide totals."""
+    target = _stats if into is None else into
+    with _stats_lock:
+        for key, value in stats.items():
+            target[key] = target.get(key, 0) + value
+
+def get_table_stats():
+    with _stats_lock:
+        return dict(_stats)
+
+def reset_table_stats():
+    with _stats_lock:
+        _stats.update(new_table_stats())
+
+def table_hit_rates(stats):
+    """Share of pages that passed each tier, e.g. {"prefilter": 0.12, "find_tables": 0.1, ...}."""
+    pages = stats.get("pages", 0)
+    return {tier: round(stats.get(tier, 0) / pages, 4) if pages else 0.0 for tier in TIERS[1:]}
+
+def format_table_to_markdown(table):
+    """Helper to convert a raw list of lists into a Markdown string."""
+    if not table:
+        return ""
+
+    table_text = ""
+    for row_idx, row in enumerate(table):
+        clean_row = [str(cell).strip().replace("\n", " ") if cell else "" for cell in row]
+
+        if row_idx == 0:
+            table_text += "| " + " | ".join(clean_row) + " |\n"
+            table_text += "|" + "|".join(["---" for _ in clean_row]) + "|\n"
+        else:
+            table_text += "| " + " | ".join(clean_row) + " |\n"
+
+    return table_text
+
+def extract_tables_as_text(page, tables=None):
+    """FALLBACK: PyMuPDF table extraction (reuses `tables` if find_tables already ran)."""
+    try:
+        if tables is None:
+            tables = page.find_tables()
+        if not tables:
+            return ""
+
+        table_text = "\n\n=== TABLES DETECTED (PyMuPDF) ===\n"
+        for i, table in enumerate(tables):
+            table_text += f"\n--- Table {i+1} ---\n"
+            table_data = table.extract()
+            for row in table_data:
+                clean_row = [str(cell) if cell is not None else "" for cell in row]
+                row_text = " | ".join(clean_row)
+                table_text += row_text + "\n"
+            table_text += "\n"
+        return table_text
+    except Exception as e:
+        logger.warning(f"⚠️ PyMuPDF table extraction failed: {e}")
+        return ""
+
+def has_ruling_lines(page, min_lines=None, min_length=None):
+    """
+    TIER 1: near-free prefilter.
+    Counts horizontal and vertical segments (lines, thin rectangles, rectangle
+    edges) in the page's vector drawings and stops as soon as both reach `min_lines`.
+    """
+    if min_lines is None:
+        min_lines = TABLE_MIN_RULING_LINES
+    if min_length is None:
+        min_length = TABLE_MIN_LINE_LENGTH
+    # get_cdrawings() skips building Python Point/Rect objects (~5x faster)
+    drawings = page.get_cdrawings() if hasattr(page, "get_cdrawings") else page.get_drawings()
+    horizontal = vertical = 0
+    for path in drawings:
+        for item in path["items"]:
+            if item[0] == "l":
+                (x0, y0), (x1, y1) = item[1], item[2]
+                width, height = abs(x1 - x0), abs(y1 - y0)
+                if height < 1 and width >= min_length:
+                    horizontal += 1
+                elif width < 1 and height >= min_length:
+                    vertical += 1
+            elif item[0] == "re":
+                rect = item[1]
+                width, height = abs(rect[2] - rect[0]), abs(rect[3] - rect[1])
+                if height < 3 and width >= min_length:
+                    horizontal += 1
+                elif width < 3 and height >= min_length:
+                    vertical += 1
+                elif width >= min_length and height >= min_length:
+                    # Bordered cell / box: two edges each way
+                    horizontal += 2
+                    vertical += 2
+            if horizontal >= min_lines and vertical >= min_lines:
+                return True
+    return False
+
+def to_plumber_bbox(bbox, plumber_page):
+    """PyMuPDF table box -> padded pdfplumber crop box (clamped to the page)."""
+    left, top, right, bottom = plumber_page.bbox
+    x0, y0, x1, y1 = bbox
+    return (
+        max(left, left + x0 - CROP_PADDING),
+        max(top, top + y0 - CROP_PADDING),
+        min(right, left + x1 + CROP_PADDING),
+        min(bottom, top + y1 + CROP_PADDING),
+    )
+
+def extract_page_tables(page, page_num, plumber_pdf, stats=None):
+    """
+    Runs the three detection tiers on one PDF page and returns the table text
+    (same format as before: a "=== TABLES DETECTED ===" block of Markdown tables).
+    `stats` (from new_table_stats()) is updated with per-tier counts and timings.
+    """
+    if stats is None:
+        stats = new_table_stats()
+    stats["pages"] += 1
+
+    # TIER 1: no ruling lines -> find_tables() would not find anything either
+    started = time.perf_counter()
+    try:
+        candidate = has_ruling_lines(page)
+    except Exception as e:
+        logger.warning(f"⚠️ Table prefilter failed on page {page_num+1}: {e}")
+        candidate = True
+    stats["prefilter_ms"] += (time.perf_counter() - started) * 1000
+    if not candidate:
+        return ""
+    stats["prefilter"] += 1
+
+    # TIER 2: PyMuPDF is C++ fast. We ask it: "Where are the tables?"
+    started = time.perf_counter()
+    possible_tables = page.find_tables()
+    stats["find_tables_ms"] += (time.perf_counter() - started) * 1000
+    if not possible_tables:
+        return ""
+    stats["find_tables"] += 1
+
+    # TIER 3: the slow but accurate tool, on the table boxes only
+    started = time.perf_counter()
+    table_text = ""
+    try:
+        if page_num < len(plumber_pdf.pages):
+            plumber_page = plumber_pdf.pages[page_num]
+            tables = []
+            for found in possible_tables:
+                tables.extend(plumber_page.crop(to_plumber_bbox(found.bbox, plumber_page)).extract_tables())
+
+            if tables:
+                table_text += "\n\n=== TABLES DETECTED ===\n"
+                for i, table in enumerate(tables):
+                    table_text += f"\n--- Table {i+1} ---\n"
+                    table_text += format_table_to_markdown(table)
+                    table_text += "\n"
+                stats["extracted"] += 1
+                logger.info(f"📊 Extracted {len(tables)} table(s) on Page {page_num+1}")
+    except Exception as e:
+        logger.warning(f"⚠️ pdfplumber failed on page {page_num}: {e}")
+        # Fallback to the PyMuPDF tables we already found
+        table_text = extract_tables_as_text(page, possible_tables)
+    stats["extract_ms"] += (time.perf_counter() - started) * 1000
+    return table_text
@@ -0,0 +1,81 @@
+import itertools
+import numpy as np
+import pandas as pd
+import openpyxl
+from langchain_core.documents import Document
+from src.config import TABLE_ROWS_PER_DOC
+from src.logger import logger
+
+def serialize_rows(df):
+    """
+    VECTORIZED row serializer: "Column: Value | Column: Value" for every row.
+    Loops over columns (a handful) instead of rows (millions); empty cells are skipped.
+    Returns a numpy object array with one line per row.
+    """
+    lines = np.full(len(df), "", dtype=object)
+    for col in df.columns:
+        values = df[col].to_numpy()
+        mask = pd.notna(values)
+        if not mask.any():
+            continue
+        # str() via map() runs in C, unlike a per-row f-string
+        cells = f"{col}: " + np.array(list(map(str, values[mask].tolist())), dtype=object)
+        current = lines[mask]
+        lines[mask] = np.where(current == "", cells, current + " | " + cells)
+    return lines
+
+def rows_to_document(df, source_name, row_start, extra_metadata=None):
+    """One row-group Document. row_start / row_end are 1-based data rows (header excluded)."""
+    lines = serialize_rows(df)
+    lines = lines[lines != ""]
+    if len(lines) == 0:
+        return None
+    metadata = {"source": source_name, "row_start": row_start, "row_end": row_start + len(df) - 1}
+    if extra_metadata:
+        metadata.update(extra_metadata)
+    return Document(page_content="\n".join(lines), metadata=metadata)
+
+def iter_csv(source, rows_per_doc=TABLE_ROWS_PER_DOC):
+    """Reads a CSV in chunks (never the whole file at once) and yields row-group Documents."""
+    logger.info("📊 Loading CSV file...")
+    row_start = 1
+    with source.open() as f:
+        for chunk in pd.read_csv(f, chunksize=rows_per_doc):
+            doc = rows_to_document(chunk, source.name, row_start)
+            if doc:
+                yield doc
+            row_start += len(chunk)
+
+def _header_names(header):
+    return [str(name) if name is not None else f"Column {i+1}" for i, name in enumerate(header)]
+
+def iter_xlsx(source, rows_per_doc=TABLE_ROWS_PER_DOC):
+    """
+    Streams every sheet of an XLSX with openpyxl's read-only mode (rows are
+    parsed lazily from the XML, the workbook is never fully loaded).
+    """
+    logger.info("📊 Loading Excel workbook...")
+    with source.open() as f:
+        workbook = openpyxl.load_workbook(f, read_only=True, data_only=True)
+        try:
+            for sheet in workbook.worksheets:
+                rows = sheet.iter_rows(values_only=True)
+                header = next(rows, None)
+                if header is None:
+                    continue
+                columns = _header_names(header)
+
+                row_start = 1
+                while True:
+                    batch = list(itertools.islice(rows, rows_per_doc))
+                    if not batch:
+                        break
+                    # Pad/trim ragged rows to the header width
+                    batch = [tuple(row[:len(columns)]) + (None,) * (len(columns) - len(row)) for row in batch]
+                    df = pd.DataFrame(batch, columns=columns)
+                    doc = rows_to_document(df, source.name, row_start, {"sheet": sheet.title})
+                    if doc:
+                        yield doc
+                    row_start += len(batch)
+        finally:
+            workbook.close()
@@ -117,108 +117,229 @@
 # -------------------------------------------------------------------
 # this version remembers multiple documents with source links
 
-import os
-# ✅ ADDED: Import torch and shutil (needed for GPU check & cleanup)
-import torch
-import shutil
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from src.logger import logger
+from src.config import EMBED_MICRO_BATCH_CHUNKS, EMBEDDING_CACHE_ENABLED, DEFAULT_COLLECTION, INFERENCE_SOCKET
+from src.models import models, LazyEmbeddings, EMBEDDING_MODEL_NAME
+from src.batching import get_batch_stats, diff_batch_stats, batch_rates
+from src.embed_pool import embedding_session
+from src.jobs import NullProgress, JobCancelled
+from src.segment_store import deleted_chunks
+from src.collection_manager import CollectionManager
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# ✅ UPDATED: BGE-Small (Fast + Good Quality)
-MODEL_NAME = "BAAI/bge-small-en-v1.5"
+MODEL_NAME = EMBEDDING_MODEL_NAME
 DB_PATH = "faiss_index"
 
-# ✅ ADDED: Auto-Detect GPU
-# If you have an NVIDIA card, it will switch to 'cuda' automatically.
-device = "cuda" if torch.cuda.is_available() else "cpu"
-logger.info(f"🚀 Embedding Device: {device.upper()}")
-
-# Initialize Embeddings
-try:
-    embeddings = HuggingFaceEmbeddings(
-        model_name=MODEL_NAME,
-        model_kwargs={'device': device}, 
-        # ✅ UPDATED: Increased batch size for BGE-Small (faster)
-        encode_kwargs={'normalize_embeddings': True, 'batch_size': 32}
+# ✅ Embeddings load on the first embed call (or in the start-up warm-up), not at import:
+# torch / sentence-transformers are only imported once they are actually needed.
+# See src/models.py for the device detection, batch size and embedding cache.
+embeddings = LazyEmbeddings(models, "embeddings")
+
+# ✅ Named collections, each an append-only segmented store with its own resident
+# index (reloaded only when its VERSION marker changes) and dedup signatures.
+# Indexes load lazily and the least recently used ones are unloaded over the memory budget.
+collection_manager = CollectionManager(embeddings, DB_PATH)
+
+def get_vector_db(collection=DEFAULT_COLLECTION):
+    """Returns the collection's resident index of all segments (None if it is empty)."""
+    try:
+        return collection_manager.get_index(collection)
+    except Exception as e:
+        logger.error(f"❌ Error loading Vector DB '{collection}': {e}")
+        return None
+
+def get_vector_db_status(collection=DEFAULT_COLLECTION):
+    """Cache state for /db/status: load time, loads vs. cache hits, version, memory budget (None: no such collection)."""
+    target = collection_manager.get(collection, create=False)
+    if target is None:
+        return None
+    segments = target.store.read_manifest()["segments"]
+    return {"collection": collection, **target.index_cache.status(), "disk_version": target.store.version(),
+            "deleted_chunks": sum(deleted_chunks(seg) for seg in segments),
+            "memory": collection_manager.status()}
+
+def maintain_vector_db():
+    """Merges small segments and builds missing ANN indexes (every collection) on background threads."""
+    return [collection_manager.get(name).store.compact_in_background() for name in collection_manager.names()]
+
+def clear_vector_db(collection=DEFAULT_COLLECTION):
+    """Deletes a whole collection (waits for in-flight segment publishes). Returns False if it was empty."""
+    existed = collection_manager.drop(collection)
+    logger.info(f"🗑️ Vector DB '{collection}' cleared")
+    return existed
+
+def list_collections():
+    return collection_manager.status()
+
+def list_documents(collection=DEFAULT_COLLECTION):
+    """Documents in the collection: [{"doc_id", "source", "chunks"}]."""
+    target = collection_manager.get(collection, create=False)
+    return target.store.documents() if target else []
+
+def find_document(doc_id, collection=DEFAULT_COLLECTION):
+    target = collection_manager.get(collection, create=False)
+    return target.store.find_document(doc_id) if target else None
+
+def delete_document(source, collection=DEFAULT_COLLECTION):
+    """
+    Removes one document without a rebuild: its chunks are tombstoned (hidden
+    from searches right away) and reclaimed by the next compaction.
+    Returns the number of chunks deleted.
+    """
+    target = collection_manager.get(collection, create=False)
+    if target is None:
+        return 0
+    deleted = target.store.delete_documents([source])
+    target.index_cache.invalidate()
+    if target.dedup_index is not None:
+        target.dedup_index.forget([source])
+    if deleted:
+        logger.info(f"🗑️ Deleted {deleted} chunks of {source} from '{collection}'")
+        target.store.compact_in_background()
+    return deleted
+
+def get_text_splitter():
+    return RecursiveCharacterTextSplitter(
+        chunk_size=1000,
+        chunk_overlap=200
     )
-except Exception as e:
-    logger.error(f"❌ Failed to initialize local embeddings: {e}")
-    raise
-
-def get_vector_db():
-    if os.path.exists(DB_PATH):
-        # Load locally
-        try:
-            return FAISS.load_local(
-                DB_PATH, 
-                embeddings, 
-                allow_dangerous_deserialization=True
-            )
-        except Exception:
-            return None
-    return None
-
-def add_to_vector_db(docs):
+
+def iter_chunk_batches(docs, batch_size=EMBED_MICRO_BATCH_CHUNKS, progress=None):
+    """Splits a (lazy) stream of page Documents into lists of at most `batch_size` chunks."""
+    progress = progress or NullProgress()
+    text_splitter = get_text_splitter()
+    batch = []
+    for doc in docs:
+        with progress.timed("split"):
+            batch.extend(text_splitter.split_documents([doc]))
+        while len(batch) >= batch_size:
+            yield batch[:batch_size]
+            batch = batch[batch_size:]
+    if batch:
+        yield batch
+
+def add_documents_stream(docs, batch_size=EMBED_MICRO_BATCH_CHUNKS, progress=None, replace=False, replaces=(),
+                         collection=DEFAULT_COLLECTION):
     """
-    Adds documents to the Vector DB (Appends if exists, Creates if new).
+    STREAMING INGEST: pages are split, embedded and added to the index one
+    micro-batch at a time, so memory stays flat no matter how big the upload is.
+    `docs` can be any iterable (e.g. the iter_file() generator).
+    `progress` (an IngestJob) receives stage timings and may cancel the ingest;
+    a cancelled ingest never saves, so the DB on disk is left untouched.
+    The new chunks become new segments (one per SEGMENT_MAX_BUILD_CHUNKS): the existing index is never loaded or rewritten.
+    Near-duplicate chunks (of indexed ones or of each other) are dropped before embedding.
+    With `replace`, each source in `docs` replaces the chunks stored for it earlier;
+    `replaces` lists further sources to delete. The old chunks are tombstoned in
+    the same manifest update that publishes the new segment.
+    Everything goes into the named `collection` (created on first ingest).
     """
+    progress = progress or NullProgress()
+    target = collection_manager.get(collection)
+    store, index_cache = target.store, target.index_cache
+    writer = store.writer()
+    dedup = target.dedup_index.session(replace=replace, replaces=replaces) if target.dedup_index is not None else None
+    replaced = set(replaces)
+    total_chunks = 0
+    batch_stats = get_batch_stats()
+
     try:
-        if not docs:
-            logger.warning("⚠️ No documents to add!")
-            return 0 
+        # 1. Split Text (lazily, one micro-batch at a time)
+        # (past EMBED_POOL_MIN_CHUNKS, the embedding pool takes over: see src/embed_pool.py)
+        with embedding_session() as pool_session:
+            for batch in iter_chunk_batches(docs, batch_size, progress):
+                if replace:
+                    replaced.update(chunk.metadata.get("source") for chunk in batch)
+                # 1b. Skip near-duplicates
+                if dedup is not None:
+                    with progress.timed("dedup"):
+                        batch = dedup.filter(batch)
+                    if not batch:
+                        continue
+                texts = [chunk.page_content for chunk in batch]
+                metadatas = [chunk.metadata for chunk in batch]
+
+                # 2. Embed this micro-batch only
+                with progress.timed("embed"):
+                    vectors = embeddings.embed_documents(texts)
+
+                # 3. Add to the new segment (in memory)
+                with progress.timed("index"):
+                    finished = writer.add(texts, vectors, metadatas)
+                if finished and dedup is not None:
+                    # The kept chunks are on disk now: later copies can't be merged into them
+                    dedup.seal()
+
+                total_chunks += len(batch)
+                progress.add_chunks(len(batch))
+                logger.info(f"✂️ Embedded {total_chunks} chunks so far...")
+
+        # Encoded tokens / s and how much of each model batch was padding
+        rates = batch_rates(diff_batch_stats(get_batch_stats(), batch_stats))
+        if rates["batches"]:
+            if pool_session["pooled"]:
+                rates["pooled_chunks"] = pool_session["pooled"]
+            progress.report("embedding", rates)
+            logger.info(f"⚡ Embedded {rates['tokens']} tokens at {rates['tokens_per_s']} tokens/s in {rates['batches']} batches, "
+                        f"padding {rates['padding_waste_pct']}% (fixed batches: {rates['fixed_batch_padding_waste_pct']}%)")
 
-        # 1. Split Text
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200
-        )
-        split_docs = text_splitter.split_documents(docs)
-        logger.info(f"✂️ Split into {len(split_docs)} chunks.")
+        if dedup is not None:
+            report = dedup.stats()
+            progress.report("dedup", report)
+            if report["dropped"]:
+                logger.info(f"♻️ Near-duplicates: dropped {report['dropped']} of {report['chunks']} chunks "
+                            f"({report['merged']} merged), index {report['shrink_pct']}% smaller")
 
-        if not split_docs:
+        if not total_chunks:
+            # Every chunk of the new version was a duplicate: only the old one goes
+            if replaced:
+                progress.check_cancelled()
+            if replaced and store.delete_documents(replaced):
+                index_cache.invalidate()
+                if dedup is not None:
+                    dedup.commit()
             return 0
 
-        # 2. Check if DB exists to decide: Create New vs. Append
-        if os.path.exists(DB_PATH):
-            logger.info("🔄 Found existing DB. Loading and appending...")
-            
-            try:
-                # Load existing
-                db = FAISS.load_local(
-                    DB_PATH, 
-                    embeddings, 
-                    allow_dangerous_deserialization=True
-                )
-                
-                # Add new chunks
-                db.add_documents(split_docs)
-                logger.info("✅ Appended new documents.")
-            
-            except Exception as e:
-                # ✅ ADDED: Safety catch for Dimension Mismatch
-                logger.warning(f"⚠️ Error loading DB (Likely model change): {e}")
-                logger.warning("⚠️ Deleting old DB and creating a fresh one...")
-                if os.path.exists(DB_PATH):
-                    shutil.rmtree(DB_PATH)
-                db = FAISS.from_documents(split_docs, embeddings)
-            
-        else:
-            logger.info("🆕 No DB found. Creating a new one...")
-            
-            # Create fresh
-            db = FAISS.from_documents(split_docs, embeddings)
+        # 4. Publish the segment
+        progress.check_cancelled()
+        with progress.timed("save"):
+            writer.commit(replaces=replaced)
+        index_cache.invalidate()
+        if dedup is not None:
+            dedup.commit()
+            # The dedup tables count towards the collection memory budget
+            collection_manager.touch(collection)
+        logger.info(f"💾 Database saved to {target.path} ({total_chunks} new chunks in {', '.join(writer.published)})")
+        # With the sidecar the cache lives in the inference server (see its "status" op)
+        if EMBEDDING_CACHE_ENABLED and not INFERENCE_SOCKET:
+            logger.info(f"🧠 Embedding cache: {embeddings.hits} hits / {embeddings.misses} encoded since start-up")
+    except BaseException:
+        writer.abort()
+        raise
 
-        # 3. Save the updated DB
-        db.save_local(DB_PATH)
-        logger.info(f"💾 Database saved to {DB_PATH}")
-        
-        return len(split_docs)
+    # 5. Merge small segments without blocking this ingest
+    store.compact_in_background()
+    return total_chunks
+
+def add_to_vector_db(docs, collection=DEFAULT_COLLECTION):
+    """
+    Adds documents to the Vector DB (Appends if exists, Creates if new).
+    `docs` may be a list or a lazy iterator of page Documents.
+    """
+    try:
+        if isinstance(docs, list) and not docs:
+            logger.warning("⚠️ No documents to add!")
+            return 0 
+
+        chunk_count = add_documents_stream(docs, collection=collection)
+        if not chunk_count:
+            logger.warning("⚠️ No documents to add!")
+        return chunk_count
 
+    except JobCancelled:
+        raise
     except Exception as e:
         logger.error(f"❌ Error adding to Vector DB: {e}")
         return 0
@@ -0,0 +1,67 @@
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+
+# Allow importing from src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.ann import build_index, write_ann
+from src.mmap_segment import MmapSegment
+from test_ann import clustered_vectors, make_store
+
+# (index type, per-query settings to sweep)
+SWEEPS = [
+    ("ivf_flat", [{"nprobe": n} for n in (1, 4, 16, 64)]),
+    ("ivf_pq", [{"nprobe": n} for n in (4, 16, 64)]),
+    ("hnsw", [{"ef_search": n} for n in (16, 64, 256)]),
+]
+
+def timed_search(segment, queries, k, **search_kwargs):
+    results, started = [], time.perf_counter()
+    for query in queries:
+        results.append([row for row, _ in segment.search(query, k, **search_kwargs)])
+    return results, (time.perf_counter() - started) / len(queries) * 1000
+
+def run_benchmark(rows=100_000, dim=384, queries=200, k=12, out="bench_ann.json"):
+    """Recall@k and latency of each ANN index type against exact flat search."""
+    print(f"🏗️ {rows} x {dim} clustered vectors, {queries} queries, k={k}")
+    vectors = clustered_vectors(rows, dim, clusters=max(20, rows // 2000))
+    query_vectors = vectors[np.random.default_rng(1).choice(rows, queries, replace=False)] + 0.05
+    store = make_store(vectors)
+    path = os.path.join(store.segments_dir, "seg-000001")
+
+    exact, flat_ms = timed_search(MmapSegment(path), query_vectors, k)
+    report = {"rows": rows, "dim": dim, "queries": queries, "k": k,
+              "results": [{"index": "flat", "params": {}, "recall": 1.0, "ms_per_query": round(flat_ms, 3)}]}
+    print(f"{'index':10s} {'params':18s} {'recall@k':>9s} {'ms/query':>9s} {'build s':>8s}")
+    print(f"{'flat':10s} {'':18s} {1.0:9.3f} {flat_ms:9.3f}")
+
+    for index_type, settings in SWEEPS:
+        started = time.perf_counter()
+        segment = MmapSegment(path)
+        write_ann(path, build_index(segment.vectors, index_type), index_type)
+        build_seconds = time.perf_counter() - started
+        segment = MmapSegment(path)
+        for params in settings:
+            found, ms = timed_search(segment, query_vectors, k, **params)
+            recall = np.mean([len(set(f) & set(e)) / k for f, e in zip(found, exact)])
+            label = ", ".join(f"{key}={value}" for key, value in params.items())
+            print(f"{index_type:10s} {label:18s} {recall:9.3f} {ms:9.3f} {build_seconds:8.1f}")
+            report["results"].append({"index": index_type, "params": params, "recall": round(float(recall), 4),
+                                      "ms_per_query": round(ms, 3), "build_seconds": round(build_seconds, 2)})
+
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Report written to {out}")
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ANN recall vs latency against the flat baseline")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--out", default="bench_ann.json")
+    args = parser.parse_args()
+    run_benchmark(args.rows, args.dim, args.queries, out=args.out)
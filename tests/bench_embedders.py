@@ -0,0 +1,81 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+# Allow importing from src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.models import EMBEDDING_MODEL_NAME, load_torch_embeddings
+from src.onnx_embedder import OnnxEmbeddings, export_onnx, model_dir, compare, within_tolerance, META_FILE, INT8_FILE
+from src.vector_store import get_text_splitter
+from tests.corpus import generate_corpus
+from tests.bench_ingest import extract
+
+def corpus_chunks(scale=1, seed=42):
+    """Chunk texts of the synthetic ingest corpus, split like /ingest/ does."""
+    corpus_dir = tempfile.mkdtemp(prefix="bench_corpus_")
+    try:
+        splitter = get_text_splitter()
+        texts = []
+        for paths in generate_corpus(corpus_dir, scale=scale, seed=seed).values():
+            for path in paths:
+                texts.extend(d.page_content for d in splitter.split_documents(extract(path)))
+        return texts
+    finally:
+        shutil.rmtree(corpus_dir, ignore_errors=True)
+
+def throughput(embedder, texts, batch_size):
+    embedder.embed_documents(texts[:batch_size])  # warm-up (first-call allocations)
+    started = time.perf_counter()
+    vectors = []
+    for i in range(0, len(texts), batch_size):
+        vectors.extend(embedder.embed_documents(texts[i:i + batch_size]))
+    return vectors, len(texts) / (time.perf_counter() - started)
+
+def run_benchmark(model=EMBEDDING_MODEL_NAME, scale=1, threads=0, batch_size=32, limit=None, out="bench_embedders.json"):
+    """Chunks/s of the torch embedder vs. ONNX Runtime (fp32 / int8) on the ingest corpus, plus their drift."""
+    texts = corpus_chunks(scale)
+    if limit and len(texts) > limit:
+        texts = texts[::len(texts) // limit][:limit]  # evenly spread sample: keeps the mix of chunk lengths
+    print(f"🏗️ {len(texts)} corpus chunks, model {model}, batch {batch_size}")
+    path = model_dir(model)
+    if not os.path.exists(os.path.join(path, META_FILE)) or not os.path.exists(os.path.join(path, INT8_FILE)):
+        export_onnx(model, path, quantize=True)
+
+    reference, torch_rate = throughput(load_torch_embeddings(model), texts, batch_size)
+    report = {"model": model, "chunks": len(texts), "batch_size": batch_size, "threads": threads,
+              "results": [{"backend": "torch", "chunks_per_s": round(torch_rate, 1), "speedup": 1.0}]}
+    print(f"{'backend':10s} {'chunks/s':>9s} {'speedup':>8s} {'max |diff|':>11s} {'min cos':>8s}")
+    print(f"{'torch':10s} {torch_rate:9.1f} {1.0:8.2f}")
+
+    failed = False
+    for quantized in (False, True):
+        name = "onnx-int8" if quantized else "onnx-fp32"
+        vectors, rate = throughput(OnnxEmbeddings(path, quantized=quantized, threads=threads), texts, batch_size)
+        drift = compare(reference, vectors)
+        ok = within_tolerance(drift, quantized)
+        failed = failed or not ok
+        print(f"{name:10s} {rate:9.1f} {rate / torch_rate:8.2f} {drift['max_abs_diff']:11.2e} "
+              f"{drift['min_cosine']:8.5f} {'' if ok else '❌ out of tolerance'}")
+        report["results"].append({"backend": name, "chunks_per_s": round(rate, 1),
+                                  "speedup": round(rate / torch_rate, 2), **drift, "within_tolerance": ok})
+
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Report written to {out}")
+    return report, failed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Embedding throughput: torch vs. ONNX Runtime fp32 / int8")
+    parser.add_argument("--model", default=EMBEDDING_MODEL_NAME, help="hub name or local SentenceTransformer folder")
+    parser.add_argument("--scale", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=0, help="onnxruntime intra-op threads (0 = default)")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--limit", type=int, default=None, help="embed at most this many chunks")
+    parser.add_argument("--out", default="bench_embedders.json")
+    args = parser.parse_args()
+    _, failed = run_benchmark(args.model, args.scale, args.threads, args.batch_size, args.limit, args.out)
+    sys.exit(1 if failed else 0)
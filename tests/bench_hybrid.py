@@ -0,0 +1,113 @@
+import os
+import re
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import statistics
+
+# Allow importing from src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.models import EMBEDDING_MODEL_NAME, load_torch_embeddings
+from src.segment_store import SegmentStore
+from src.lexical import reciprocal_rank_fusion
+from src.config import LEXICAL_K
+from bench_embedders import corpus_chunks
+
+PART_NUMBER = re.compile(r"\b[A-Z]{2}-\d{4}\b")
+
+def build_queries(texts, count, seed=42):
+    """
+    Two query sets with known answers:
+    - identifier: "Which item is part XK-2041?"  -> every chunk containing that part number
+    - wording:    8 consecutive words of a chunk -> that chunk
+    """
+    rng = random.Random(seed)
+    by_part = {}
+    for i, text in enumerate(texts):
+        for part in set(PART_NUMBER.findall(text)):
+            by_part.setdefault(part, set()).add(i)
+    parts = sorted(by_part)
+    identifier = [(f"Which item is part {p}?", by_part[p]) for p in rng.sample(parts, min(count, len(parts)))]
+
+    wording = []
+    flat = [" ".join(text.split()) for text in texts]  # phrases may span line breaks
+    for i in rng.sample(range(len(texts)), min(count, len(texts))):
+        words = flat[i].split()
+        start = rng.randint(0, max(len(words) - 8, 0))
+        phrase = " ".join(words[start:start + 8])
+        wording.append((phrase, {j for j, text in enumerate(flat) if phrase in text}))
+    return {"identifier": identifier, "wording": wording}
+
+def evaluate(search, queries, rows, ks):
+    """Mean recall@k (share of the relevant chunks in the top k) and per-query latency."""
+    recalls = {k: [] for k in ks}
+    latencies = []
+    for query, relevant in queries:
+        started = time.perf_counter()
+        found = [rows[doc.page_content] for doc in search(query, max(ks))]
+        latencies.append((time.perf_counter() - started) * 1000)
+        for k in ks:
+            recalls[k].append(len(relevant & set(found[:k])) / len(relevant))
+    latencies.sort()
+    result = {f"recall@{k}": round(statistics.mean(recalls[k]), 3) for k in ks}
+    result["p50_ms"] = round(statistics.median(latencies), 2)
+    result["p95_ms"] = round(latencies[int(len(latencies) * 0.95) - 1], 2)
+    return result
+
+def run_benchmark(model=EMBEDDING_MODEL_NAME, limit=None, queries=100, out="bench_hybrid.json"):
+    """Recall@k and latency of dense-only vs. hybrid (dense + BM25, RRF) retrieval on the ingest corpus."""
+    texts = list(dict.fromkeys(corpus_chunks()))  # unique texts: each one is a known row
+    if limit and len(texts) > limit:
+        texts = texts[::len(texts) // limit][:limit]
+    rows = {text: i for i, text in enumerate(texts)}
+    query_sets = build_queries(texts, queries)
+    print(f"🏗️ {len(texts)} chunks, model {model}, "
+          + ", ".join(f"{len(q)} {name} queries" for name, q in query_sets.items()))
+
+    embeddings = load_torch_embeddings(model)
+    root = tempfile.mkdtemp(prefix="bench_hybrid_")
+    try:
+        store = SegmentStore(root, embeddings)
+        writer = store.writer()
+        started = time.perf_counter()
+        writer.add(texts, embeddings.embed_documents(texts), [{"source": f"chunk-{i}"} for i in range(len(texts))])
+        writer.commit()
+        print(f"⏱️ Indexed in {time.perf_counter() - started:.1f}s")
+        index = store.load()
+        index.lexical_search("warm up", k=1)
+
+        def dense(query, k):
+            return index.similarity_search(query, k=k)
+
+        def hybrid(query, k):
+            # What get_relevant_docs does before re-ranking
+            return reciprocal_rank_fusion([index.similarity_search(query, k=k), index.lexical_search(query, k=LEXICAL_K)])[:k]
+
+        report = {"model": model, "chunks": len(texts), "lexical_k": LEXICAL_K, "results": []}
+        print(f"{'queries':11s} {'retriever':8s} {'R@5':>6s} {'R@12':>6s} {'R@24':>6s} {'p50 ms':>8s} {'p95 ms':>8s}")
+        for name, query_set in query_sets.items():
+            for retriever, search in (("dense", dense), ("hybrid", hybrid)):
+                result = evaluate(search, query_set, rows, (5, 12, 24))
+                print(f"{name:11s} {retriever:8s} {result['recall@5']:6.3f} {result['recall@12']:6.3f} "
+                      f"{result['recall@24']:6.3f} {result['p50_ms']:8.2f} {result['p95_ms']:8.2f}")
+                report["results"].append({"queries": name, "retriever": retriever, **result})
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Report written to {out}")
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dense-only vs. hybrid (BM25 + RRF) retrieval: recall@k and latency")
+    parser.add_argument("--model", default=EMBEDDING_MODEL_NAME, help="hub name or local SentenceTransformer folder")
+    parser.add_argument("--limit", type=int, default=None, help="index at most this many chunks")
+    parser.add_argument("--queries", type=int, default=100, help="queries per query set")
+    parser.add_argument("--out", default="bench_hybrid.json")
+    args = parser.parse_args()
+    run_benchmark(args.model, args.limit, args.queries, args.out)
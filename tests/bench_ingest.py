@@ -0,0 +1,178 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import subprocess
+import tempfile
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# Allow importing from src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from langchain_community.vectorstores import FAISS
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from src import config
+from src.ingest import iter_file
+from src.sources import iter_zip_sources
+from src.tables import get_table_stats, reset_table_stats, table_hit_rates
+from src.batching import get_batch_stats, reset_batch_stats, batch_rates
+from src.logger import logger
+from tests.corpus import generate_corpus
+
+STAGES = ["extract", "split", "embed", "index", "save"]
+
+class RandomEmbeddings(Embeddings):
+    """--skip-embed: same shape as bge-small (384-d, normalized), no model needed."""
+    def __init__(self, dim=384, seed=0):
+        self.dim = dim
+        self.rng = np.random.default_rng(seed)
+
+    def embed_documents(self, texts):
+        vectors = self.rng.standard_normal((len(texts), self.dim)).astype(np.float32)
+        return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).tolist()
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return "unknown"
+
+def extract(path):
+    """Pages of one corpus file (ZIPs are expanded member by member, like /ingest/)."""
+    if path.endswith(".zip"):
+        docs = []
+        with open(path, "rb") as f:
+            for member in iter_zip_sources(f, os.path.basename(path)):
+                with member:
+                    docs.extend(iter_file(member))
+        return docs
+    return list(iter_file(path))
+
+def bench_kind(paths, splitter, embedder, batch_size):
+    timings = dict.fromkeys(STAGES, 0.0)
+    pages = chunks = 0
+    size = sum(os.path.getsize(p) for p in paths)
+
+    reset_table_stats()
+    reset_batch_stats()
+    for path in paths:
+        started = time.perf_counter()
+        docs = extract(path)
+        timings["extract"] += time.perf_counter() - started
+        pages += len(docs)
+
+        started = time.perf_counter()
+        split_docs = splitter.split_documents(docs)
+        timings["split"] += time.perf_counter() - started
+        chunks += len(split_docs)
+        if not split_docs:
+            continue
+
+        texts = [d.page_content for d in split_docs]
+        started = time.perf_counter()
+        vectors = []
+        for i in range(0, len(texts), batch_size):
+            vectors.extend(embedder.embed_documents(texts[i:i + batch_size]))
+        timings["embed"] += time.perf_counter() - started
+
+        started = time.perf_counter()
+        db = FAISS.from_embeddings(list(zip(texts, vectors)), embedder, metadatas=[d.metadata for d in split_docs])
+        timings["index"] += time.perf_counter() - started
+
+        out_dir = tempfile.mkdtemp(prefix="bench_index_")
+        try:
+            started = time.perf_counter()
+            db.save_local(out_dir)
+            timings["save"] += time.perf_counter() - started
+        finally:
+            shutil.rmtree(out_dir, ignore_errors=True)
+
+    total = sum(timings.values())
+    tables = get_table_stats()
+    return {
+        "files": len(paths),
+        "bytes": size,
+        "pages": pages,
+        "chunks": chunks,
+        "seconds": {k: round(v, 4) for k, v in timings.items()},
+        "total_seconds": round(total, 4),
+        "pages_per_second": round(pages / timings["extract"], 2) if timings["extract"] else None,
+        "chunks_per_second": round(chunks / total, 2) if total else None,
+        "tables": {**tables, "hit_rates": table_hit_rates(tables)},
+        # tokens/s and padding waste of the model batches (empty with --skip-embed)
+        "batching": batch_rates(get_batch_stats()),
+    }
+
+def compare(report, baseline_path):
+    """Prints per-stage deltas against an earlier report (e.g. from the previous commit)."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\n📈 Compared with {baseline.get('commit')} ({baseline_path}):")
+    for kind, result in report["results"].items():
+        old = baseline.get("results", {}).get(kind)
+        if not old:
+            continue
+        for stage in STAGES + ["total"]:
+            new_s = result["total_seconds"] if stage == "total" else result["seconds"][stage]
+            old_s = old["total_seconds"] if stage == "total" else old["seconds"].get(stage, 0.0)
+            if old_s > 0.001:
+                delta = (new_s - old_s) / old_s * 100
+                flag = "🔴" if delta > 10 else ("🟢" if delta < -10 else "⚪")
+                print(f"  {flag} {kind:12s} {stage:8s} {old_s:8.3f}s -> {new_s:8.3f}s ({delta:+.1f}%)")
+
+def run_benchmark(scale=1, seed=42, out="bench_ingest.json", skip_embed=False, baseline=None, corpus_dir=None):
+    corpus_dir = corpus_dir or tempfile.mkdtemp(prefix="bench_corpus_")
+    corpus = generate_corpus(corpus_dir, scale=scale, seed=seed)
+
+    if skip_embed:
+        embedder = RandomEmbeddings()
+        splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+    else:
+        from src.vector_store import embeddings, get_text_splitter
+        embedder = embeddings
+        splitter = get_text_splitter()
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "corpus": {"seed": seed, "scale": scale},
+        "embedder": "random" if skip_embed else "model",
+        "config": {k: getattr(config, k) for k in dir(config) if k.isupper()},
+        "results": {},
+    }
+
+    for kind, paths in corpus.items():
+        logger.info(f"⏱️ Benchmarking {kind} ({len(paths)} file(s))...")
+        report["results"][kind] = bench_kind(paths, splitter, embedder, config.EMBED_MICRO_BATCH_CHUNKS)
+
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n{'kind':12s} {'pages':>6s} {'chunks':>7s} " + " ".join(f"{s:>8s}" for s in STAGES) + f" {'total':>8s}")
+    for kind, result in report["results"].items():
+        print(f"{kind:12s} {result['pages']:6d} {result['chunks']:7d} "
+              + " ".join(f"{result['seconds'][s]:8.3f}" for s in STAGES) + f" {result['total_seconds']:8.3f}")
+    print(f"\n💾 Report written to {out}")
+
+    if baseline:
+        compare(report, baseline)
+    shutil.rmtree(corpus_dir, ignore_errors=True)
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingestion benchmark on a synthetic corpus")
+    parser.add_argument("--scale", type=int, default=1, help="multiplies pages / rows per file")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default="bench_ingest.json", help="JSON report path")
+    parser.add_argument("--compare", help="earlier JSON report to diff against")
+    parser.add_argument("--skip-embed", action="store_true", help="random vectors instead of the embedding model")
+    args = parser.parse_args()
+    run_benchmark(args.scale, args.seed, args.out, args.skip_embed, args.compare)
@@ -0,0 +1,61 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import numpy as np
+
+# Allow importing from src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.mmap_segment import SegmentBuilder, MmapSegment
+from test_ann import clustered_vectors
+
+def build_segment(root, vectors, storage, keep_float16):
+    path = os.path.join(root, f"{storage}-{keep_float16}")
+    builder = SegmentBuilder(path, storage=storage, keep_float16=keep_float16)
+    for start in range(0, len(vectors), 10000):
+        block = vectors[start:start + 10000]
+        builder.add([f"chunk {start + i}" for i in range(len(block))], block, [{} for _ in block])
+    builder.finish()
+    return MmapSegment(path)
+
+def run_benchmark(rows=100_000, dim=384, queries=200, k=12, out="bench_quantization.json"):
+    """Memory vs recall@k of SQ8 / PQ storage, with and without float16 re-scoring."""
+    root = tempfile.mkdtemp(prefix="bench_quant_")
+    vectors = clustered_vectors(rows, dim, clusters=max(20, rows // 2000))
+    query_vectors = vectors[np.random.default_rng(1).choice(rows, queries, replace=False)] + 0.05
+    report = {"rows": rows, "dim": dim, "queries": queries, "k": k, "results": []}
+
+    try:
+        exact_segment = build_segment(root, vectors, "float32", False)
+        exact = [{row for row, _ in exact_segment.search(q, k)} for q in query_vectors]
+        print(f"{'storage':8s} {'rescore':>8s} {'MB':>8s} {'x smaller':>10s} {'recall@k':>9s} {'ms/query':>9s}")
+        for storage, keep_float16 in [("float32", False), ("sq8", True), ("sq8", False), ("pq", True), ("pq", False)]:
+            segment = exact_segment if storage == "float32" else build_segment(root, vectors, storage, keep_float16)
+            started = time.perf_counter()
+            found = [{row for row, _ in segment.search(q, k)} for q in query_vectors]
+            ms = (time.perf_counter() - started) / queries * 1000
+            recall = float(np.mean([len(f & e) / k for f, e in zip(found, exact)]))
+            memory_mb = segment.memory_bytes() / 1024 / 1024
+            ratio = exact_segment.memory_bytes() / segment.memory_bytes()
+            print(f"{storage:8s} {str(keep_float16):>8s} {memory_mb:8.1f} {ratio:10.1f} {recall:9.3f} {ms:9.3f}")
+            report["results"].append({"storage": storage, "rescore_float16": keep_float16, "memory_mb": round(memory_mb, 2),
+                                      "compression": round(ratio, 1), "recall": round(recall, 4), "ms_per_query": round(ms, 3)})
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Report written to {out}")
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compressed vector storage: memory vs recall")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--out", default="bench_quantization.json")
+    args = parser.parse_args()
+    run_benchmark(args.rows, args.dim, args.queries, out=args.out)
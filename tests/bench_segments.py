@@ -0,0 +1,85 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+import numpy as np
+from langchain_community.vectorstores import FAISS
+
+# Allow importing from src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.segment_store import SegmentStore
+from bench_ingest import RandomEmbeddings
+
+def random_batch(rng, count, dim=384, prefix="chunk"):
+    vectors = rng.standard_normal((count, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    texts = [f"{prefix} {i} " + "x" * 800 for i in range(count)]
+    return texts, vectors.tolist(), [{"source": "bench.pdf", "page": i} for i in range(count)]
+
+def run_benchmark(corpus_chunks=200_000, new_chunks=30):
+    """
+    Cost of appending ~10 pages (30 chunks) to a big corpus (rewrite vs new segment),
+    and of opening the corpus (FAISS pickle vs memory-mapped segments).
+    """
+    rng = np.random.default_rng(0)
+    embeddings = RandomEmbeddings()
+    root = tempfile.mkdtemp(prefix="bench_segments_")
+    flat_dir, store_dir = os.path.join(root, "flat"), os.path.join(root, "segmented")
+
+    try:
+        print(f"🏗️ Building a {corpus_chunks}-chunk corpus...")
+        texts, vectors, metadatas = random_batch(rng, corpus_chunks)
+        FAISS.from_embeddings(list(zip(texts, vectors)), embeddings, metadatas=metadatas).save_local(flat_dir)
+        shutil.copytree(flat_dir, store_dir)
+        store = SegmentStore(store_dir, embeddings)
+        store.read_manifest()  # converts the flat index to mmap segment 0
+        del texts, vectors, metadatas
+
+        texts, vectors, metadatas = random_batch(rng, new_chunks, prefix="new")
+
+        # OLD: load everything -> add -> save everything
+        start = time.perf_counter()
+        db = FAISS.load_local(flat_dir, embeddings, allow_dangerous_deserialization=True)
+        db.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas)
+        db.save_local(flat_dir)
+        rewrite_time = time.perf_counter() - start
+
+        # NEW: one small segment
+        start = time.perf_counter()
+        writer = store.writer()
+        writer.add(texts, vectors, metadatas)
+        writer.commit()
+        segment_time = time.perf_counter() - start
+
+        # Baseline: indexing the new chunks into an empty DB
+        start = time.perf_counter()
+        empty = SegmentStore(os.path.join(root, "empty"), embeddings)
+        writer = empty.writer()
+        writer.add(texts, vectors, metadatas)
+        writer.commit()
+        empty_time = time.perf_counter() - start
+
+        # Opening the whole corpus: unpickle everything vs. map the files
+        start = time.perf_counter()
+        FAISS.load_local(flat_dir, embeddings, allow_dangerous_deserialization=True)
+        pickle_open_time = time.perf_counter() - start
+        start = time.perf_counter()
+        index = store.load()
+        mmap_open_time = time.perf_counter() - start
+        start = time.perf_counter()
+        index.similarity_search_with_score_by_vector(vectors[0], k=12)
+        search_time = time.perf_counter() - start
+
+        print(f"🐢 Load + add + save:   {rewrite_time * 1000:8.1f} ms")
+        print(f"🚀 New segment:         {segment_time * 1000:8.1f} ms")
+        print(f"📄 Same chunks, new DB: {empty_time * 1000:8.1f} ms")
+        print(f"⚡ Speedup: {rewrite_time / segment_time:.0f}x")
+        print(f"📂 Open (FAISS pickle): {pickle_open_time * 1000:8.1f} ms")
+        print(f"📂 Open (mmap):         {mmap_open_time * 1000:8.1f} ms")
+        print(f"🔍 First search (mmap): {search_time * 1000:8.1f} ms")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
@@ -0,0 +1,130 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import subprocess
+import threading
+import statistics
+
+# Allow importing from src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.models import EMBEDDING_MODEL_NAME, CROSS_ENCODER_MODEL_NAME
+from src.inference_server import InferenceClient, InferenceError, SidecarEmbeddings, SidecarCrossEncoder
+from bench_embedders import corpus_chunks
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+def rss_mb(pid="self"):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return round(int(line.split()[1]) / 1024, 1)
+    return 0.0
+
+def chat_load(embeddings, cross_encoder, requests, concurrency, texts, k=12, seed=7):
+    """`requests` chat retrievals (embed the query, score k passages) from `concurrency` threads."""
+    rng = random.Random(seed)
+    work = [(rng.choice(texts)[:200], rng.sample(texts, k)) for _ in range(requests)]
+    latencies = []
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                if not work:
+                    return
+                query, passages = work.pop()
+            started = time.perf_counter()
+            embeddings.embed_query(query)
+            cross_encoder.rank(query, passages)
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests_per_s": round(requests / elapsed, 2),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 1),
+    }
+
+def start_sidecar(socket_path, model, cross_encoder, max_wait_ms):
+    env = {**os.environ, "EMBEDDING_MODEL": model, "CROSS_ENCODER_MODEL": cross_encoder,
+           "INFERENCE_MAX_WAIT_MS": str(max_wait_ms), "EMBEDDING_CACHE_ENABLED": "false"}
+    process = subprocess.Popen([sys.executable, "-m", "src.inference_server", socket_path], cwd=ROOT, env=env)
+    client = InferenceClient(socket_path, timeout=600)
+    for _ in range(1200):
+        try:
+            client.status()
+            return process, client
+        except InferenceError:
+            if process.poll() is not None:
+                raise RuntimeError("inference server exited")
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("inference server did not start")
+
+def run_benchmark(model=EMBEDDING_MODEL_NAME, cross_encoder=CROSS_ENCODER_MODEL_NAME, requests=64, concurrency=8,
+                  max_wait_ms=5, out="bench_sidecar.json"):
+    """Chat retrieval throughput: models in the API process vs. the shared inference server."""
+    texts = corpus_chunks()
+    print(f"🏗️ {requests} chat requests from {concurrency} threads, {len(texts)} corpus chunks to draw from")
+    report = {"model": model, "cross_encoder": cross_encoder, "requests": requests, "concurrency": concurrency,
+              "max_wait_ms": max_wait_ms, "results": []}
+
+    # 1. Sidecar first, while this process hasn't loaded any model: a thin client's RSS
+    socket_path = os.path.join(tempfile.mkdtemp(), "inference.sock")
+    process, client = start_sidecar(socket_path, model, cross_encoder, max_wait_ms)
+    try:
+        embeddings, reranker = SidecarEmbeddings(client), SidecarCrossEncoder(client)
+        chat_load(embeddings, reranker, concurrency, concurrency, texts, seed=1)  # warm-up
+        sidecar = chat_load(embeddings, reranker, requests, concurrency, texts)
+        batches = client.status()["batches"]
+        sidecar.update({"mode": "sidecar", "client_rss_mb": rss_mb(), "server_rss_mb": rss_mb(process.pid),
+                        "mean_embed_batch": batches["embed_query"]["mean_batch"],
+                        "mean_rerank_batch": batches["rerank"]["mean_batch"]})
+    finally:
+        process.terminate()
+        process.wait()
+
+    # 2. Same load with the models in this process (what every API worker did before)
+    from src.models import load_torch_embeddings
+    from sentence_transformers import CrossEncoder
+    embeddings, reranker = load_torch_embeddings(model), CrossEncoder(cross_encoder)
+    chat_load(embeddings, reranker, concurrency, concurrency, texts, seed=1)
+    local = chat_load(embeddings, reranker, requests, concurrency, texts)
+    local.update({"mode": "in-process", "client_rss_mb": rss_mb()})
+
+    print(f"{'mode':11s} {'req/s':>7s} {'p50 ms':>8s} {'p95 ms':>8s} {'API RSS MB':>11s}")
+    for result in (local, sidecar):
+        print(f"{result['mode']:11s} {result['requests_per_s']:7.2f} {result['p50_ms']:8.1f} {result['p95_ms']:8.1f} "
+              f"{result['client_rss_mb']:11.1f}")
+    print(f"Sidecar: server RSS {sidecar['server_rss_mb']} MB, mean batch {sidecar['mean_embed_batch']} queries / "
+          f"{sidecar['mean_rerank_batch']} pairs")
+    report["results"] = [local, sidecar]
+    report["speedup"] = round(sidecar["requests_per_s"] / local["requests_per_s"], 2)
+
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Report written to {out}")
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chat retrieval throughput: in-process models vs. inference sidecar")
+    parser.add_argument("--model", default=EMBEDDING_MODEL_NAME, help="embedding model (hub name or local folder)")
+    parser.add_argument("--cross-encoder", default=CROSS_ENCODER_MODEL_NAME, help="Cross-Encoder (hub name or local folder)")
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--max-wait-ms", type=float, default=5)
+    parser.add_argument("--out", default="bench_sidecar.json")
+    args = parser.parse_args()
+    run_benchmark(args.model, args.cross_encoder, args.requests, args.concurrency, args.max_wait_ms, args.out)
@@ -0,0 +1,71 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Modules that must never be imported just by importing the app (they belong to lazily loaded models)
+HEAVY_MODULES = ["torch", "sentence_transformers", "transformers", "langchain_huggingface", "langchain_groq"]
+
+PROBE = (
+    "import sys, time, json; started = time.perf_counter(); import {module}; "
+    "print(json.dumps({{'seconds': time.perf_counter() - started, "
+    "'heavy': [m for m in {heavy!r} if m in sys.modules]}}))"
+)
+
+def import_profile(module="app"):
+    """Imports the module in a fresh interpreter: wall time, heavy modules pulled in, slowest imports."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+                            cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+
+    # -X importtime lines: "import time: self [us] | cumulative | imported package"
+    top_level = []
+    for line in result.stderr.splitlines():
+        parts = line.split("|")
+        if not line.startswith("import time:") or len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2].rstrip()
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:  # direct imports of the probed module
+            top_level.append((name.strip(), int(parts[1]) / 1e6))
+    report["slowest"] = sorted(top_level, key=lambda item: item[1], reverse=True)[:10]
+    return report
+
+def run_benchmark(module="app", runs=3, max_seconds=None, out="bench_startup.json"):
+    """Cold import time of the app (best of N fresh processes) and the modules that dominate it."""
+    reports = [import_profile(module) for _ in range(runs)]
+    best = min(reports, key=lambda r: r["seconds"])
+    timings = ", ".join(f"{r['seconds']:.2f}s" for r in reports)
+    print(f"⏱️ import {module}: best {best['seconds']:.2f}s over {runs} runs ({timings})")
+    for name, seconds in best["slowest"]:
+        print(f"   {seconds:7.3f}s  {name}")
+    report = {"module": module, "runs": [round(r["seconds"], 3) for r in reports],
+              "best_seconds": round(best["seconds"], 3), "heavy_modules": best["heavy"],
+              "slowest": [{"module": n, "seconds": round(s, 3)} for n, s in best["slowest"]]}
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"💾 Report written to {out}")
+
+    failed = False
+    if best["heavy"]:
+        print(f"❌ Model libraries imported at start-up: {', '.join(best['heavy'])}")
+        failed = True
+    if max_seconds is not None and best["seconds"] > max_seconds:
+        print(f"❌ Start-up import took {best['seconds']:.2f}s (budget {max_seconds}s)")
+        failed = True
+    return report, failed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cold import time of the API (models must load lazily)")
+    parser.add_argument("--module", default="app")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--max-seconds", type=float, default=None, help="fail if the best import is slower")
+    parser.add_argument("--out", default="bench_startup.json")
+    args = parser.parse_args()
+    _, failed = run_benchmark(args.module, args.runs, args.max_seconds, args.out)
+    sys.exit(1 if failed else 0)
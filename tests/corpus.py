@@ -0,0 +1,138 @@
+import os
+import sys
+import json
+import random
+import zipfile
+import docx
+from fpdf import FPDF
+from PIL import Image, ImageDraw
+
+# Allow importing from src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.logger import logger
+
+# Fixed vocabulary + seeded RNG -> the same corpus on every machine / commit
+VOCABULARY = (
+    "system pressure valve sensor module warranty clause contract payment invoice "
+    "temperature voltage firmware update install manual safety warning replace filter "
+    "customer service report quarterly revenue margin forecast region supplier order "
+    "shipment delivery schedule inspection maintenance battery charger display panel"
+).split()
+
+def sentence(rng, words=12):
+    text = " ".join(rng.choice(VOCABULARY) for _ in range(words))
+    return text.capitalize() + "."
+
+def part_number(rng):
+    return f"{rng.choice('ABCDXYZ')}{rng.choice('JKLMN')}-{rng.randint(1000, 9999)}"
+
+def create_normal_pdf(filename):
+    """Creates a standard PDF with selectable text."""
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Arial", size=12)
+    pdf.cell(200, 10, txt="This is a normal selectable text PDF.", ln=1, align="C")
+    pdf.output(filename)
+    logger.info(f"📄 Created Normal PDF: {filename}")
+
+def create_scanned_pdf(filename, lines=("This is a SCANNED image inside a PDF.",), pages=1):
+    """Creates a PDF that CONTAINS an image of text (simulating a scan)."""
+    pdf = FPDF()
+    img_path = filename + ".png"
+    try:
+        for _ in range(pages):
+            # 1. Create an Image with text
+            img = Image.new('RGB', (500, 40 + 20 * len(lines)), color='white')
+            d = ImageDraw.Draw(img)
+            for i, line in enumerate(lines):
+                d.text((10, 20 + 20 * i), line, fill='black')
+            img.save(img_path)
+
+            # 2. Insert the image as the only content of the page
+            pdf.add_page()
+            pdf.image(img_path, x=10, y=10, w=180)
+        pdf.output(filename)
+    finally:
+        # Cleanup temp image
+        if os.path.exists(img_path):
+            os.remove(img_path)
+    logger.info(f"📷 Created Scanned PDF: {filename}")
+
+def create_text_pdf(filename, pages, rng, table_every=0):
+    """Multi-page text PDF. With table_every=N every N-th page also gets a ruled table."""
+    pdf = FPDF()
+    pdf.set_font("Arial", size=11)
+    for page in range(pages):
+        pdf.add_page()
+        pdf.cell(0, 8, txt=f"Section {page+1}: reference {part_number(rng)}", ln=1)
+        for _ in range(22):
+            pdf.cell(0, 6, txt=sentence(rng), ln=1)
+        if table_every and page % table_every == 0:
+            # Ruled table so the table gatekeeper fires
+            for row in range(6):
+                for _ in range(4):
+                    cell = "Part" if row == 0 else part_number(rng)
+                    pdf.cell(45, 7, txt=cell, border=1)
+                pdf.ln()
+    pdf.output(filename)
+
+def create_docx(filename, paragraphs, rng):
+    document = docx.Document()
+    document.add_heading("Service Manual", level=1)
+    for _ in range(paragraphs):
+        document.add_paragraph(" ".join(sentence(rng) for _ in range(4)))
+    document.save(filename)
+
+def create_csv(filename, rows, rng):
+    with open(filename, "w", encoding="utf-8") as f:
+        f.write("part,description,qty,price\n")
+        for _ in range(rows):
+            f.write(f"{part_number(rng)},{sentence(rng, 5)[:-1]},{rng.randint(1, 500)},{rng.randint(100, 99999) / 100}\n")
+
+def create_zip(filename, members):
+    with zipfile.ZipFile(filename, "w", zipfile.ZIP_DEFLATED) as archive:
+        for member in members:
+            archive.write(member, arcname=os.path.join("bundle", os.path.basename(member)))
+
+def generate_corpus(out_dir, scale=1, seed=42):
+    """
+    Generates a reproducible ingest corpus and returns {kind: [paths]}.
+    `scale` multiplies page / row counts (scale=1 runs in well under a minute).
+    """
+    rng = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    corpus = {"text_pdf": [], "table_pdf": [], "scanned_pdf": [], "docx": [], "csv": [], "zip": []}
+
+    for i in range(2):
+        path = os.path.join(out_dir, f"text_{i}.pdf")
+        create_text_pdf(path, pages=20 * scale, rng=rng)
+        corpus["text_pdf"].append(path)
+
+        path = os.path.join(out_dir, f"tables_{i}.pdf")
+        create_text_pdf(path, pages=10 * scale, rng=rng, table_every=1)
+        corpus["table_pdf"].append(path)
+
+        path = os.path.join(out_dir, f"docx_{i}.docx")
+        create_docx(path, paragraphs=100 * scale, rng=rng)
+        corpus["docx"].append(path)
+
+        path = os.path.join(out_dir, f"parts_{i}.csv")
+        create_csv(path, rows=5000 * scale, rng=rng)
+        corpus["csv"].append(path)
+
+    path = os.path.join(out_dir, "scanned_0.pdf")
+    create_scanned_pdf(path, lines=[sentence(rng, 8) for _ in range(8)], pages=3 * scale)
+    corpus["scanned_pdf"].append(path)
+
+    path = os.path.join(out_dir, "bundle_0.zip")
+    create_zip(path, corpus["text_pdf"][:1] + corpus["docx"][:1] + corpus["csv"][:1])
+    corpus["zip"].append(path)
+
+    with open(os.path.join(out_dir, "manifest.json"), "w") as f:
+        json.dump({"seed": seed, "scale": scale, "files": corpus}, f, indent=2)
+    logger.info(f"🧪 Generated corpus in {out_dir}: {sum(len(v) for v in corpus.values())} files")
+    return corpus
+
+if __name__ == "__main__":
+    target = sys.argv[1] if len(sys.argv) > 1 else "bench_corpus"
+    generate_corpus(target, scale=int(sys.argv[2]) if len(sys.argv) > 2 else 1)
@@ -0,0 +1,72 @@
+import os
+import sys
+import tempfile
+import numpy as np
+
+# Allow importing from src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.ann import choose_index_type
+from src.segment_store import SegmentStore, IndexCache
+from src.config import ANN_MIN_CHUNKS, ANN_IVF_PQ_MIN_CHUNKS
+
+def clustered_vectors(rows, dim=32, clusters=20, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)) * 4
+    return (centers[rng.integers(0, clusters, rows)] + rng.standard_normal((rows, dim))).astype(np.float32)
+
+def make_store(vectors):
+    store = SegmentStore(tempfile.mkdtemp(), embeddings=None)
+    writer = store.writer()
+    writer.add([f"chunk {i}" for i in range(len(vectors))], vectors, [{"page": i} for i in range(len(vectors))])
+    writer.commit()
+    return store
+
+def recall(store, queries, k=12, **search_kwargs):
+    cache = IndexCache(store, check_interval=0)
+    exact = make_store.exact
+    hits = 0
+    for query, expected in zip(queries, exact):
+        found = cache.get().similarity_search_with_score_by_vector(query, k=k, **search_kwargs)
+        hits += len({doc.metadata["page"] for doc, _ in found} & set(expected))
+    return hits / (k * len(queries))
+
+def test_auto_selection_by_chunk_count():
+    assert choose_index_type(ANN_MIN_CHUNKS - 1, "auto") == "flat"
+    assert choose_index_type(ANN_MIN_CHUNKS, "auto") == "ivf_flat"
+    assert choose_index_type(ANN_IVF_PQ_MIN_CHUNKS, "auto") == "ivf_pq"
+    assert choose_index_type(10, "hnsw") == "hnsw"
+    # Explicit trained types need enough vectors to train on
+    assert choose_index_type(255, "ivf_pq") == "flat"
+    assert choose_index_type(256, "ivf_pq") == "ivf_pq"
+    assert choose_index_type(10, "ivf_flat") == "flat"
+
+def test_explicit_type_keeps_tiny_segments_flat():
+    store = make_store(clustered_vectors(100))
+    assert store.build_indexes("ivf_pq") == []
+    assert store.read_manifest()["segments"][0].get("index", "flat") == "flat"
+
+def test_flat_segment_migrates_to_each_index_type():
+    vectors = clustered_vectors(4000)
+    queries = vectors[:20] + 0.1
+    store = make_store(vectors)
+    make_store.exact = [[row for row, _ in store.load().segments[0][1].search(q, 12)] for q in queries]
+
+    for index_type, min_recall in [("ivf_flat", 0.95), ("hnsw", 0.95), ("ivf_pq", 0.8)]:
+        assert store.build_indexes(index_type) == ["seg-000001"]
+        assert store.read_manifest()["segments"][0]["index"] == index_type
+        assert store.load().segments[0][1].index_type == index_type
+        assert recall(store, queries, nprobe=64, ef_search=128) >= min_recall, index_type
+
+    # Per-query effort: a single IVF list finds fewer true neighbours than many
+    store.build_indexes("ivf_flat")
+    assert recall(store, queries, nprobe=1) < recall(store, queries, nprobe=64)
+
+    # ...and back to exact search
+    store.build_indexes("flat")
+    assert recall(store, queries) == 1.0
+
+if __name__ == "__main__":
+    test_auto_selection_by_chunk_count()
+    test_explicit_type_keeps_tiny_segments_flat()
+    test_flat_segment_migrates_to_each_index_type()
+    print("✅ ANN index tests passed!")
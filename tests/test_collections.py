@@ -0,0 +1,107 @@
+import os
+import sys
+import tempfile
+
+# Allow importing from src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from langchain_core.documents import Document
+from src.collection_manager import CollectionManager, InvalidCollectionName
+from src.dedup import DedupIndex
+from tests.test_segment_store import EMBEDDINGS, ingest
+
+def make_manager(budget_mb=1):
+    root = tempfile.mkdtemp()
+    return CollectionManager(EMBEDDINGS, os.path.join(root, "faiss_index"),
+                             root=os.path.join(root, "collections"), budget_mb=budget_mb, check_interval=0)
+
+def test_collections_are_isolated():
+    manager = make_manager()
+    ingest(manager.get("team-a").store, ["alpha report"], "a.pdf")
+    ingest(manager.get("team-b").store, ["beta report"], "b.pdf")
+    ingest(manager.get().store, ["shared report"], "s.pdf")
+
+    assert manager.names() == ["default", "team-a", "team-b"]
+    assert [d.page_content for d in manager.get_index("team-a").similarity_search("report", k=5)] == ["alpha report"]
+    assert [d.page_content for d in manager.get_index("default").similarity_search("report", k=5)] == ["shared report"]
+    assert manager.get_index("unknown") is None
+    assert manager.get("unknown", create=False) is None
+
+    assert manager.drop("team-a") is True
+    assert manager.names() == ["default", "team-b"]
+    assert manager.get_index("team-a") is None
+
+def test_drop_during_ingest():
+    manager = make_manager()
+    ingest(manager.get("team-a").store, ["old report"], "old.pdf")
+    writer = manager.get("team-a").store.writer()
+    writer.add(["new report"], EMBEDDINGS.embed_documents(["new report"]), [{"source": "new.pdf"}])
+
+    assert manager.drop("team-a") is True
+    assert manager.get_index("team-a") is None
+    # The ingest that was running still publishes, into the emptied collection
+    writer.commit()
+    assert [d.page_content for d in manager.get_index("team-a").similarity_search("report", k=5)] == ["new report"]
+
+def test_invalid_names_rejected():
+    manager = make_manager()
+    for name in ["../etc", "a/b", "", ".hidden", "x" * 65]:
+        try:
+            manager.get(name)
+            assert False, f"{name!r} was accepted"
+        except InvalidCollectionName:
+            pass
+
+def test_lru_eviction_under_budget():
+    manager = make_manager(budget_mb=1)
+    # 16-d float32 vectors: 64 bytes per chunk -> ~7000 chunks is ~0.43 MB per collection
+    for name in ["c1", "c2", "c3"]:
+        ingest(manager.get(name).store, [f"{name} chunk {i}" for i in range(7000)], f"{name}.pdf")
+
+    manager.get_index("c1")
+    manager.get_index("c2")
+    assert list(manager.status()["resident"]) == ["c1", "c2"]
+    manager.get_index("c1")  # c1 is now the most recently used
+    manager.get_index("c3")  # over budget: c2 goes
+    status = manager.status()
+    assert list(status["resident"]) == ["c1", "c3"] and status["evictions"] == 1
+    assert status["resident_mb"] <= status["budget_mb"]
+    assert manager.get("c2").index_cache.index is None
+
+    # Evicted collections are simply loaded again on their next search
+    assert manager.get_index("c2").similarity_search("c2 chunk 5", k=1)[0].page_content == "c2 chunk 5"
+    assert list(manager.status()["resident"]) == ["c3", "c2"]
+
+def test_dedup_tables_count_towards_budget():
+    manager = make_manager(budget_mb=1)
+    texts = [f"a chunk number {i}" for i in range(1000)]
+    a = manager.get("a")
+    ingest(a.store, texts, "a.pdf")
+    a.dedup_index = DedupIndex(a.store)
+    a.dedup_index.session().filter([Document(page_content="new", metadata={"source": "a.pdf"})])
+    manager.touch("a")
+    assert manager.status()["resident"]["a"] > 0.5  # no index loaded, only the dedup tables
+
+    ingest(manager.get("b").store, [f"b chunk {i}" for i in range(7000)], "b.pdf")
+    manager.get_index("b")  # over budget: a's dedup tables go
+    assert list(manager.status()["resident"]) == ["b"]
+    assert a.dedup_index.memory_bytes() == 0
+
+def test_only_resident_collections_are_kept():
+    manager = make_manager()
+    for i in range(20):
+        assert manager.get_index(f"missing-{i}") is None
+        ingest(manager.get(f"c{i}").store, [f"chunk {i}"], f"{i}.pdf")
+    manager.get_index("c3")
+    assert sorted(manager._collections.keys()) == ["c3"]
+    # A store still in use (e.g. by a background compaction) is shared, not opened twice
+    store = manager.get("c4").store
+    assert manager.get("c4").store is store
+
+if __name__ == "__main__":
+    test_collections_are_isolated()
+    test_drop_during_ingest()
+    test_invalid_names_rejected()
+    test_lru_eviction_under_budget()
+    test_dedup_tables_count_towards_budget()
+    test_only_resident_collections_are_kept()
+    print("✅ Collection tests passed!")
@@ -0,0 +1,139 @@
+import os
+import sys
+import random
+import tempfile
+from langchain_core.documents import Document
+
+# Allow importing from src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.dedup import MinHasher, DedupIndex, choose_bands, similarity
+from src.segment_store import SegmentStore
+from tests.test_segment_store import EMBEDDINGS, ingest
+
+WORDS = "pump valve sensor warranty invoice voltage firmware filter battery panel region order".split()
+
+def paragraph(seed, words=160):
+    rng = random.Random(seed)
+    return " ".join(rng.choice(WORDS) + str(rng.randint(0, 99)) for _ in range(words))
+
+def edit(text, changes, seed=0):
+    rng = random.Random(seed)
+    words = text.split()
+    for _ in range(changes):
+        words[rng.randrange(len(words))] = "edited"
+    return " ".join(words)
+
+def chunks(texts, source):
+    return [Document(page_content=t, metadata={"source": source, "page": i}) for i, t in enumerate(texts)]
+
+def test_signature_estimates_similarity():
+    hasher = MinHasher(num_perm=128)
+    text = paragraph(1)
+    sig = hasher.signature(text)
+    assert similarity(sig, hasher.signature("  " + text.upper() + "\n")) == 1.0
+    assert similarity(sig, hasher.signature(edit(text, 2))) > 0.85
+    assert similarity(sig, hasher.signature(paragraph(2))) < 0.3
+
+def test_band_choice_matches_threshold():
+    assert choose_bands(64, 0.9) == (8, 8)
+    bands, rows = choose_bands(128, 0.8)
+    assert bands * rows == 128 and (1 / bands) ** (1 / rows) <= 0.8
+
+def test_session_drops_near_duplicates():
+    store = SegmentStore(tempfile.mkdtemp(), EMBEDDINGS)
+    index = DedupIndex(store)
+    originals = [paragraph(i) for i in range(20)]
+    batch = chunks(originals + [edit(t, 1, seed=i) for i, t in enumerate(originals[:5])], "a.pdf")
+
+    session = index.session(threshold=0.8)
+    kept = session.filter(batch)
+    assert [c.page_content for c in kept] == originals
+    assert session.stats() == {"chunks": 25, "kept": 20, "dropped": 5, "merged": 0, "shrink_pct": 20.0}
+
+def test_merge_mode_records_copies():
+    store = SegmentStore(tempfile.mkdtemp(), EMBEDDINGS)
+    text = paragraph(7)
+    session = DedupIndex(store).session(threshold=0.8, mode="merge")
+    kept = session.filter(chunks([text, paragraph(8)], "a.pdf"))
+    assert len(kept) == 2 and kept[1].metadata["duplicates"] == []
+
+    # A copy in a later micro-batch of the same ingest is merged too
+    copy = Document(page_content=edit(text, 1), metadata={"source": "a.pdf", "page": 9})
+    assert session.filter([copy]) == []
+    assert kept[0].metadata["duplicates"] == [{"source": "a.pdf", "page": 9}]
+    assert session.stats()["merged"] == 1
+
+def test_other_documents_are_not_duplicates():
+    store = SegmentStore(tempfile.mkdtemp(), EMBEDDINGS)
+    index = DedupIndex(store)
+    text = paragraph(5)
+    session = index.session(threshold=0.8)
+    assert len(session.filter(chunks([text], "a.pdf") + chunks([text], "b.pdf"))) == 2
+    ingest(store, [text], "a.pdf")
+    session.commit()
+
+    # The same file uploaded under another name keeps all its chunks ...
+    assert len(index.session(threshold=0.8).filter(chunks([text, paragraph(6)], "renamed.pdf"))) == 2
+    # ... while a second upload of the same document is still a duplicate
+    assert len(index.session(threshold=0.8).filter(chunks([edit(text, 1)], "a.pdf"))) == 0
+
+def test_committed_chunks_persist_and_backfill():
+    root = tempfile.mkdtemp()
+    store = SegmentStore(root, EMBEDDINGS)
+    existing = [paragraph(i) for i in range(30)]
+    ingest(store, existing, "old.pdf")
+
+    # Store that predates the index: existing chunks are backfilled on first use
+    session = DedupIndex(store).session(threshold=0.8)
+    new = [paragraph(100 + i) for i in range(5)]
+    kept = session.filter(chunks([edit(t, 1) for t in existing[:10]] + new, "old.pdf"))
+    assert [c.page_content for c in kept] == new
+    ingest(store, new, "old.pdf")
+    session.commit()
+
+    # A fresh process reads the persisted signatures instead of rebuilding them
+    reloaded = DedupIndex(SegmentStore(root, EMBEDDINGS))
+    kept = reloaded.session(threshold=0.8).filter(chunks(new + [paragraph(200)], "old.pdf"))
+    assert [c.page_content for c in kept] == [paragraph(200)]
+    assert len(reloaded) == 35
+
+def test_uncommitted_session_is_forgotten():
+    store = SegmentStore(tempfile.mkdtemp(), EMBEDDINGS)
+    index = DedupIndex(store)
+    text = paragraph(3)
+    assert len(index.session().filter(chunks([text], "a.pdf"))) == 1
+    # The first ingest was cancelled (no commit): the same chunk is not a duplicate
+    assert len(index.session().filter(chunks([text], "a.pdf"))) == 1
+    assert len(index) == 0
+
+def test_replaced_and_deleted_documents_are_not_duplicates():
+    store = SegmentStore(tempfile.mkdtemp(), EMBEDDINGS)
+    index = DedupIndex(store)
+    old = [paragraph(i) for i in range(5)]
+    session = index.session(threshold=0.8)
+    session.filter(chunks(old, "manual.pdf"))
+    ingest(store, old, "manual.pdf")
+    session.commit()
+
+    # A revision of the same file replaces it: its chunks are kept
+    revision = chunks([edit(t, 1) for t in old], "manual.pdf")
+    assert len(index.session(threshold=0.8).filter(revision)) == 0
+    session = index.session(threshold=0.8, replace=True)
+    assert len(session.filter(revision)) == 5
+    session.commit()
+    assert len(index.dead) == 5
+
+    # Once deleted, the document can be uploaded again
+    assert index.forget(["manual.pdf"]) == 5
+    assert len(index.session(threshold=0.8).filter(chunks(old, "manual.pdf"))) == 5
+
+if __name__ == "__main__":
+    test_signature_estimates_similarity()
+    test_band_choice_matches_threshold()
+    test_session_drops_near_duplicates()
+    test_merge_mode_records_copies()
+    test_other_documents_are_not_duplicates()
+    test_committed_chunks_persist_and_backfill()
+    test_uncommitted_session_is_forgotten()
+    test_replaced_and_deleted_documents_are_not_duplicates()
+    print("✅ Dedup tests passed!")
@@ -0,0 +1,111 @@
+import os
+import sys
+import tempfile
+import numpy as np
+
+# Allow importing from src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.segment_store import SegmentStore, document_id
+from src.mmap_segment import SegmentBuilder, MmapSegment, rows_to_ranges
+from tests.test_segment_store import EMBEDDINGS
+
+def ingest(store, docs, replaces=None):
+    """docs: {source: [texts]} -> one segment."""
+    writer = store.writer()
+    for source, texts in docs.items():
+        writer.add(texts, EMBEDDINGS.embed_documents(texts), [{"source": source, "page": i} for i in range(len(texts))])
+    return writer.commit(replaces=replaces)
+
+def contents(store, query="x", k=100):
+    index = store.load()
+    return sorted(d.page_content for d in index.similarity_search(query, k=k)) if index else []
+
+def test_ranges_round_trip():
+    assert rows_to_ranges([]) == []
+    assert rows_to_ranges([0, 1, 2, 5, 7, 8]) == [[0, 3], [5, 6], [7, 9]]
+
+def test_delete_tombstones_without_rewrite():
+    store = SegmentStore(tempfile.mkdtemp(), EMBEDDINGS)
+    first = ingest(store, {"a.pdf": ["a1", "a2"], "b.pdf": ["b1", "b2", "b3"]})
+    ingest(store, {"c.pdf": ["c1"]})
+    vectors = os.path.join(store.segments_dir, first, "vectors.f32")
+    mtime = os.path.getmtime(vectors)
+
+    assert store.documents() == [{"doc_id": document_id(s), "source": s, "chunks": n}
+                                 for s, n in (("a.pdf", 2), ("b.pdf", 3), ("c.pdf", 1))]
+    previous = store.load()
+    assert store.delete_documents(["b.pdf"]) == 3
+    assert store.delete_documents(["b.pdf"]) == 0
+    assert os.path.getmtime(vectors) == mtime
+    assert store.read_manifest()["segments"][0]["deleted"] == [[2, 5]]
+    assert store.find_document(document_id("b.pdf")) is None
+
+    # Reused (already loaded) segments pick up the tombstones too
+    index = store.load(previous)
+    assert len(index) == 3
+    assert sorted(d.page_content for d in index.similarity_search("b1", k=10)) == ["a1", "a2", "c1"]
+
+def test_replace_is_one_manifest_update():
+    store = SegmentStore(tempfile.mkdtemp(), EMBEDDINGS)
+    ingest(store, {"manual.pdf": ["v1 intro", "v1 specs"], "other.pdf": ["other"]})
+    ingest(store, {"manual.pdf": ["v2 intro", "v2 specs", "v2 appendix"]}, replaces={"manual.pdf"})
+
+    assert contents(store) == ["other", "v2 appendix", "v2 intro", "v2 specs"]
+    assert [d["chunks"] for d in store.documents()] == [3, 1]
+
+def test_compaction_reclaims_deleted_rows():
+    store = SegmentStore(tempfile.mkdtemp(), EMBEDDINGS)
+    ingest(store, {"keep.pdf": [f"keep {i}" for i in range(6)], "drop.pdf": [f"drop {i}" for i in range(4)]})
+    gone = ingest(store, {"gone.pdf": ["gone"]})
+    store.delete_documents(["drop.pdf", "gone.pdf"])
+
+    # 40% of the first segment is deleted, the second one entirely
+    merged = store.compact(small_chunks=0, min_segments=99, max_deleted=0.2)
+    segments = store.read_manifest()["segments"]
+    assert [(seg["name"], seg["chunks"]) for seg in segments] == [(merged, 6)]
+    assert "deleted" not in segments[0]
+    assert gone not in os.listdir(store.segments_dir)
+    assert contents(store) == [f"keep {i}" for i in range(6)]
+
+def test_deletes_during_compaction_are_carried_over():
+    store = SegmentStore(tempfile.mkdtemp(), EMBEDDINGS)
+    ingest(store, {"a.pdf": ["a1", "a2"], "b.pdf": ["b1"]})
+    ingest(store, {"c.pdf": ["c1", "c2"], "d.pdf": ["d1"]})
+    # Delete while the merged segment is being built
+    builder_add = SegmentBuilder.add
+    def add_and_delete(self, *args):
+        builder_add(self, *args)
+        if self.count == 3:
+            store.delete_documents(["c.pdf"])
+    SegmentBuilder.add = add_and_delete
+    try:
+        merged = store.compact(small_chunks=100, min_segments=2)
+    finally:
+        SegmentBuilder.add = builder_add
+    assert store.read_manifest()["segments"] == [
+        {"name": merged, "chunks": 6, "format": 1, "deleted": [[3, 5]]}]
+    assert contents(store) == ["a1", "a2", "b1", "d1"]
+
+def test_tombstoned_rows_skipped_by_compressed_search():
+    path = os.path.join(tempfile.mkdtemp(), "seg")
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((2000, 32)).astype(np.float32)
+    builder = SegmentBuilder(path, storage="sq8")
+    builder.add([str(i) for i in range(2000)], vectors, [{} for _ in range(2000)])
+    builder.finish()
+    segment = MmapSegment(path)
+
+    nearest = [row for row, _ in segment.search(vectors[0], k=10)]
+    segment.set_deleted(rows_to_ranges(sorted(nearest[:8])))
+    result = [row for row, _ in segment.search(vectors[0], k=10)]
+    assert len(result) == 10 and not set(result) & set(nearest[:8])
+    assert result[:2] == nearest[8:]
+
+if __name__ == "__main__":
+    test_ranges_round_trip()
+    test_delete_tombstones_without_rewrite()
+    test_replace_is_one_manifest_update()
+    test_compaction_reclaims_deleted_rows()
+    test_deletes_during_compaction_are_carried_over()
+    test_tombstoned_rows_skipped_by_compressed_search()
+    print("✅ Document delete / replace tests passed!")
@@ -0,0 +1,88 @@
+import os
+import sys
+
+# Allow importing from src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.embed_pool import EmbeddingPool, PooledEmbeddings, embedding_session, parse_core_groups, core_groups
+from src.batching import TokenBudgetEmbeddings, get_batch_stats, diff_batch_stats
+
+class WorkerInfo:
+    """Fake model: each vector says which text it is and where it was computed."""
+    def __init__(self, threads):
+        self.threads = threads
+
+    def token_lengths(self, texts):
+        return [len(t.split()) for t in texts]
+
+    def embed_batch(self, texts):
+        return [[float(t.split()[-1]), float(os.getpid()), float(self.threads),
+                 float(os.environ.get("OMP_NUM_THREADS", 0)), float(len(os.sched_getaffinity(0)))] for t in texts]
+
+    embed_documents = embed_batch
+
+    def embed_query(self, text):
+        return self.embed_batch([text])[0]
+
+def load_worker_info(threads=None):
+    model = WorkerInfo(threads)
+    return TokenBudgetEmbeddings(model, model)
+
+class Broken:
+    def embed_documents(self, texts):
+        raise RuntimeError("worker died")
+
+def test_core_groups():
+    assert parse_core_groups("0-3;4-7") == [[0, 1, 2, 3], [4, 5, 6, 7]]
+    assert parse_core_groups("0,2 ; 5") == [[0, 2], [5]]
+    assert core_groups(2, "off") == []
+    cpus = sorted(os.sched_getaffinity(0))
+    groups = core_groups(2, "auto")
+    assert len(groups) == 2 and all(set(g) <= set(cpus) for g in groups)
+    if len(cpus) >= 2:
+        assert not set(groups[0]) & set(groups[1])
+
+def test_pool_keeps_order_and_worker_settings():
+    pool = EmbeddingPool(load_worker_info, workers=2, threads=3, affinity="auto", task_chunks=8)
+    try:
+        texts = [f"chunk {i}" for i in range(100)]
+        before = get_batch_stats()
+        vectors = pool.embed_documents(texts)
+        assert [v[0] for v in vectors] == list(range(100))
+        assert os.getpid() not in {v[1] for v in vectors}
+        # Threads and affinity are applied in each worker before the model loads
+        assert {(v[2], v[3]) for v in vectors} == {(3.0, 3.0)}
+        assert {v[4] for v in vectors} == {float(len(core_groups(2, "auto")[0]))}
+        # Worker batch stats reach the parent process
+        stats = diff_batch_stats(get_batch_stats(), before)
+        assert stats["texts"] == 100 and stats["tokens"] == 200
+    finally:
+        pool.shutdown()
+
+def test_pool_used_past_threshold_only():
+    local = load_worker_info(threads=1)
+    pool = EmbeddingPool(load_worker_info, workers=2, threads=1, affinity="off")
+    try:
+        embeddings = PooledEmbeddings(local, load_worker_info, min_chunks=50, pool=pool)
+        # Outside an ingest session (e.g. small API calls) everything stays local
+        assert embeddings.embed_documents(["x 1"])[0][1] == os.getpid()
+        with embedding_session() as session:
+            first = embeddings.embed_documents([f"x {i}" for i in range(40)])
+            second = embeddings.embed_documents([f"x {i}" for i in range(40)])
+        assert {v[1] for v in first} == {os.getpid()}
+        assert os.getpid() not in {v[1] for v in second}
+        assert session == {"chunks": 80, "pooled": 40, "failed": False}
+    finally:
+        pool.shutdown()
+
+    # A broken pool falls back to embedding in-process
+    embeddings = PooledEmbeddings(local, load_worker_info, min_chunks=0, pool=Broken())
+    with embedding_session() as session:
+        assert [v[0] for v in embeddings.embed_documents(["x 7"])] == [7.0]
+        assert [v[0] for v in embeddings.embed_documents(["x 8"])] == [8.0]
+    assert session["pooled"] == 0 and session["failed"]
+
+if __name__ == "__main__":
+    test_core_groups()
+    test_pool_keeps_order_and_worker_settings()
+    test_pool_used_past_threshold_only()
+    print("✅ Embedding pool tests passed!")
@@ -0,0 +1,88 @@
+import os
+import sys
+import tempfile
+from langchain_core.embeddings import Embeddings
+
+# Allow importing from src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.embedding_cache import CachedEmbeddings, EmbeddingStore, text_key
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.encoded = []
+
+    def embed_documents(self, texts):
+        self.encoded.extend(texts)
+        return [[float(len(t)), float(sum(map(ord, t)) % 97), 1.0] for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+def test_identical_chunks_are_encoded_once():
+    cache_dir = tempfile.mkdtemp()
+    model = CountingEmbeddings()
+    cached = CachedEmbeddings(model, "BAAI/bge-small-en-v1.5", cache_dir)
+
+    first = cached.embed_documents(["Disclaimer: all rights reserved.", "Page one", "Page one"])
+    assert model.encoded == ["Disclaimer: all rights reserved.", "Page one"]
+    assert first == model.embed_documents(["Disclaimer: all rights reserved.", "Page one", "Page one"])
+    model.encoded.clear()
+
+    # Re-flowed whitespace hits the same entry
+    second = cached.embed_documents(["Disclaimer:  all rights\nreserved. ", "Page two"])
+    assert model.encoded == ["Page two"]
+    assert second[0] == first[0]
+    assert cached.stats() == {"hits": 2, "misses": 3, "cached_vectors": 3}
+
+def test_cache_survives_restart_and_is_per_model():
+    cache_dir = tempfile.mkdtemp()
+    CachedEmbeddings(CountingEmbeddings(), "model-a", cache_dir).embed_documents(["header", "body"])
+
+    model = CountingEmbeddings()
+    reopened = CachedEmbeddings(model, "model-a", cache_dir)
+    assert reopened.embed_documents(["body", "header"])[0][0] == 4.0
+    assert model.encoded == []
+
+    other = CountingEmbeddings()
+    CachedEmbeddings(other, "model-b", cache_dir).embed_documents(["body"])
+    assert other.encoded == ["body"]
+
+def test_half_written_tail_is_dropped():
+    cache_dir = tempfile.mkdtemp()
+    cached = CachedEmbeddings(CountingEmbeddings(), "model-a", cache_dir)
+    cached.embed_documents(["one", "two"])
+    # Crash after appending a vector but before its key
+    with open(cached.store.vectors_path, "ab") as f:
+        f.write(b"\0" * 12)
+
+    model = CountingEmbeddings()
+    reopened = CachedEmbeddings(model, "model-a", cache_dir)
+    assert len(reopened.store) == 2
+    reopened.embed_documents(["three", "one"])
+    assert model.encoded == ["three"]
+    assert CachedEmbeddings(CountingEmbeddings(), "model-a", cache_dir).embed_documents(["three"])[0][0] == 5.0
+
+def test_two_instances_share_one_store():
+    # Two processes (uvicorn workers) appending to the same directory
+    cache_dir = tempfile.mkdtemp()
+    a = EmbeddingStore("model-a", cache_dir)
+    b = EmbeddingStore("model-a", cache_dir)
+    a.put_many([text_key("one")], [[1.0, 1.0, 1.0]])
+    b.put_many([text_key("nine")], [[9.0, 9.0, 9.0]])
+    a.put_many([text_key("two"), text_key("nine")], [[2.0, 2.0, 2.0], [0.0, 0.0, 0.0]])
+    b.put_many([text_key("three")], [[3.0, 3.0, 3.0]])
+
+    # Each store's rows point at its own vectors, not at whatever the other one appended
+    assert a.get_many([text_key("two")])[text_key("two")][0] == 2.0
+    assert b.get_many([text_key("three")])[text_key("three")][0] == 3.0
+    reopened = EmbeddingStore("model-a", cache_dir)
+    assert len(reopened) == 4
+    vectors = reopened.get_many([text_key(t) for t in ("one", "nine", "two", "three")])
+    assert [vectors[text_key(t)][0] for t in ("one", "nine", "two", "three")] == [1.0, 9.0, 2.0, 3.0]
+
+if __name__ == "__main__":
+    test_identical_chunks_are_encoded_once()
+    test_cache_survives_restart_and_is_per_model()
+    test_half_written_tail_is_dropped()
+    test_two_instances_share_one_store()
+    print("✅ Embedding cache tests passed!")
@@ -0,0 +1,82 @@
+import os
+import sys
+import time
+import asyncio
+import tempfile
+import httpx
+
+# Allow importing from src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import app as api
+import src.extraction_cache as extraction_cache
+import src.vector_store as vector_store
+from src.extraction_cache import ExtractionCache
+from src.collection_manager import CollectionManager
+
+# /chat/ must keep answering quickly while a large ingest is running
+MAX_CHAT_SECONDS = 0.5
+
+def fake_answer(query, collection=None):
+    yield "pong"
+
+def slow_add_documents(docs, progress=None, **kwargs):
+    """Stands in for split + embed + FAISS (blocking work on the job thread)."""
+    count = 0
+    for _ in docs:
+        time.sleep(0.002)
+        count += 1
+    return count
+
+async def measure_chat_during_ingest():
+    # ~6 MB CSV: enough row groups to keep the job busy for a few seconds
+    rows = "".join(f"{i},part-{i},{i * 3}\n" for i in range(200_000))
+    payload = ("id,part,qty\n" + rows).encode()
+
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        started = time.perf_counter()
+        response = await client.post("/ingest/", files={"files": ("big.csv", payload)})
+        upload_seconds = time.perf_counter() - started
+        job_id = response.json()["job_id"]
+
+        latencies = []
+        while True:
+            started = time.perf_counter()
+            chat = await client.post("/chat/", data={"query": "ping"})
+            latencies.append(time.perf_counter() - started)
+            assert chat.text == "pong"
+
+            job = (await client.get(f"/ingest/{job_id}")).json()
+            if job["status"] not in ("queued", "running"):
+                break
+            await asyncio.sleep(0.05)
+
+    return upload_seconds, latencies, job
+
+def test_chat_latency_during_ingest():
+    original_answer, original_add = api.ask_question, api.add_documents_stream
+    api.ask_question = fake_answer
+    api.add_documents_stream = slow_add_documents
+    # The extraction cache and the vector DB live in a temp dir, not in the repo
+    tmp = tempfile.TemporaryDirectory()
+    extraction_cache._cache = ExtractionCache(cache_dir=os.path.join(tmp.name, "extraction_cache"))
+    original_manager = vector_store.collection_manager
+    vector_store.collection_manager = CollectionManager(vector_store.embeddings, os.path.join(tmp.name, "faiss_index"),
+                                                        root=os.path.join(tmp.name, "collections"))
+    try:
+        upload_seconds, latencies, job = asyncio.run(measure_chat_during_ingest())
+    finally:
+        api.ask_question, api.add_documents_stream = original_answer, original_add
+        extraction_cache._cache = None
+        vector_store.collection_manager = original_manager
+        tmp.cleanup()
+
+    print(f"📤 Upload accepted in {upload_seconds:.2f}s, job {job['status']} after {job['elapsed_seconds']:.2f}s")
+    print(f"💬 /chat/ during ingest: {len(latencies)} calls, max {max(latencies) * 1000:.0f} ms")
+    assert job["status"] == "succeeded"
+    assert len(latencies) > 1, "ingest finished before /chat/ could be measured"
+    assert max(latencies) < MAX_CHAT_SECONDS
+
+if __name__ == "__main__":
+    test_chat_latency_during_ingest()
+    print("✅ Event loop stays responsive during ingestion!")
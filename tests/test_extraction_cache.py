@@ -0,0 +1,97 @@
+import os
+import sys
+import time
+import tempfile
+from langchain_core.documents import Document
+
+# Allow importing from src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import src.extraction_cache as extraction_cache
+from src.extraction_cache import ExtractionCache
+from src.sources import IngestSource
+from src.ingest import load_file_cached
+
+def test_hit_and_lru_eviction():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ExtractionCache(cache_dir=os.path.join(tmp, "cache"), max_bytes=400)
+
+        file_a = os.path.join(tmp, "a.txt")
+        with open(file_a, "w") as f:
+            f.write("same bytes")
+        key_a = cache.key(IngestSource.from_path(file_a).sha256(), ".txt", version=1)
+
+        # Same content under another name -> same key
+        upload_b = IngestSource("renamed.txt", data=b"same bytes")
+        assert cache.key(upload_b.sha256(), upload_b.ext, version=1) == key_a
+        assert cache.key(upload_b.sha256(), upload_b.ext, version=2) != key_a
+        # Extraction settings are part of the key too
+        assert cache.key(upload_b.sha256(), upload_b.ext, 1, {"table_rows_per_doc": 200}) != key_a
+        assert (cache.key(upload_b.sha256(), upload_b.ext, 1, {"table_rows_per_doc": 200})
+                != cache.key(upload_b.sha256(), upload_b.ext, 1, {"table_rows_per_doc": 50}))
+        file_b = upload_b.name
+
+        assert cache.get(key_a, source=file_a) is None
+        cache.put(key_a, [Document(page_content="hello", metadata={"source": file_a, "page": 1})])
+
+        docs = cache.get(key_a, source=file_b)
+        assert docs[0].page_content == "hello"
+        assert docs[0].metadata == {"source": file_b, "page": 1}
+
+        # Fill the cache past max_bytes; the least recently used entry goes first
+        time.sleep(0.01)
+        cache.put("big-1", [Document(page_content="x" * 150, metadata={})])
+        time.sleep(0.01)
+        cache.get(key_a, source=file_a)
+        time.sleep(0.01)
+        cache.put("big-2", [Document(page_content="y" * 150, metadata={})])
+
+        assert cache.get("big-1", source="") is None
+        assert cache.get(key_a, source=file_a) is not None
+        assert cache.get("big-2", source="") is not None
+
+def test_corrupt_entry_is_re_extracted():
+    with tempfile.TemporaryDirectory() as tmp:
+        extraction_cache._cache = ExtractionCache(cache_dir=os.path.join(tmp, "cache"))
+        try:
+            path = os.path.join(tmp, "notes.txt")
+            with open(path, "w") as f:
+                f.write("some notes")
+            stats = extraction_cache.new_cache_stats()
+            first = load_file_cached(path, stats)
+            assert stats["misses"] == 1 and len(first) == 1
+
+            # A damaged entry (disk full, killed process, ...) must not fail the ingest
+            [entry] = os.listdir(extraction_cache._cache.cache_dir)
+            with open(os.path.join(extraction_cache._cache.cache_dir, entry), "a") as f:
+                f.write('{"page_content": "trunc')
+            again = load_file_cached(path, stats)
+            assert stats["hits"] == 1
+            assert [d.page_content for d in again] == [d.page_content for d in first]
+
+            # ... and the entry was written again in one piece
+            assert load_file_cached(path, stats)[0].page_content == first[0].page_content
+            assert stats["hits"] == 2
+        finally:
+            extraction_cache._cache = None
+
+def test_cache_write_error_still_ingests():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ExtractionCache(cache_dir=os.path.join(tmp, "cache"))
+        def broken_writer(key):
+            raise OSError("No space left on device")
+        cache.writer = broken_writer
+        extraction_cache._cache = cache
+        try:
+            path = os.path.join(tmp, "notes.txt")
+            with open(path, "w") as f:
+                f.write("some notes")
+            docs = load_file_cached(path)
+            assert [d.page_content for d in docs] == ["some notes"]
+        finally:
+            extraction_cache._cache = None
+
+if __name__ == "__main__":
+    test_hit_and_lru_eviction()
+    test_corrupt_entry_is_re_extracted()
+    test_cache_write_error_still_ingests()
+    print("✅ Extraction cache tests passed!")
@@ -0,0 +1,104 @@
+import os
+import sys
+import time
+import tempfile
+import threading
+
+# Allow importing from src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.inference_server import (InferenceServer, InferenceClient, InferenceError, SidecarEmbeddings,
+                                  SidecarCrossEncoder)
+
+class SlowModels:
+    """Fake embedder + Cross-Encoder that record the size of every batch they run."""
+    def __init__(self):
+        self.embed_batches = []
+        self.rerank_batches = []
+
+    def embed_documents(self, texts):
+        self.embed_batches.append(len(texts))
+        time.sleep(0.05)
+        return [[float(len(t)), float(t.count("x"))] for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    def predict(self, pairs, batch_size=32, show_progress_bar=False):
+        self.rerank_batches.append(len(pairs))
+        time.sleep(0.05)
+        if any(p == "boom" for _, p in pairs):
+            raise RuntimeError("model crashed")
+        return [float(len(p)) - len(q) for q, p in pairs]
+
+def start_server(models, **kwargs):
+    path = os.path.join(tempfile.mkdtemp(), "inference.sock")
+    server = InferenceServer(models, models, socket_path=path, **kwargs)
+    server.start_in_background()
+    return server, InferenceClient(path, timeout=10)
+
+def run_concurrently(fn, count):
+    results = [None] * count
+    def worker(i):
+        results[i] = fn(i)
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+def test_concurrent_requests_share_batches():
+    models = SlowModels()
+    server, client = start_server(models, max_wait_ms=30, max_queries=64, max_pairs=64)
+    try:
+        embeddings, reranker = SidecarEmbeddings(client), SidecarCrossEncoder(client)
+        queries = run_concurrently(lambda i: embeddings.embed_query("x" * i), 12)
+        # Every caller gets its own vector back, but the model ran far fewer batches
+        assert queries == [[float(i), float(i)] for i in range(12)]
+        assert sum(models.embed_batches) == 12 and len(models.embed_batches) < 12
+
+        passages = ["a", "abc", "ab"]
+        ranks = run_concurrently(lambda i: reranker.rank("q" * i, passages), 8)
+        for i, rank in enumerate(ranks):
+            assert [r["corpus_id"] for r in rank] == [1, 2, 0]
+            assert rank[0]["score"] == 3.0 - i
+        assert sum(models.rerank_batches) == 24 and len(models.rerank_batches) < 8
+
+        # Documents go straight through
+        assert embeddings.embed_documents(["xx", "y"]) == [[2.0, 2.0], [1.0, 0.0]]
+        stats = client.status()["batches"]
+        assert stats["embed_query"]["requests"] == 12 and stats["rerank"]["items"] == 24
+    finally:
+        server.stop()
+
+def test_batch_limit_and_errors():
+    models = SlowModels()
+    server, client = start_server(models, max_wait_ms=30, max_pairs=5)
+    try:
+        reranker = SidecarCrossEncoder(client)
+        # 4 requests x 3 pairs never share a batch beyond max_pairs
+        run_concurrently(lambda i: reranker.rank("q", ["p1", "p2", "p3"]), 4)
+        assert max(models.rerank_batches) <= 5 and sum(models.rerank_batches) == 12
+
+        # A model error fails its requests only; the server keeps serving
+        try:
+            reranker.rank("q", ["boom"])
+            assert False, "expected InferenceError"
+        except InferenceError as e:
+            assert "model crashed" in str(e)
+        assert reranker.rank("q", ["ok"])[0]["score"] == 1.0
+    finally:
+        server.stop()
+
+    # Server gone: callers get an InferenceError (rag.py falls back to vector order)
+    time.sleep(0.2)
+    try:
+        client.status()
+        assert False, "expected InferenceError"
+    except InferenceError:
+        pass
+
+if __name__ == "__main__":
+    test_concurrent_requests_share_batches()
+    test_batch_limit_and_errors()
+    print("✅ Inference server tests passed!")
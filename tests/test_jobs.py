@@ -0,0 +1,60 @@
+import os
+import sys
+import time
+import threading
+
+# Allow importing from src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.jobs import JobManager
+
+def wait_for(job, timeout=5):
+    deadline = time.time() + timeout
+    while not job.done and time.time() < deadline:
+        time.sleep(0.01)
+    return job.status
+
+def test_job_progress_and_result():
+    manager = JobManager(workers=1)
+
+    def work(job, names):
+        for name in names:
+            job.start_file(name)
+            with job.timed("extract"):
+                job.page_done()
+            job.finish_file()
+        job.add_chunks(3)
+        return {"status": "success"}
+
+    job = manager.submit(["a.pdf", "b.pdf"], work, ["a.pdf", "b.pdf"])
+    assert wait_for(job) == "succeeded"
+    state = job.to_dict()
+    assert [f["name"] for f in state["files"]] == ["a.pdf", "b.pdf"]
+    assert state["chunks"] == 3 and "extract" in state["stages"]
+    assert state["result"] == {"status": "success"}
+
+def test_cancel_running_and_queued_jobs():
+    manager = JobManager(workers=1)
+    started = threading.Event()
+    cleaned = []
+
+    def slow(job):
+        started.set()
+        while True:
+            job.check_cancelled()
+            time.sleep(0.01)
+
+    running = manager.submit(["big.pdf"], slow, cleanup=lambda: cleaned.append("running"))
+    queued = manager.submit(["next.pdf"], slow, cleanup=lambda: cleaned.append("queued"))
+    started.wait(5)
+
+    assert manager.cancel(queued.id) == "cancelled"
+    assert manager.cancel(running.id) == "cancelling"
+    assert wait_for(running) == "cancelled"
+    assert wait_for(queued) == "cancelled"
+    time.sleep(0.1)
+    assert sorted(cleaned) == ["queued", "running"]
+
+if __name__ == "__main__":
+    test_job_progress_and_result()
+    test_cancel_running_and_queued_jobs()
+    print("✅ Job queue tests passed!")
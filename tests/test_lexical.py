@@ -0,0 +1,75 @@
+import os
+import sys
+import glob
+import tempfile
+from langchain_core.documents import Document
+
+# Allow importing from src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.segment_store import SegmentStore
+from src.lexical import tokenize, reciprocal_rank_fusion, LEXICAL_INFO_FILE
+from tests.test_segment_store import EMBEDDINGS, ingest
+
+MANUAL = [
+    "Replace filter XK-2041 every six months.",
+    "Error E_1042 means the pump pressure sensor failed.",
+    "See clause 4.2.1 for the warranty period.",
+    "The pump has a two year warranty.",
+]
+FILLER = [f"Quarterly report {i} on supplier delivery schedules." for i in range(30)]
+
+def keyword_hits(index, query, k=3):
+    return [doc.page_content for doc in index.lexical_search(query, k=k)]
+
+def test_tokenize_keeps_identifiers():
+    assert tokenize("Replace the XK-2041 filter (clause 4.2.1)") == [
+        "replace", "xk-2041", "xk", "2041", "filter", "clause", "4.2.1", "4", "2", "1"]
+    assert tokenize("error E_1042") == ["error", "e_1042", "e", "1042"]
+
+def test_keyword_search_across_segments():
+    store = SegmentStore(tempfile.mkdtemp(), EMBEDDINGS)
+    ingest(store, MANUAL, "manual.pdf")
+    ingest(store, FILLER, "reports.pdf")
+    index = store.load()
+    assert keyword_hits(index, "which filter is XK-2041?")[0] == MANUAL[0]
+    assert keyword_hits(index, "what does error E_1042 mean")[0] == MANUAL[1]
+    assert keyword_hits(index, "clause 4.2.1")[0] == MANUAL[2]
+    assert keyword_hits(index, "zebra") == []
+
+    # Same scores as one segment holding everything (corpus-wide IDF / lengths)
+    single = SegmentStore(tempfile.mkdtemp(), EMBEDDINGS)
+    ingest(single, MANUAL + FILLER, "all.pdf")
+    for query in ("pump warranty", "supplier report 7"):
+        split = [(d.page_content, round(s, 5)) for d, s in index.lexical_search_with_score(query, k=5)]
+        whole = [(d.page_content, round(s, 5)) for d, s in single.load().lexical_search_with_score(query, k=5)]
+        assert split == whole
+
+    # Tombstoned chunks disappear; compaction keeps the live ones searchable
+    store.delete_documents(["manual.pdf"])
+    assert keyword_hits(store.load(), "XK-2041") == []
+    ingest(store, ["Filter XK-2041 is discontinued."], "notice.pdf")
+    store.compact(small_chunks=1000, min_segments=2, max_deleted=0.5)
+    index = store.load()
+    assert len(index.segments) == 1
+    assert keyword_hits(index, "XK-2041") == ["Filter XK-2041 is discontinued."]
+
+def test_older_segments_get_an_index_on_first_use():
+    store = SegmentStore(tempfile.mkdtemp(), EMBEDDINGS)
+    name = ingest(store, MANUAL, "manual.pdf")
+    for path in glob.glob(os.path.join(store.segments_dir, name, "lex*")):
+        os.remove(path)
+    assert keyword_hits(store.load(), "E_1042")[0] == MANUAL[1]
+    assert os.path.exists(os.path.join(store.segments_dir, name, LEXICAL_INFO_FILE))
+
+def test_reciprocal_rank_fusion():
+    a, b, c, d = (Document(page_content=t, metadata={"source": "x.pdf"}) for t in "abcd")
+    # In both lists beats first in one; ties keep the first list's order
+    fused = reciprocal_rank_fusion([[a, b, c], [d, b]])
+    assert [doc.page_content for doc in fused] == ["b", "a", "d", "c"]
+
+if __name__ == "__main__":
+    test_tokenize_keeps_identifiers()
+    test_keyword_search_across_segments()
+    test_older_segments_get_an_index_on_first_use()
+    test_reciprocal_rank_fusion()
+    print("✅ Lexical search tests passed!")
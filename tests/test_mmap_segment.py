@@ -0,0 +1,94 @@
+import os
+import sys
+import tempfile
+import numpy as np
+import faiss
+
+# Allow importing from src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.mmap_segment import SegmentBuilder, MmapSegment
+
+def build(rows, dim=8, batch=7, seed=0, **storage):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((rows, dim)).astype(np.float32)
+    path = os.path.join(tempfile.mkdtemp(), "seg")
+    builder = SegmentBuilder(path, **storage)
+    for start in range(0, rows, batch):
+        end = min(start + batch, rows)
+        metadatas = [{"source": f"doc{i % 3}.pdf", "page": i} for i in range(start, end)]
+        builder.add([f"chunk {i} ✓" for i in range(start, end)], vectors[start:end], metadatas)
+    builder.finish()
+    return path, vectors
+
+def test_round_trip_text_and_metadata():
+    path = os.path.join(tempfile.mkdtemp(), "seg")
+    builder = SegmentBuilder(path)
+    builder.add(["a", "", "c"], np.eye(3, dtype=np.float32), [
+        {"source": "x.csv", "row_start": 1},
+        {"source": "x.csv", "sheet": "Stock"},
+        {"source": "y.pdf", "page": 2, "tags": ["t1"], "row_start": "n/a"},
+    ])
+    builder.finish()
+
+    segment = MmapSegment(path)
+    assert [segment.get_text(i) for i in range(3)] == ["a", "", "c"]
+    assert segment.get_metadata(0) == {"source": "x.csv", "row_start": 1}
+    assert segment.get_metadata(1) == {"source": "x.csv", "sheet": "Stock"}
+    assert segment.get_metadata(2) == {"source": "y.pdf", "row_start": "n/a", "page": 2, "tags": ["t1"]}
+    # Strings are dictionary-encoded: 3 rows, 2 distinct sources
+    assert os.path.getsize(os.path.join(path, "col-0.codes.i32")) == 3 * 4
+
+def test_search_matches_faiss_flat():
+    path, vectors = build(500)
+    segment = MmapSegment(path)
+    assert isinstance(segment.vectors, np.memmap)
+
+    index = faiss.IndexFlatL2(vectors.shape[1])
+    index.add(vectors)
+    for query in np.random.default_rng(1).standard_normal((5, vectors.shape[1])).astype(np.float32):
+        distances, rows = index.search(query[None, :], 12)
+        results = segment.search(query, k=12)
+        assert [row for row, _ in results] == rows[0].tolist()
+        assert np.allclose([score for _, score in results], distances[0], atol=1e-4)
+
+    doc = segment.similarity_search_with_score_by_vector(vectors[42], k=1)[0][0]
+    assert doc.page_content == "chunk 42 ✓" and doc.metadata == {"source": "doc0.pdf", "page": 42}
+
+def test_compressed_storage_with_rescoring():
+    exact_path, vectors = build(2000, dim=384, batch=500, storage="float32")
+    exact = MmapSegment(exact_path)
+    queries = vectors[:30] + 0.01
+
+    for storage, ratio, min_recall in [("sq8", 4, 0.95), ("pq", 16, 0.7)]:
+        path, _ = build(2000, dim=384, batch=500, storage=storage)
+        segment = MmapSegment(path)
+        assert segment.storage == storage and not os.path.exists(os.path.join(path, "vectors.f32"))
+        assert exact.memory_bytes() / segment.memory_bytes() >= ratio - 0.01
+
+        overlap = 0
+        for query in queries:
+            expected = exact.search(query, 12)
+            results = segment.search(query, 12)
+            overlap += len({r for r, _ in results} & {r for r, _ in expected})
+            # Re-scored against the float16 originals: near-exact distances
+            assert results[0][0] == expected[0][0]
+            assert abs(results[0][1] - expected[0][1]) < 1e-2
+        assert overlap / (12 * len(queries)) >= min_recall, storage
+
+        # Compaction / ANN builds read the originals back
+        assert np.allclose(segment.read_vectors(0, 3), vectors[:3], atol=1e-2)
+
+def test_compressed_storage_without_originals():
+    path, vectors = build(300, dim=16, batch=100, storage="pq", keep_float16=False)
+    segment = MmapSegment(path)
+    assert segment.storage == "sq8"  # too few rows to train 8-bit PQ
+    assert segment.vectors is None
+    assert segment.search(vectors[5], 1)[0][0] == 5
+    assert np.allclose(segment.read_vectors(5, 6), vectors[5:6], atol=0.1)
+
+if __name__ == "__main__":
+    test_round_trip_text_and_metadata()
+    test_search_matches_faiss_flat()
+    test_compressed_storage_with_rescoring()
+    test_compressed_storage_without_originals()
+    print("✅ Mmap segment tests passed!")
@@ -0,0 +1,75 @@
+import os
+import sys
+import threading
+
+# Allow importing from src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.models import ModelRegistry, LazyEmbeddings
+from tests.bench_startup import import_profile
+from tests.test_segment_store import EMBEDDINGS
+
+def test_models_load_once_on_first_use():
+    calls = []
+    release = threading.Event()
+    def factory():
+        calls.append(1)
+        release.wait(5)
+        return "model"
+    registry = ModelRegistry()
+    registry.register("m", factory)
+    assert not registry.is_loaded("m") and not registry.ready()
+
+    # Concurrent first uses wait for the same load
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get("m"))) for _ in range(4)]
+    for t in threads:
+        t.start()
+    release.set()
+    for t in threads:
+        t.join()
+    assert results == ["model"] * 4 and len(calls) == 1
+    assert registry.ready() and registry.status()["models"]["m"]["loaded"]
+
+def test_failures_required_vs_optional():
+    attempts = {"required": 0, "optional": 0}
+    def flaky():
+        attempts["required"] += 1
+        if attempts["required"] == 1:
+            raise RuntimeError("download failed")
+        return "model"
+    def broken():
+        attempts["optional"] += 1
+        raise RuntimeError("no weights")
+    registry = ModelRegistry()
+    registry.register("required", flaky)
+    registry.register("optional", broken, required=False)
+
+    # Warm-up only records failures; a required model is retried on its next use
+    registry.warm_up()
+    status = registry.status()
+    assert not status["ready"] and status["models"]["required"]["error"] == "download failed"
+    assert registry.get("required") == "model" and registry.ready()
+
+    # An optional model that failed stays off (None) without retrying
+    assert registry.get("optional") is None and registry.get("optional") is None
+    assert attempts["optional"] == 1
+
+def test_background_warm_up():
+    registry = ModelRegistry()
+    registry.register("embeddings", lambda: EMBEDDINGS)
+    lazy = LazyEmbeddings(registry, "embeddings")
+    assert not registry.is_loaded("embeddings")
+    registry.warm_up_in_background().join(5)
+    assert registry.ready()
+    assert lazy.embed_query("pump") == EMBEDDINGS.embed_query("pump")
+
+def test_app_import_does_not_load_models():
+    report = import_profile("app")
+    assert report["heavy"] == [], report["heavy"]
+
+if __name__ == "__main__":
+    test_models_load_once_on_first_use()
+    test_failures_required_vs_optional()
+    test_background_warm_up()
+    test_app_import_does_not_load_models()
+    print("✅ Model registry tests passed!")
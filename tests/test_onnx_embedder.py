@@ -0,0 +1,53 @@
+import os
+import sys
+import json
+import tempfile
+import numpy as np
+
+# Allow importing from src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.onnx_embedder import export_onnx, OnnxEmbeddings, compare, CHECK_TEXTS, META_FILE
+from src.batching import TokenBudgetEmbeddings
+
+WORDS = "what is the warranty period for pump invoice filter valve battery voltage firmware panel ok".split()
+
+def tiny_model(root, pooling):
+    """Small random BERT saved as a SentenceTransformer folder (no download needed)."""
+    from transformers import BertConfig, BertModel, BertTokenizerFast
+    from sentence_transformers import SentenceTransformer, models
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + WORDS + list("abcdefghijklmnopqrstuvwxyz0123456789")
+    with open(os.path.join(root, "vocab.txt"), "w") as f:
+        f.write("\n".join(vocab))
+    hf = os.path.join(root, "hf")
+    BertModel(BertConfig(vocab_size=len(vocab), hidden_size=32, num_hidden_layers=2, num_attention_heads=2,
+                         intermediate_size=64, max_position_embeddings=64)).save_pretrained(hf)
+    BertTokenizerFast(os.path.join(root, "vocab.txt")).save_pretrained(hf)
+    transformer = models.Transformer(hf, max_seq_length=48)
+    path = os.path.join(root, "st")
+    SentenceTransformer(modules=[transformer, models.Pooling(32, pooling_mode=pooling), models.Normalize()]).save(path)
+    return path
+
+def test_onnx_matches_torch():
+    from sentence_transformers import SentenceTransformer
+    for pooling in ["cls", "mean"]:
+        root = tempfile.mkdtemp()
+        model = tiny_model(root, pooling)
+        out = export_onnx(model, os.path.join(root, "onnx"))
+        with open(os.path.join(out, META_FILE)) as f:
+            meta = json.load(f)
+        assert meta["pooling"] == pooling and meta["dim"] == 32
+
+        # Texts longer than max_seq_length are truncated the same way
+        texts = CHECK_TEXTS + ["pump " * 100, "valve"]
+        reference = SentenceTransformer(model, device="cpu").encode(texts, normalize_embeddings=True)
+        fp32 = OnnxEmbeddings(out, batch_size=3)
+        assert compare(reference, fp32.embed_documents(texts))["max_abs_diff"] < 1e-4
+        assert np.allclose(fp32.embed_query("valve"), reference[-1], atol=1e-4)
+        assert compare(reference, OnnxEmbeddings(out, quantized=True).embed_documents(texts))["min_cosine"] > 0.99
+        # Length-bucketed batches give the same vectors, in the input order
+        bucketed = TokenBudgetEmbeddings(fp32, fp32, max_tokens=64)
+        assert compare(reference, bucketed.embed_documents(texts))["max_abs_diff"] < 1e-4
+
+if __name__ == "__main__":
+    test_onnx_matches_torch()
+    print("✅ ONNX embedder tests passed!")
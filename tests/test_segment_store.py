@@ -0,0 +1,206 @@
+import os
+import sys
+import hashlib
+import tempfile
+import multiprocessing
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_community.vectorstores import FAISS
+
+# Allow importing from src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.segment_store import SegmentStore, SegmentWriter, IndexCache, deleted_chunks
+
+class HashEmbeddings(Embeddings):
+    """Deterministic 16-d vectors, no model download needed."""
+    def embed_query(self, text):
+        seed = int(hashlib.md5(text.encode()).hexdigest()[:8], 16)
+        vector = np.random.default_rng(seed).standard_normal(16)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts):
+        return [self.embed_query(t) for t in texts]
+
+EMBEDDINGS = HashEmbeddings()
+
+def ingest(store, texts, source):
+    writer = store.writer()
+    writer.add(texts, EMBEDDINGS.embed_documents(texts), [{"source": source} for _ in texts])
+    return writer.commit()
+
+def test_append_writes_new_segment_only():
+    store = SegmentStore(tempfile.mkdtemp(), EMBEDDINGS)
+    first = ingest(store, [f"alpha {i}" for i in range(20)], "a.pdf")
+    first_index = os.path.join(store.segments_dir, first, "vectors.f32")
+    mtime = os.path.getmtime(first_index)
+
+    second = ingest(store, ["beta 1", "beta 2"], "b.pdf")
+    assert os.path.getmtime(first_index) == mtime
+    assert [seg["name"] for seg in store.read_manifest()["segments"]] == [first, second]
+
+    index = store.load()
+    assert len(index) == 22
+    assert index.similarity_search("beta 2", k=1)[0].page_content == "beta 2"
+    assert index.similarity_search("alpha 7", k=1)[0].page_content == "alpha 7"
+
+def test_large_ingest_rolls_over_to_new_segments():
+    store = SegmentStore(tempfile.mkdtemp(), EMBEDDINGS)
+    texts = [f"row {i}" for i in range(7)]
+    writer = SegmentWriter(store, max_chunks=3)
+    finished = [writer.add(texts[i:i + 2], EMBEDDINGS.embed_documents(texts[i:i + 2]), [{"source": "big.csv"}] * 2)
+                for i in range(0, 7, 2)]
+    assert finished == [False, True, False, True]
+    assert store.read_manifest()["segments"] == []  # nothing visible before commit()
+
+    version = store.version()
+    writer.commit()
+    assert writer.published == ["seg-000001", "seg-000002"]
+    assert [seg["chunks"] for seg in store.read_manifest()["segments"]] == [4, 3]
+    assert store.version() != version
+    assert store.load().similarity_search("row 6", k=1)[0].page_content == "row 6"
+
+    # An aborted ingest leaves none of its finished folders behind
+    writer = SegmentWriter(store, max_chunks=1)
+    for text in ["a", "b", "c"]:
+        writer.add([text], EMBEDDINGS.embed_documents([text]), [{"source": "x.pdf"}])
+    writer.abort()
+    assert sorted(os.listdir(store.segments_dir)) == ["seg-000001", "seg-000002"]
+
+def test_clear_keeps_ingests_in_flight():
+    store = SegmentStore(tempfile.mkdtemp(), EMBEDDINGS)
+    ingest(store, ["old 1", "old 2"], "old.pdf")
+    writer = store.writer()
+    writer.add(["new"], EMBEDDINGS.embed_documents(["new"]), [{"source": "new.pdf"}])
+
+    version = store.version()
+    assert store.clear() is True
+    assert store.version() != version
+    assert store.read_manifest()["segments"] == []
+
+    # The ingest that was running during the clear still publishes
+    writer.commit()
+    assert [d.page_content for d in store.load().similarity_search("new", k=5)] == ["new"]
+
+def publish_many(root, worker, count):
+    store = SegmentStore(root, EMBEDDINGS)
+    for i in range(count):
+        ingest(store, [f"worker {worker} chunk {i}"], f"{worker}-{i}.pdf")
+        if i % 5 == 4:
+            store.delete_documents([f"{worker}-{i - 1}.pdf"])
+
+def test_workers_publish_into_one_store():
+    # Two uvicorn workers ingesting into the same store at the same time
+    root = tempfile.mkdtemp()
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=publish_many, args=(root, w, 30)) for w in range(2)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert all(worker.exitcode == 0 for worker in workers)
+
+    store = SegmentStore(root, EMBEDDINGS)
+    segments = store.read_manifest()["segments"]
+    assert len(segments) == 60 and len({seg["name"] for seg in segments}) == 60
+    assert sum(deleted_chunks(seg) for seg in segments) == 12
+    assert len(store.documents()) == 48
+
+def test_fan_out_matches_single_index():
+    texts = [f"chunk {i}" for i in range(60)]
+    store = SegmentStore(tempfile.mkdtemp(), EMBEDDINGS)
+    for i in range(0, 60, 20):
+        ingest(store, texts[i:i + 20], "doc.pdf")
+    flat = FAISS.from_embeddings(list(zip(texts, EMBEDDINGS.embed_documents(texts))), EMBEDDINGS)
+
+    for query in ["chunk 3", "chunk 41", "something else"]:
+        expected = [d.page_content for d in flat.similarity_search(query, k=12)]
+        assert [d.page_content for d in store.load().similarity_search(query, k=12)] == expected
+
+def test_compaction_merges_small_segments():
+    store = SegmentStore(tempfile.mkdtemp(), EMBEDDINGS)
+    for i in range(4):
+        ingest(store, [f"part {i}-{j}" for j in range(5)], f"{i}.pdf")
+    previous = store.load()
+
+    merged = store.compact(small_chunks=100, min_segments=3)
+    segments = store.read_manifest()["segments"]
+    assert [seg["name"] for seg in segments] == [merged]
+    assert segments[0]["chunks"] == 20
+    assert sorted(os.listdir(store.segments_dir)) == [merged]
+
+    index = store.load(previous)
+    assert len(index) == 20
+    assert index.similarity_search("part 3-4", k=1)[0].page_content == "part 3-4"
+
+def test_legacy_index_is_migrated():
+    root = tempfile.mkdtemp()
+    texts = ["old chunk 1", "old chunk 2"]
+    FAISS.from_embeddings(list(zip(texts, EMBEDDINGS.embed_documents(texts))), EMBEDDINGS).save_local(root)
+
+    store = SegmentStore(root, EMBEDDINGS)
+    ingest(store, ["new chunk"], "new.pdf")
+    assert [seg["name"] for seg in store.read_manifest()["segments"]] == ["seg-000000", "seg-000001"]
+    assert not os.path.exists(os.path.join(root, "index.faiss"))
+    assert len(store.load()) == 3
+
+def test_index_cache_reloads_only_on_version_change():
+    store = SegmentStore(tempfile.mkdtemp(), EMBEDDINGS)
+    loaded = []
+    load_segment = store._load_segment
+    store._load_segment = lambda name: loaded.append(name) or load_segment(name)
+    cache = IndexCache(store, check_interval=0)
+
+    assert cache.get() is None  # empty DB
+    first = ingest(store, ["one"], "1.pdf")
+    index = cache.get()
+    assert len(index) == 1 and loaded == [first]
+
+    # Steady state: no segment is read again
+    assert cache.get() is index and cache.get() is index
+    assert cache.status()["loads"] == 2 and cache.status()["cache_hits"] == 2
+
+    # New segment: only that one is loaded, the resident one is reused
+    second = ingest(store, ["two"], "2.pdf")
+    assert len(cache.get()) == 2 and loaded == [first, second]
+
+    assert store.clear() is True
+    assert cache.get() is None
+    assert store.clear() is False
+
+def test_index_cache_throttles_version_checks():
+    store = SegmentStore(tempfile.mkdtemp(), EMBEDDINGS)
+    ingest(store, ["one"], "1.pdf")
+    cache = IndexCache(store, check_interval=60)
+    index = cache.get()
+    ingest(store, ["two"], "2.pdf")
+    assert cache.get() is index  # within the interval: no disk access at all
+    assert cache.status()["version_checks"] == 1
+    cache.invalidate()
+    assert len(cache.get()) == 2
+
+def test_faiss_segments_are_converted():
+    root = tempfile.mkdtemp()
+    texts = ["saved by FAISS 1", "saved by FAISS 2"]
+    db = FAISS.from_embeddings(list(zip(texts, EMBEDDINGS.embed_documents(texts))), EMBEDDINGS,
+                               metadatas=[{"source": "f.pdf", "page": 1}, {"source": "f.pdf", "page": 2}])
+    db.save_local(os.path.join(root, "segments", "seg-000001"))
+    with open(os.path.join(root, "manifest.json"), "w") as f:
+        f.write('{"next_segment": 2, "dim": 16, "segments": [{"name": "seg-000001", "chunks": 2}]}')
+
+    store = SegmentStore(root, EMBEDDINGS)
+    assert store.read_manifest()["segments"] == [{"name": "seg-000001", "chunks": 2, "format": 1}]
+    doc = store.load().similarity_search("saved by FAISS 2", k=1)[0]
+    assert doc.page_content == "saved by FAISS 2" and doc.metadata == {"source": "f.pdf", "page": 2}
+
+if __name__ == "__main__":
+    test_append_writes_new_segment_only()
+    test_large_ingest_rolls_over_to_new_segments()
+    test_clear_keeps_ingests_in_flight()
+    test_workers_publish_into_one_store()
+    test_fan_out_matches_single_index()
+    test_compaction_merges_small_segments()
+    test_legacy_index_is_migrated()
+    test_faiss_segments_are_converted()
+    test_index_cache_reloads_only_on_version_change()
+    test_index_cache_throttles_version_checks()
+    print("✅ Segment store tests passed!")
@@ -0,0 +1,55 @@
+import io
+import os
+import sys
+import zipfile
+
+# Allow importing from src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.sources import spool_stream, iter_zip_sources, ArchiveLimitError
+from src.ingest import load_file
+
+def make_zip(members):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as z:
+        for name, content in members.items():
+            z.writestr(name, content)
+    buf.seek(0)
+    return buf
+
+def test_spool_stays_in_memory_then_spills():
+    small = spool_stream(io.BytesIO(b"tiny"), "a.txt", spill_threshold=1024)
+    assert small.data == b"tiny" and small.path is None
+
+    big = spool_stream(io.BytesIO(b"x" * 4096), "b.txt", spill_threshold=1024)
+    assert big.data is None and os.path.getsize(big.path) == 4096
+    big.close()
+    assert not os.path.exists(big.path)
+
+def test_zip_members_are_loaded_from_memory():
+    archive = make_zip({
+        "docs/notes.txt": "Part number XJ-4471 is in stock.",
+        ".hidden.txt": "skip me",
+        "__MACOSX/docs/notes.txt": "skip me too",
+    })
+    members = list(iter_zip_sources(archive, "bundle.zip"))
+    assert [m.name for m in members] == ["docs/notes.txt"]
+
+    docs = load_file(members[0])
+    assert docs[0].page_content == "Part number XJ-4471 is in stock."
+    assert docs[0].metadata["source"] == "docs/notes.txt"
+
+def test_zip_limits():
+    archive = make_zip({f"f{i}.txt": "a" * 1000 for i in range(5)})
+    for limits in ({"max_members": 3}, {"max_bytes": 2000}):
+        archive.seek(0)
+        try:
+            list(iter_zip_sources(archive, "bomb.zip", **limits))
+            assert False, f"limit {limits} not enforced"
+        except ArchiveLimitError:
+            pass
+
+if __name__ == "__main__":
+    test_spool_stays_in_memory_then_spills()
+    test_zip_members_are_loaded_from_memory()
+    test_zip_limits()
+    print("✅ Source tests passed!")
@@ -0,0 +1,39 @@
+import os
+import sys
+import random
+import tempfile
+import fitz
+import pdfplumber
+
+# Allow importing from src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.tables import extract_page_tables, has_ruling_lines, new_table_stats, table_hit_rates, format_table_to_markdown
+from tests.corpus import create_text_pdf
+
+def make_pdf(pages, table_every):
+    path = os.path.join(tempfile.mkdtemp(), "tables.pdf")
+    create_text_pdf(path, pages=pages, rng=random.Random(7), table_every=table_every)
+    return path
+
+def test_prefilter_skips_pages_without_ruling_lines():
+    path = make_pdf(pages=4, table_every=2)  # tables on pages 1 and 3
+    with fitz.open(path) as doc:
+        assert [has_ruling_lines(page) for page in doc] == [True, False, True, False]
+
+def test_tiers_match_full_page_extraction():
+    path = make_pdf(pages=4, table_every=2)
+    stats = new_table_stats()
+    with fitz.open(path) as doc, pdfplumber.open(path) as plumber_pdf:
+        texts = [extract_page_tables(page, i, plumber_pdf, stats) for i, page in enumerate(doc)]
+        # Old behaviour: pdfplumber over the whole page
+        full_page = format_table_to_markdown(plumber_pdf.pages[0].extract_tables()[0])
+
+    assert full_page in texts[0]
+    assert texts[1] == "" and texts[3] == ""
+    assert stats["pages"] == 4
+    assert table_hit_rates(stats) == {"prefilter": 0.5, "find_tables": 0.5, "extracted": 0.5}
+
+if __name__ == "__main__":
+    test_prefilter_skips_pages_without_ruling_lines()
+    test_tiers_match_full_page_extraction()
+    print("✅ Table detection tests passed!")
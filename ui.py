@@ -1,6 +1,7 @@
 import streamlit as st
 import requests
 import os
+import time
 
 # 🔧 CONFIG: URL of your FastAPI Backend
 API_URL = "http://127.0.0.1:8000"
@@ -113,10 +114,13 @@ with st.sidebar:
     st.image("https://img.icons8.com/3d-fluency/94/robot-3.png", width=80)
     st.title("Control Panel")
     
+    # 🗂️ Each collection is a separate index (e.g. one per team)
+    collection = st.text_input("🗂️ Collection", value="default").strip() or "default"
+
     st.markdown("### 📤 Upload Documents")
     uploaded_files = st.file_uploader(
         "Supported: PDF, DOCX, TXT, CSV, MD, Images, ZIP", 
-        type=["pdf", "txt", "png", "jpg", "jpeg", "md", "docx", "csv", "zip"],
+        type=["pdf", "txt", "png", "jpg", "jpeg", "md", "docx", "csv", "xlsx", "zip"],
         accept_multiple_files=True
     )
     
@@ -127,12 +131,27 @@ with st.sidebar:
                     ("files", (file.name, file, file.type)) for file in uploaded_files
                 ]
                 try:
-                    response = requests.post(f"{API_URL}/ingest/", files=files_payload)
-                    if response.status_code == 200:
-                        data = response.json()
-                        st.toast(data['message'], icon="✅")
-                        # st.balloons()
-                        st.success("Files ingested!")
+                    response = requests.post(f"{API_URL}/ingest/", files=files_payload, data={"collection": collection})
+                    if response.status_code in (200, 202):
+                        job_id = response.json()["job_id"]
+                        progress_text = st.empty()
+                        
+                        # ⏳ Ingestion runs in the background: poll the job until it's done
+                        while True:
+                            job = requests.get(f"{API_URL}/ingest/{job_id}").json()
+                            if job["status"] in ("succeeded", "failed", "cancelled"):
+                                break
+                            current = job["files"][-1]["name"] if job["files"] else "queued"
+                            progress_text.caption(f"⏳ {job['status'].title()}: {current} ({job['chunks']} chunks)")
+                            time.sleep(1)
+                        progress_text.empty()
+                        
+                        if job["status"] == "succeeded":
+                            st.toast(job["result"]["message"], icon="✅")
+                            # st.balloons()
+                            st.success("Files ingested!")
+                        else:
+                            st.error(f"❌ Ingestion {job['status']}: {job.get('error') or ''}")
                     else:
                         st.error(f"❌ Error: {response.text}")
                 except Exception as e:
@@ -145,7 +164,7 @@ with st.sidebar:
     with col_a:
         if st.button("🗑️ Reset DB", use_container_width=True):
             try:
-                requests.delete(f"{API_URL}/clear-db/")
+                requests.delete(f"{API_URL}/clear-db/", params={"collection": collection})
                 st.toast("Memory Cleared!", icon="🗑️")
             except:
                 st.error("Failed to clear DB")
@@ -183,7 +202,7 @@ if prompt := st.chat_input("Ask a question (e.g., 'Summarize X AND tell me Y')..
         try:
             stream_response = requests.post(
                 f"{API_URL}/chat/", 
-                data={"query": prompt}, 
+                data={"query": prompt, "collection": collection}, 
                 stream=True 
             )
             